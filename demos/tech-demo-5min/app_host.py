@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+BPM AI Solution - Host de aplicações geradas
+Servidor ASGI de longa duração que importa cada backend gerado como módulo
+isolado e o monta em /apps/<process_id>, com carga, recarga e descarga sem
+reiniciar o host (um único processo e event loop para dezenas de processos).
+Cada app recebe seu próprio diretório de dados em `DATA_DIR`
+"""
+
+import argparse
+import asyncio
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import sys
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Dict, Optional
+
+APPS_PREFIX = "/apps"
+ADMIN_PREFIX = "/_host"
+DEFAULT_HOST_URL = os.environ.get("BPM_APP_HOST_URL")
+DATA_ROOT = Path(os.environ.get("BPM_APP_DATA_DIR", Path.home() / ".cache" / "bpm_ai" / "app_data"))
+STARTUP_TIMEOUT = float(os.environ.get("BPM_STARTUP_TIMEOUT", "30"))
+
+_PROCESS_ID = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+class AppLoadError(RuntimeError):
+    """O módulo não pôde ser importado ou não expõe um app ASGI"""
+
+
+# ===================== LIFESPAN DOS APPS MONTADOS =====================
+
+class _Lifespan:
+    """Executa o protocolo lifespan de um app montado (eventos startup/shutdown)"""
+
+    def __init__(self, app: Any):
+        self.app = app
+        self._receive: asyncio.Queue = asyncio.Queue()
+        self._events: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _send(self, message: Dict[str, Any]):
+        await self._events.put(message)
+
+    async def _run(self):
+        try:
+            await self.app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}},
+                           self._receive.get, self._send)
+        except BaseException:
+            pass  # App sem suporte a lifespan (ou cancelado no shutdown)
+        finally:
+            # Libera quem espera um evento que o app não vai mais enviar
+            await self._events.put({"type": "lifespan.finished"})
+
+    async def _wait(self, event: str) -> None:
+        message = await self._events.get()
+        if message["type"] == f"{event}.failed":
+            raise AppLoadError(message.get("message") or f"{event} falhou")
+
+    async def startup(self, timeout: float = STARTUP_TIMEOUT):
+        self._task = asyncio.create_task(self._run())
+        await self._receive.put({"type": "lifespan.startup"})
+        try:
+            await asyncio.wait_for(self._wait("lifespan.startup"), timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            raise AppLoadError(f"startup do app sem resposta em {timeout:.0f}s")
+
+    async def shutdown(self):
+        if self._task is None or self._task.done():
+            return
+        await self._receive.put({"type": "lifespan.shutdown"})
+        try:
+            await asyncio.wait_for(self._wait("lifespan.shutdown"), 5)
+        except (asyncio.TimeoutError, AppLoadError):
+            self._task.cancel()
+
+
+# ===================== HOST =====================
+
+@dataclass
+class HostedApp:
+    """App gerado montado no host"""
+    process_id: str
+    path: Path
+    data_dir: Path
+    module: ModuleType
+    app: Any
+    lifespan: _Lifespan
+    code_hash: str
+    loaded_at: float = field(default_factory=time.time)
+    load_seconds: float = 0.0
+    requests: int = 0
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "process_id": self.process_id,
+            "path": str(self.path),
+            "data_dir": str(self.data_dir),
+            "prefix": f"{APPS_PREFIX}/{self.process_id}",
+            "code_hash": self.code_hash,
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds,
+            "requests": self.requests,
+        }
+
+
+def _import_isolated(path: Path, module_name: str, data_dir: Path) -> ModuleType:
+    """Importa o arquivo com um nome de módulo único (sem `__main__`, então
+    o `uvicorn.run` do script não é executado)
+
+    O diretório de trabalho é do host inteiro, então o diretório de dados do
+    app chega como a global `DATA_DIR`, definida antes da execução do módulo.
+    """
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    if spec is None or spec.loader is None:
+        raise AppLoadError(f"Não é um módulo Python: {path}")
+    module = importlib.util.module_from_spec(spec)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    module.DATA_DIR = str(data_dir)
+    sys.modules[module_name] = module
+    sys.path.insert(0, str(path.parent))  # Imports relativos ao diretório do app
+    try:
+        spec.loader.exec_module(module)
+    except BaseException as e:
+        sys.modules.pop(module_name, None)
+        raise AppLoadError(f"Erro ao importar {path.name}: {e}") from e
+    finally:
+        if str(path.parent) in sys.path:
+            sys.path.remove(str(path.parent))
+    return module
+
+
+class AppHost:
+    """Despachante ASGI: /apps/<process_id>/... vai para o app montado, o resto
+    para a API administrativa
+
+    A recarga importa a nova versão antes de trocar a montagem, então as
+    requisições nunca encontram o processo descarregado; a versão anterior só
+    recebe o shutdown depois da troca. Importação e startup acontecem fora do
+    lock (com prazo), então um app que trava não bloqueia os demais.
+    """
+
+    def __init__(self, data_root: Optional[Path] = None):
+        self.apps: Dict[str, HostedApp] = {}
+        self.data_root = Path(data_root or DATA_ROOT)
+        self.admin = self._create_admin()
+        self._lock = asyncio.Lock()
+        self.started_at = time.time()
+
+    async def load(self, process_id: str, path: Path) -> HostedApp:
+        """Carrega (ou recarrega) o app do arquivo sob /apps/<process_id>"""
+        if not _PROCESS_ID.match(process_id):
+            raise AppLoadError(f"process_id inválido: {process_id}")
+        path = Path(path).resolve()
+        code = path.read_bytes()
+        code_hash = hashlib.sha256(code).hexdigest()[:16]
+
+        current = self.apps.get(process_id)
+        if current is not None and current.code_hash == code_hash:
+            return current  # Mesmo código: nada a recarregar
+
+        start = time.perf_counter()
+        module_name = f"bpm_hosted_{re.sub(r'[^A-Za-z0-9_]', '_', process_id)}_{code_hash}"
+        data_dir = self.data_root / process_id
+        # A importação executa o código do módulo (SQLite, etc.) fora do event loop
+        module = await asyncio.to_thread(_import_isolated, path, module_name, data_dir)
+        app = getattr(module, "app", None)
+        if not callable(app):
+            sys.modules.pop(module_name, None)
+            raise AppLoadError(f"{path.name} não define um app ASGI em `app`")
+
+        lifespan = _Lifespan(app)
+        try:
+            await lifespan.startup()
+        except AppLoadError:
+            sys.modules.pop(module_name, None)
+            raise
+        hosted = HostedApp(process_id, path, data_dir, module, app, lifespan, code_hash,
+                           load_seconds=time.perf_counter() - start)
+
+        async with self._lock:
+            current = self.apps.get(process_id)
+            self.apps[process_id] = hosted
+        if current is not None:
+            await self._dispose(current)
+        return hosted
+
+    async def unload(self, process_id: str) -> bool:
+        async with self._lock:
+            hosted = self.apps.pop(process_id, None)
+        if hosted is None:
+            return False
+        await self._dispose(hosted)
+        return True
+
+    async def _dispose(self, hosted: HostedApp):
+        await hosted.lifespan.shutdown()
+        sys.modules.pop(hosted.module.__name__, None)
+
+    async def shutdown(self):
+        for process_id in list(self.apps):
+            await self.unload(process_id)
+
+    def _create_admin(self):
+        from fastapi import FastAPI, HTTPException
+        from pydantic import BaseModel
+
+        class LoadRequest(BaseModel):
+            path: str
+
+        admin = FastAPI(title="BPM App Host", version="1.0.0")
+
+        @admin.get(f"{ADMIN_PREFIX}/health")
+        async def health():
+            return {"status": "healthy", "apps": len(self.apps), "uptime_seconds": time.time() - self.started_at}
+
+        @admin.get(f"{ADMIN_PREFIX}/apps")
+        async def list_apps():
+            return [hosted.info() for hosted in self.apps.values()]
+
+        @admin.put(f"{ADMIN_PREFIX}/apps/{{process_id}}")
+        async def load_app(process_id: str, request: LoadRequest):
+            try:
+                return (await self.load(process_id, Path(request.path))).info()
+            except (AppLoadError, OSError) as e:
+                raise HTTPException(422, str(e))
+
+        @admin.delete(f"{ADMIN_PREFIX}/apps/{{process_id}}")
+        async def unload_app(process_id: str):
+            if not await self.unload(process_id):
+                raise HTTPException(404, "App não carregado")
+            return {"unloaded": process_id}
+
+        return admin
+
+    async def __call__(self, scope: Dict[str, Any], receive, send):
+        if scope["type"] == "lifespan":
+            await self._host_lifespan(receive, send)
+            return
+
+        path = scope.get("path", "")
+        if scope["type"] in ("http", "websocket") and path.startswith(APPS_PREFIX + "/"):
+            process_id, _, rest = path[len(APPS_PREFIX) + 1:].partition("/")
+            hosted = self.apps.get(process_id)
+            if hosted is not None:
+                hosted.requests += 1
+                prefix = f"{APPS_PREFIX}/{process_id}"
+                child = dict(scope, path="/" + rest, root_path=scope.get("root_path", "") + prefix)
+                child["raw_path"] = child["path"].encode()
+                await hosted.app(child, receive, send)
+                return
+        await self.admin(scope, receive, send)
+
+    async def _host_lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+# ===================== CLIENTE =====================
+
+def _request(method: str, url: str, payload: Optional[Dict[str, Any]] = None, timeout: float = 30) -> Any:
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read() or b"null")
+    except urllib.error.HTTPError as e:
+        detail = e.read().decode(errors="replace")
+        raise AppLoadError(f"Host respondeu {e.code}: {detail}") from e
+
+
+async def host_load(host_url: str, process_id: str, path: Path) -> Dict[str, Any]:
+    """Pede ao host que carregue (ou recarregue) o arquivo; retorna a descrição do app"""
+    return await asyncio.to_thread(
+        _request, "PUT", f"{host_url.rstrip('/')}{ADMIN_PREFIX}/apps/{process_id}", {"path": str(Path(path).resolve())}
+    )
+
+
+def unload_from_host(host_url: str, process_id: str, timeout: float = 10):
+    """Descarga síncrona (para rotinas de limpeza fora de corrotinas)"""
+    _request("DELETE", f"{host_url.rstrip('/')}{ADMIN_PREFIX}/apps/{process_id}", timeout=timeout)
+
+
+async def host_unload(host_url: str, process_id: str):
+    await asyncio.to_thread(unload_from_host, host_url, process_id)
+
+
+def app_url(host_url: str, process_id: str) -> str:
+    return f"{host_url.rstrip('/')}{APPS_PREFIX}/{process_id}"
+
+
+# ===================== MAIN =====================
+
+def parse_args():
+    """Argumentos de linha de comando do host"""
+    parser = argparse.ArgumentParser(description="BPM AI Solution - Host de aplicações geradas")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface (a API administrativa carrega código local)")
+    parser.add_argument("--port", type=int, default=8100)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    from rich.console import Console
+
+    console = Console()
+    args = parse_args()
+    console.print(f"[cyan]🏠 Host de aplicações em http://{args.host}:{args.port}[/cyan] (BPM_APP_HOST_URL)")
+    uvicorn.run(AppHost(), host=args.host, port=args.port)
@@ -0,0 +1,143 @@
+"""
+BPM AI Solution - Inicialização de aplicações geradas
+Porta livre por deploy, sondagem ativa do health check com intervalos
+exponenciais e logs de inicialização capturados em arquivo
+"""
+
+import asyncio
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Set
+
+DEFAULT_STARTUP_TIMEOUT = float(os.environ.get("BPM_STARTUP_TIMEOUT", "30"))
+
+_FASTAPI_APP = re.compile(r"^app\s*=\s*FastAPI\(", re.MULTILINE)
+_reserved_ports: Set[int] = set()  # Alocadas neste processo e ainda não liberadas
+
+
+class AppStartError(RuntimeError):
+    """A aplicação encerrou ou não respondeu ao health check dentro do prazo"""
+
+    def __init__(self, message: str, log_tail: str = ""):
+        super().__init__(message)
+        self.log_tail = log_tail
+
+
+def find_free_port(host: str = "127.0.0.1") -> int:
+    """Porta TCP livre escolhida pelo sistema (sem repetir as já reservadas aqui)"""
+    for _ in range(20):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind((host, 0))
+            port = sock.getsockname()[1]
+        if port not in _reserved_ports:
+            _reserved_ports.add(port)
+            return port
+    raise RuntimeError("Nenhuma porta livre disponível")
+
+
+@dataclass
+class LaunchedApp:
+    """Aplicação em execução: processo, endereço e arquivo de log"""
+    process: subprocess.Popen
+    host: str
+    port: int
+    log_path: Path
+    startup_seconds: float = 0.0
+    probes: int = 0
+    command: List[str] = field(default_factory=list)
+
+    @property
+    def url(self) -> str:
+        return f"http://{'localhost' if self.host in ('0.0.0.0', '127.0.0.1') else self.host}:{self.port}"
+
+    def log_tail(self, lines: int = 20) -> str:
+        try:
+            return "\n".join(self.log_path.read_text(encoding="utf-8", errors="replace").splitlines()[-lines:])
+        except OSError:
+            return ""
+
+    def stop(self, timeout: float = 5.0):
+        """Encerra o processo (terminate, depois kill) e libera a porta"""
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        _reserved_ports.discard(self.port)
+
+
+async def probe(host: str, port: int, path: str = "/health", timeout: float = 1.0) -> Optional[int]:
+    """Status HTTP de um GET em `path` (None se a porta ainda não aceita conexões)"""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+    try:
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        parts = status_line.split()
+        return int(parts[1]) if len(parts) >= 2 and parts[1].isdigit() else None
+    except (OSError, asyncio.TimeoutError, ValueError):
+        return None
+    finally:
+        writer.close()
+
+
+def launch_command(python: str, script: Path, host: str, port: int) -> List[str]:
+    """Apps FastAPI com `app` no módulo sobem pelo uvicorn na porta alocada; os
+    demais rodam o próprio script com PORT/HOST no ambiente"""
+    code = script.read_text(encoding="utf-8", errors="replace")
+    if _FASTAPI_APP.search(code):
+        return [python, "-m", "uvicorn", f"{script.stem}:app", "--host", host, "--port", str(port)]
+    return [python, str(script)]
+
+
+async def launch_app(script: Path, python: Optional[str] = None, host: str = "127.0.0.1",
+                     port: Optional[int] = None, health_path: str = "/health",
+                     timeout: float = DEFAULT_STARTUP_TIMEOUT, initial_interval: float = 0.05,
+                     max_interval: float = 0.25, backoff: float = 1.5) -> LaunchedApp:
+    """Inicia a aplicação e retorna assim que o health check responder
+
+    A sondagem começa em `initial_interval` e cresce `backoff` vezes até
+    `max_interval`, então uma aplicação rápida fica pronta em milissegundos,
+    uma lenta não gera falso positivo e o atraso após o boot fica limitado a
+    `max_interval`. Qualquer resposta HTTP abaixo de 500 conta como pronta
+    (apps sem `health_path` respondem 404). Saída do processo ou `timeout`
+    levantam AppStartError com o final do log.
+    """
+    script = Path(script)
+    port = port or find_free_port(host)
+    log_path = script.with_name(f"{script.stem}.{port}.log")
+    command = launch_command(str(python or sys.executable), script, host, port)
+    env = dict(os.environ, PORT=str(port), HOST=host, DATA_DIR=str(script.parent), PYTHONUNBUFFERED="1")
+
+    start = time.perf_counter()
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen(command, cwd=script.parent, env=env, stdout=log, stderr=subprocess.STDOUT)
+    app = LaunchedApp(process, host, port, log_path, command=command)
+
+    interval = initial_interval
+    deadline = start + timeout
+    while True:
+        if process.poll() is not None:
+            app.stop()
+            raise AppStartError(f"Aplicação encerrou ao iniciar (código {process.returncode})", app.log_tail())
+        app.probes += 1
+        status = await probe(host, port, health_path)
+        if status is not None and status < 500:
+            app.startup_seconds = time.perf_counter() - start
+            return app
+        if time.perf_counter() + interval > deadline:
+            await asyncio.to_thread(app.stop)
+            raise AppStartError(f"Health check sem resposta em {timeout:.0f}s", app.log_tail())
+        await asyncio.sleep(interval)
+        interval = min(interval * backoff, max_interval)
@@ -0,0 +1,276 @@
+"""
+BPM AI Solution - Store de artefatos gerados
+Código gerado (backend, frontend, testes, documentação) guardado por hash de
+conteúdo, comprimido e deduplicado, com índice process_id/versão → blobs e
+coleta de lixo por contagem de referências
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from stage_store import canonical_json, to_jsonable
+
+DEFAULT_ARTIFACTS_DIR = Path(os.environ.get("BPM_ARTIFACTS_DIR", Path.home() / ".cache" / "bpm_ai" / "artifacts"))
+# Blobs gravados há menos que isso não são coletados (o `publish` que os referencia pode
+# estar em andamento, inclusive em outro processo)
+GC_GRACE_SECONDS = float(os.environ.get("BPM_ARTIFACTS_GC_GRACE", "3600"))
+
+
+class ArtifactStore:
+    """blobs/ guarda o conteúdo comprimido por SHA-256; index.db mapeia
+    (process_id, versão, tipo) → blob e conta as referências de cada blob
+
+    Publicar o mesmo conjunto de artefatos da última versão não cria versão
+    nova, e um blob é gravado uma única vez, não importa quantas versões ou
+    processos o referenciem. Remover versões só decrementa contadores; `gc`
+    apaga os blobs que ficaram sem referência e que não foram gravados nem
+    reaproveitados nos últimos `GC_GRACE_SECONDS`. Números de versão nunca são
+    reutilizados, mesmo depois de removidos (um `process@N` antigo nunca
+    aponta para outro código).
+    """
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = Path(root or DEFAULT_ARTIFACTS_DIR)
+        self.blobs = self.root / "blobs"
+        self.blobs.mkdir(parents=True, exist_ok=True)
+        self.written = 0
+        self.deduplicated = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.root / "index.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                stored_size INTEGER NOT NULL,
+                refcount INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS versions (
+                process_id TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                run_id TEXT,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (process_id, version)
+            );
+            CREATE TABLE IF NOT EXISTS artifacts (
+                process_id TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                hash TEXT NOT NULL REFERENCES blobs(hash),
+                meta TEXT NOT NULL,
+                PRIMARY KEY (process_id, version, kind),
+                FOREIGN KEY (process_id, version) REFERENCES versions ON DELETE CASCADE
+            );
+            CREATE TABLE IF NOT EXISTS processes (
+                process_id TEXT PRIMARY KEY,
+                next_version INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO processes
+                SELECT process_id, MAX(version) + 1 FROM versions GROUP BY process_id;"""
+        )
+        self._conn.commit()
+
+    # ===================== BLOBS =====================
+
+    def _blob_path(self, content_hash: str) -> Path:
+        return self.blobs / content_hash[:2] / f"{content_hash}.z"
+
+    def put_blob(self, data: bytes) -> str:
+        """Grava o conteúdo (se ainda não existir) e retorna o hash; a referência
+        só é contada quando uma versão aponta para ele"""
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(content_hash)
+        with self._lock, self._conn:
+            # Órfão reaproveitado: renova a carência até o `publish` contar a referência
+            self._conn.execute(
+                "UPDATE blobs SET created_at = ? WHERE hash = ? AND refcount <= 0", (time.time(), content_hash)
+            )
+            known = self._conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (content_hash,)).fetchone()
+        if known and path.exists():
+            self.deduplicated += 1
+            return content_hash
+
+        compressed = zlib.compress(data, 9)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp_")
+        with os.fdopen(fd, "wb") as f:
+            f.write(compressed)
+        os.replace(tmp, path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO blobs (hash, size, stored_size, created_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (hash) DO UPDATE SET created_at = excluded.created_at",
+                (content_hash, len(data), len(compressed), time.time())
+            )
+        self.written += 1
+        return content_hash
+
+    def get_blob(self, content_hash: str) -> bytes:
+        data = zlib.decompress(self._blob_path(content_hash).read_bytes())
+        if hashlib.sha256(data).hexdigest() != content_hash:
+            raise ValueError(f"Blob corrompido: {content_hash}")
+        return data
+
+    # ===================== VERSÕES =====================
+
+    def publish(self, process_id: str, artifacts: Dict[str, Any], run_id: Optional[str] = None) -> Tuple[int, bool]:
+        """Registra os artefatos (GeneratedCode ou dict com `code`) como nova
+        versão do processo; retorna (versão, criada) — se o conteúdo for igual
+        ao da última versão, ela é reaproveitada"""
+        entries = {}
+        for kind, artifact in artifacts.items():
+            meta = to_jsonable(artifact)
+            code = meta.pop("code")
+            entries[kind] = (self.put_blob(code.encode("utf-8")), canonical_json(meta))
+
+        with self._lock, self._conn:
+            latest = self._conn.execute(
+                "SELECT MAX(version) FROM versions WHERE process_id = ?", (process_id,)
+            ).fetchone()[0]
+            if latest is not None:
+                current = {
+                    kind: (content_hash, meta) for kind, content_hash, meta in self._conn.execute(
+                        "SELECT kind, hash, meta FROM artifacts WHERE process_id = ? AND version = ?",
+                        (process_id, latest)
+                    )
+                }
+                if current == entries:
+                    return latest, False
+
+            self._conn.execute("INSERT OR IGNORE INTO processes VALUES (?, 1)", (process_id,))
+            version = self._conn.execute(
+                "SELECT next_version FROM processes WHERE process_id = ?", (process_id,)
+            ).fetchone()[0]
+            self._conn.execute(
+                "UPDATE processes SET next_version = next_version + 1 WHERE process_id = ?", (process_id,)
+            )
+            self._conn.execute(
+                "INSERT INTO versions VALUES (?, ?, ?, ?)", (process_id, version, run_id, time.time())
+            )
+            for kind, (content_hash, meta) in entries.items():
+                self._conn.execute(
+                    "INSERT INTO artifacts VALUES (?, ?, ?, ?, ?)", (process_id, version, kind, content_hash, meta)
+                )
+                self._conn.execute("UPDATE blobs SET refcount = refcount + 1 WHERE hash = ?", (content_hash,))
+        return version, True
+
+    def resolve(self, process_id: str, version: Optional[int] = None) -> int:
+        """Versão informada ou a mais recente (ValueError se não existir)"""
+        with self._lock:
+            if version is None:
+                row = self._conn.execute(
+                    "SELECT MAX(version) FROM versions WHERE process_id = ?", (process_id,)
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT version FROM versions WHERE process_id = ? AND version = ?", (process_id, version)
+                ).fetchone()
+        if row is None or row[0] is None:
+            suffix = f" v{version}" if version is not None else ""
+            raise ValueError(f"Nenhum artefato gravado para {process_id}{suffix}")
+        return row[0]
+
+    def load(self, process_id: str, version: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        """Artefatos da versão (padrão: a mais recente) como dicts com `code`"""
+        version = self.resolve(process_id, version)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, hash, meta FROM artifacts WHERE process_id = ? AND version = ?", (process_id, version)
+            ).fetchall()
+        return {
+            kind: dict(json.loads(meta), code=self.get_blob(content_hash).decode("utf-8"))
+            for kind, content_hash, meta in rows
+        }
+
+    def delete_version(self, process_id: str, version: int) -> bool:
+        """Remove a versão do índice e solta as referências aos seus blobs"""
+        with self._lock, self._conn:
+            hashes = [row[0] for row in self._conn.execute(
+                "SELECT hash FROM artifacts WHERE process_id = ? AND version = ?", (process_id, version)
+            )]
+            deleted = self._conn.execute(
+                "DELETE FROM versions WHERE process_id = ? AND version = ?", (process_id, version)
+            ).rowcount
+            for content_hash in hashes:
+                self._conn.execute("UPDATE blobs SET refcount = refcount - 1 WHERE hash = ?", (content_hash,))
+        return bool(deleted)
+
+    def prune(self, keep: int) -> int:
+        """Mantém apenas as `keep` versões mais recentes de cada processo"""
+        with self._lock:
+            old = self._conn.execute(
+                """SELECT process_id, version FROM versions v
+                   WHERE (SELECT COUNT(*) FROM versions n
+                          WHERE n.process_id = v.process_id AND n.version > v.version) >= ?""",
+                (keep,)
+            ).fetchall()
+        for process_id, version in old:
+            self.delete_version(process_id, version)
+        return len(old)
+
+    def gc(self, grace: float = GC_GRACE_SECONDS) -> Tuple[int, int]:
+        """Apaga os blobs sem referência gravados há mais de `grace` segundos;
+        retorna (blobs removidos, bytes liberados)"""
+        cutoff = time.time() - grace
+        removed = []
+        with self._lock, self._conn:
+            orphans = self._conn.execute(
+                "SELECT hash, stored_size FROM blobs WHERE refcount <= 0 AND created_at < ?", (cutoff,)
+            ).fetchall()
+            for content_hash, size in orphans:
+                # Condição repetida: outro processo pode ter referenciado o blob desde o SELECT
+                if self._conn.execute(
+                    "DELETE FROM blobs WHERE hash = ? AND refcount <= 0 AND created_at < ?", (content_hash, cutoff)
+                ).rowcount:
+                    removed.append((content_hash, size))
+            # Arquivos apagados antes do commit: um `put_blob` concorrente espera o lock de
+            # escrita e, sem a linha, grava o blob de novo (não perde o arquivo recém-gravado)
+            for content_hash, _ in removed:
+                self._blob_path(content_hash).unlink(missing_ok=True)
+        return len(removed), sum(size for _, size in removed)
+
+    # ===================== CONSULTA =====================
+
+    def versions(self, process_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Versões gravadas (mais recentes primeiro) com os tipos de artefato"""
+        query = """SELECT v.process_id, v.version, v.run_id, v.created_at,
+                          GROUP_CONCAT(a.kind), COALESCE(SUM(b.size), 0)
+                   FROM versions v
+                   LEFT JOIN artifacts a USING (process_id, version)
+                   LEFT JOIN blobs b ON b.hash = a.hash"""
+        params: Tuple[Any, ...] = ()
+        if process_id is not None:
+            query += " WHERE v.process_id = ?"
+            params = (process_id,)
+        query += " GROUP BY v.process_id, v.version ORDER BY v.created_at DESC, v.version DESC"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [
+            {"process_id": pid, "version": version, "run_id": run_id, "created_at": created_at,
+             "kinds": sorted(kinds.split(",")) if kinds else [], "size_bytes": size}
+            for pid, version, run_id, created_at, kinds, size in rows
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            blobs, size, stored = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM blobs"
+            ).fetchone()
+            versions = self._conn.execute("SELECT COUNT(*) FROM versions").fetchone()[0]
+        return {
+            "blobs": blobs, "versions": versions, "size_bytes": size, "stored_bytes": stored,
+            "written": self.written, "deduplicated": self.deduplicated, "root": str(self.root),
+        }
+
+    def close(self):
+        self._conn.close()
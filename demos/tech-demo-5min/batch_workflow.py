@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+BPM AI Solution - Workflow em Lote
+Executa o pipeline Requisito → Análise → BPMN → Formulário → Código para
+catálogos inteiros de requisitos (JSONL ou CSV)
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from rich.panel import Panel
+from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn
+from rich.table import Table
+
+from bpm_complete_workflow import (
+    console,
+    select_model,
+    build_hedger,
+    build_router,
+    build_workflow_scheduler,
+    RequirementAnalyzerAgent,
+    EnhancedProcessDesignerAgent,
+    FormBuilderAgent,
+    EnhancedCodeGeneratorAgent,
+    STAGE_LABELS,
+)
+from deadline import DEFAULT_DEADLINE, RequestDeadline
+from llm_cache import LLMResponseCache
+from llm_client import configure_default_pool
+from stage_store import to_jsonable
+from template_library import TemplateLibrary
+from tracing import get_tracer
+
+GENERATION_STAGES = ["analysis", "process", "form", "backend", "frontend"]
+
+
+def read_requirements(path: Path) -> Iterator[Dict[str, str]]:
+    """Lê requisitos de um arquivo JSONL ou CSV (campo `requirement`, `id` opcional)
+
+    Uma linha JSONL malformada ou sem `requirement` vira `{"id", "error"}` (o
+    lote segue e ela é gravada como falha na saída).
+    """
+    if path.suffix.lower() == ".csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            for index, row in enumerate(csv.DictReader(f)):
+                requirement = (row.get("requirement") or "").strip()
+                if requirement:
+                    yield {"id": row.get("id") or str(index + 1), "requirement": requirement}
+        return
+
+    with open(path, encoding="utf-8") as f:
+        for index, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                item = None
+            if isinstance(item, str):
+                item = {"requirement": item}
+            if not isinstance(item, dict):
+                yield {"id": str(index + 1), "error": "linha inválida"}
+                continue
+            requirement = item.get("requirement")
+            item_id = str(item.get("id") or index + 1)
+            if not isinstance(requirement, str) or not requirement.strip():
+                yield {"id": item_id, "error": "linha inválida"}
+                continue
+            yield {"id": item_id, "requirement": requirement}
+
+
+def count_requirements(path: Path) -> int:
+    """Conta os requisitos válidos do arquivo para a barra de progresso"""
+    return sum(1 for item in read_requirements(path) if "error" not in item)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentil por interpolação linear (0 para lista vazia)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+class BatchStats:
+    """Acumula tempos por estágio e contadores de falha do lote"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.completed = 0
+        self.failed = 0
+        self.invalid = 0  # Linhas de entrada descartadas
+        self.stage_times: Dict[str, List[float]] = {name: [] for name in GENERATION_STAGES}
+        self.stage_failures: Dict[str, int] = {name: 0 for name in GENERATION_STAGES}
+        self.stage_degraded: Dict[str, int] = {name: 0 for name in GENERATION_STAGES}
+
+    def record(self, stage_results: Dict[str, Any]):
+        ok = True
+        for name, result in stage_results.items():
+            if result.deadline_exceeded:
+                self.stage_degraded[name] += 1
+            if result.ok:
+                self.stage_times[name].append(result.duration)
+            else:
+                self.stage_failures[name] += 1
+                ok = False
+        self.completed += 1
+        if not ok:
+            self.failed += 1
+
+    def record_error(self):
+        """Requisito cujo pipeline levantou exceção fora dos estágios"""
+        self.completed += 1
+        self.failed += 1
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def summary(self, agents: List[Any]) -> Dict[str, Any]:
+        elapsed = self.elapsed
+        return {
+            "requirements": self.completed,
+            "failed": self.failed,
+            "invalid": self.invalid,
+            "elapsed_seconds": elapsed,
+            "requirements_per_minute": self.completed / elapsed * 60 if elapsed else 0.0,
+            "stages": {
+                name: {
+                    "p50": percentile(times, 50),
+                    "p95": percentile(times, 95),
+                    "failures": self.stage_failures[name],
+                    "deadline_exceeded": self.stage_degraded[name],
+                }
+                for name, times in self.stage_times.items()
+            },
+            "fallbacks": {agent.name: agent.fallbacks for agent in agents},
+        }
+
+
+async def run_batch(input_path: Path, output_path: Path, workers: int = 8,
+                    use_cache: bool = True, max_concurrency: Optional[int] = None,
+                    use_templates: bool = True, metrics_port: Optional[int] = None,
+                    metrics_file: Optional[Path] = None, routing: bool = True,
+                    stage_models: Optional[List[str]] = None,
+                    stage_budgets: Optional[List[str]] = None, hedge: bool = False,
+                    hedge_percentile: Optional[float] = None,
+                    deadline: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Processa todos os requisitos com um pool limitado de workers
+
+    Cada resultado é gravado no JSONL de saída assim que o pipeline termina,
+    então um lote interrompido mantém tudo o que já foi gerado. Com
+    `deadline`, cada requisito tem esse prazo (em segundos) para terminar.
+    """
+    selected = select_model()
+    if selected is None:
+        return None
+    api_key, model = selected
+
+    if max_concurrency:
+        configure_default_pool(max_concurrency)
+
+    tracer = get_tracer()
+    if metrics_port:
+        tracer.serve_metrics(metrics_port)
+        console.print(f"[dim]📈 Métricas Prometheus em http://localhost:{metrics_port}/metrics[/dim]")
+
+    llm_cache = LLMResponseCache(bypass=not use_cache)
+    router = build_router(model, stage_models, stage_budgets) if routing else None
+    hedger = build_hedger(hedge_percentile) if hedge else None
+    agent_options = {"cache": llm_cache, "router": router, "hedger": hedger}
+    analyzer = RequirementAnalyzerAgent(api_key, model, **agent_options)
+    templates = TemplateLibrary.load() if use_templates else None
+    process_designer = EnhancedProcessDesignerAgent(api_key, model, templates=templates, **agent_options)
+    form_agent = FormBuilderAgent(api_key, model, templates=templates, **agent_options)
+    code_generator = EnhancedCodeGeneratorAgent(api_key, model, **agent_options)
+    agents = [analyzer, process_designer, form_agent, code_generator]
+
+    total = count_requirements(input_path)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+    stats = BatchStats()
+
+    with open(output_path, "w", encoding="utf-8") as output, Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        TaskProgressColumn(),
+        expand=True
+    ) as progress:
+        task = progress.add_task(f"[cyan]📦 Processando {total} requisitos...", total=total)
+
+        def write(record: Dict[str, Any]):
+            output.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            output.flush()
+
+        async def producer():
+            try:
+                for item in read_requirements(input_path):
+                    await queue.put(item)
+            finally:
+                for _ in range(workers):
+                    await queue.put(None)  # Workers terminam mesmo se a leitura falhar
+
+        async def process(item: Dict[str, str]) -> Dict[str, Any]:
+            scheduler = build_workflow_scheduler(
+                item["requirement"], analyzer, process_designer, form_agent, code_generator,
+                stream=False
+            )
+            stage_results = await scheduler.run(
+                deadline=RequestDeadline(deadline) if deadline else None
+            )
+            stats.record(stage_results)
+
+            record = {
+                "id": item["id"],
+                "requirement": item["requirement"],
+                "status": "ok" if all(r.ok for r in stage_results.values()) else "failed",
+                "stage_seconds": {name: r.duration for name, r in stage_results.items()},
+                "errors": {name: str(r.error) for name, r in stage_results.items() if not r.ok},
+                "degraded": [name for name, r in stage_results.items() if r.fallback],
+            }
+            for name, result in stage_results.items():
+                record[name] = to_jsonable(result.value)
+            return record
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                if "error" in item:
+                    stats.invalid += 1
+                    write({"id": item["id"], "status": "failed", "error": item["error"]})
+                    continue
+
+                # Falha de um requisito vira registro de falha; os demais seguem
+                try:
+                    record = await process(item)
+                except Exception as e:
+                    stats.record_error()
+                    record = {"id": item["id"], "requirement": item["requirement"],
+                              "status": "failed", "error": f"{type(e).__name__}: {e}"}
+                write(record)
+                progress.update(task, advance=1)
+
+        results = await asyncio.gather(producer(), *(worker() for _ in range(workers)), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                console.print(f"[red]❌ Lote interrompido: {type(result).__name__}: {result}[/red]")
+
+    llm_cache.close()
+    if metrics_file:
+        tracer.write_textfile(str(metrics_file))
+    try:
+        await asyncio.to_thread(tracer.persist, None, f"batch:{input_path.name}")
+    except Exception as e:
+        console.print(f"[yellow]⚠️ Não foi possível gravar ai_agent_logs: {e}[/yellow]")
+
+    summary = stats.summary(agents)
+    summary["tracing"] = tracer.summary()
+    if router is not None:
+        summary["routing"] = router.stats()
+    if hedger is not None:
+        summary["hedging"] = hedger.stats()
+    return summary
+
+
+def print_summary(summary: Dict[str, Any]):
+    """Mostra o relatório de throughput e latência do lote"""
+    console.print(Panel.fit(
+        f"[bold green]✅ Lote concluído[/bold green]\n"
+        f"• Requisitos: {summary['requirements']} ({summary['failed']} com falha)\n"
+        f"• Linhas inválidas: {summary['invalid']}\n"
+        f"• Tempo total: {summary['elapsed_seconds']:.1f}s\n"
+        f"• Throughput: {summary['requirements_per_minute']:.1f} requisitos/min",
+        border_style="green"
+    ))
+
+    table = Table(show_header=True)
+    table.add_column("Etapa", style="cyan")
+    table.add_column("p50", style="green")
+    table.add_column("p95", style="yellow")
+    table.add_column("Falhas", style="red")
+    table.add_column("Prazo esgotado", style="magenta")
+    for name, stage in summary["stages"].items():
+        table.add_row(
+            STAGE_LABELS.get(name, name), f"{stage['p50']:.1f}s", f"{stage['p95']:.1f}s",
+            str(stage["failures"]), str(stage["deadline_exceeded"])
+        )
+    console.print(table)
+
+    fallbacks = ", ".join(f"{name}: {count}" for name, count in summary["fallbacks"].items())
+    console.print(f"[dim]Fallbacks por agente: {fallbacks}[/dim]")
+
+    for name, route in (summary.get("routing") or {}).items():
+        used = ", ".join(f"{m} ×{count}" for m, count in route["picks"].items() if count) or "—"
+        console.print(f"[dim]Modelo {name}: {used} ({route['escalations']} escalonamento(s))[/dim]")
+
+    hedging = summary.get("hedging")
+    if hedging:
+        console.print(
+            f"[dim]Hedge: {hedging['hedged']}/{hedging['calls']} chamadas ({hedging['hedge_rate']:.0%}), "
+            f"vitórias {hedging['wins']['primary']} principal / {hedging['wins']['secondary']} reserva[/dim]"
+        )
+
+    tracing = summary.get("tracing") or {}
+    if tracing:
+        total_cost = sum(item["cost_usd"] for item in tracing.values())
+        total_tokens = sum(item["input_tokens"] + item["output_tokens"] for item in tracing.values())
+        queue = sum(item["queue_wait_seconds"] for item in tracing.values())
+        console.print(f"[dim]Tokens: {total_tokens} • Custo estimado: ${total_cost:.4f} • Tempo em fila: {queue:.1f}s[/dim]")
+
+
+def parse_args():
+    """Argumentos de linha de comando do modo em lote"""
+    parser = argparse.ArgumentParser(description="BPM AI Solution - Workflow em Lote")
+    parser.add_argument("input", type=Path, help="Arquivo JSONL ou CSV com o campo 'requirement'")
+    parser.add_argument("-o", "--output", type=Path, default=Path("batch_results.jsonl"),
+                        help="JSONL de saída (uma linha por requisito)")
+    parser.add_argument("-w", "--workers", type=int, default=8, help="Pipelines simultâneos")
+    parser.add_argument("--summary", type=Path, default=None, help="Grava o relatório final em JSON")
+    parser.add_argument("--no-cache", action="store_true", help="Ignora o cache de respostas LLM")
+    parser.add_argument("--no-templates", action="store_true",
+                        help="Não usa a biblioteca de templates de processo")
+    parser.add_argument("--max-concurrency", type=int, default=None,
+                        help="Limite de chamadas LLM simultâneas")
+    parser.add_argument("--no-routing", action="store_true",
+                        help="Usa o mesmo modelo em todos os estágios")
+    parser.add_argument("--stage-model", action="append", metavar="ESTAGIO=MODELO[,MODELO...]",
+                        help="Escada de modelos do estágio, do mais barato ao mais capaz (repetível)")
+    parser.add_argument("--stage-budget", action="append", metavar="ESTAGIO=SEGUNDOS",
+                        help="Orçamento de latência por chamada do estágio (repetível)")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Repete no outro provedor as chamadas que passarem do percentil de latência")
+    parser.add_argument("--hedge-percentile", type=float, default=None,
+                        help="Percentil da latência observada que dispara o hedge (padrão 95)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Expõe métricas Prometheus em http://localhost:<porta>/metrics")
+    parser.add_argument("--metrics-file", type=Path, default=None,
+                        help="Grava as métricas Prometheus no arquivo ao final (textfile collector)")
+    parser.add_argument("--deadline", type=float, default=DEFAULT_DEADLINE, metavar="SEGUNDOS",
+                        help="Prazo por requisito; estágios que estouram usam o fallback (BPM_DEADLINE_SECONDS)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        summary = asyncio.run(run_batch(
+            args.input, args.output, workers=args.workers,
+            use_cache=not args.no_cache, max_concurrency=args.max_concurrency,
+            use_templates=not args.no_templates, metrics_port=args.metrics_port,
+            metrics_file=args.metrics_file, routing=not args.no_routing,
+            stage_models=args.stage_model, stage_budgets=args.stage_budget,
+            hedge=args.hedge, hedge_percentile=args.hedge_percentile,
+            deadline=args.deadline
+        ))
+        if summary is None:
+            sys.exit(1)
+        print_summary(summary)
+        if args.summary:
+            args.summary.write_text(json.dumps(summary, indent=2, ensure_ascii=False), encoding="utf-8")
+    except KeyboardInterrupt:
+        console.print(f"\n[yellow]⚠️ Lote interrompido; resultados parciais em {args.output}[/yellow]")
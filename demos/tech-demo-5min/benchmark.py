@@ -0,0 +1,567 @@
+#!/usr/bin/env python3
+"""
+BPM AI Solution - Benchmark offline
+Roda o pipeline completo com um chat model falso e determinístico (latência
+configurável, saídas válidas/inválidas e falhas injetadas), sem custo de API
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from rich.table import Table
+
+from bpm_complete_workflow import (
+    console,
+    build_workflow_scheduler,
+    parse_analysis_json,
+    RequirementAnalyzerAgent,
+    EnhancedProcessDesignerAgent,
+    FormBuilderAgent,
+    EnhancedCodeGeneratorAgent,
+    ProcessDefinition,
+    FormDefinition,
+)
+from batch_workflow import GENERATION_STAGES, percentile
+from code_stream import CodeFenceExtractor, extract_code_block
+from json_extract import JSONObjectExtractor, extract_json, extract_json_objects
+from llm_client import LLMClientPool
+from rate_limiter import estimate_tokens
+from template_library import DEFAULT_TEMPLATES_DIR, TemplateLibrary
+from tracing import get_tracer
+
+FAKE_PROVIDER = "fake"
+FAKE_MODEL = "fake-chat-model"
+
+# O limiter do provedor falso não deve interferir na medição (sobrescreva para testá-lo)
+os.environ.setdefault("BPM_FAKE_RPM", "100000000")
+os.environ.setdefault("BPM_FAKE_TPM", "100000000000")
+
+# ===================== SAÍDAS CANÔNICAS =====================
+
+_TEMPLATE = json.loads((DEFAULT_TEMPLATES_DIR / "aprovacao_despesas.json").read_text(encoding="utf-8"))
+
+CANNED_ANALYSIS = {
+    "domain": "Financeiro - Despesas Corporativas",
+    "stakeholders": ["Solicitante", "Gestor", "Diretor", "CFO"],
+    "business_rules": ["Até R$ 500 aprovação do gestor", "Acima de R$ 5.000 aprovação do CFO"],
+    "functional_requirements": ["Submeter despesa", "Aprovar em níveis", "Notificar por email"],
+    "non_functional_requirements": ["Auditoria completa", "Tempo de resposta < 2s"],
+    "estimated_complexity": "Média",
+    "compliance_considerations": ["SOX", "Política interna de despesas"],
+    "recommended_approach": "Workflow com gateways exclusivos por faixa de valor",
+}
+
+CANNED_BACKEND = '''from fastapi import FastAPI
+import uvicorn
+
+app = FastAPI(title="Aprovação de Despesas")
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@app.post("/api/processes/{process_id}/start")
+async def start(process_id: str, payload: dict):
+    return {"instance_id": "1", "status": "started", "data": payload}
+
+@app.get("/api/processes/{process_id}/tasks")
+async def tasks(process_id: str):
+    return []
+
+@app.post("/api/processes/{process_id}/tasks/{task_id}/complete")
+async def complete(process_id: str, task_id: str):
+    return {"task_id": task_id, "status": "completed"}
+
+@app.get("/api/processes/{process_id}/status")
+async def status(process_id: str):
+    return {"status": "running"}
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=8000)
+'''
+
+CANNED_FRONTEND = '''<!DOCTYPE html>
+<html lang="pt-BR">
+<head><meta charset="UTF-8"><title>Aprovação de Despesas</title></head>
+<body>
+  <form id="form"><input name="valor" type="number" required><button>Enviar</button></form>
+  <script>
+    document.getElementById("form").onsubmit = async (e) => {
+      e.preventDefault();
+      await fetch("http://localhost:8000/submit", {method: "POST", body: JSON.stringify({})});
+    };
+  </script>
+</body>
+</html>
+'''
+
+
+def canned_text(kind: str) -> str:
+    """Resposta textual válida, no formato que o modelo real costuma devolver"""
+    if kind == "analysis":
+        return f"Segue a análise:\n{json.dumps(CANNED_ANALYSIS, ensure_ascii=False, indent=2)}\n"
+    if kind == "backend":
+        return f"Aqui está o backend:\n```python\n{CANNED_BACKEND}```\n"
+    return f"Aqui está o frontend:\n```html\n{CANNED_FRONTEND}```\n"
+
+
+# ===================== CHAT MODEL FALSO =====================
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Distribuição de latência em segundos: fixed:S, uniform:A:B, exp:MEDIA, lognormal:MEDIANA:SIGMA"""
+    kind, _, rest = spec.partition(":")
+    values = [float(v) for v in rest.split(":") if v]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "exp" and len(values) == 1:
+        return lambda rng: rng.expovariate(1 / values[0]) if values[0] > 0 else 0.0
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Distribuição de latência inválida: {spec}")
+
+
+class FakeLLMError(Exception):
+    """Falha injetada pelo chat model falso"""
+
+
+class FakeRateLimitError(FakeLLMError):
+    status_code = 429
+
+
+class FakeMessage:
+    def __init__(self, content: str, tool_calls: List[Dict[str, Any]], usage_metadata: Dict[str, int]):
+        self.content = content
+        self.tool_calls = tool_calls
+        self.usage_metadata = usage_metadata
+
+
+class FakeChatModel:
+    """Substituto de ChatAnthropic/ChatOpenAI com a interface usada pelo LLMClientPool
+
+    A resposta é escolhida pelo tipo de chamada (ferramenta forçada ou prompt
+    de sistema). `invalid_rate` devolve saídas que falham no parse e
+    `error_rate`/`rate_limit_rate` levantam exceções, exercitando os fallbacks
+    e o backoff dos agentes. Sorteios usam um RNG com semente fixa.
+    """
+
+    def __init__(self, latency: str = "lognormal:0.8:0.5", invalid_rate: float = 0.0,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, seed: int = 42,
+                 stream_chunks: int = 20):
+        self.latency_spec = latency
+        self.latency = parse_latency(latency)
+        self.invalid_rate = invalid_rate
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.stream_chunks = stream_chunks
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.simulated_seconds = 0.0
+
+    def bind(self, **kwargs) -> "FakeRunnable":
+        return FakeRunnable(self, None)
+
+    def bind_tools(self, tools: List[Any], tool_choice: Optional[str] = None, **kwargs) -> "FakeRunnable":
+        return FakeRunnable(self, tool_choice or tools[0].__name__)
+
+    def _classify(self, messages: List[Any], tool: Optional[str]) -> str:
+        if tool == "ProcessDefinition":
+            return "process"
+        if tool == "FormDefinition":
+            return "form"
+        system = str(getattr(messages[0], "content", messages[0])) if messages else ""
+        if "analista de negócios" in system:
+            return "analysis"
+        return "backend" if "FastAPI" in system else "frontend"
+
+    def _draw(self):
+        # Um único ponto de sorteio por chamada mantém a sequência reproduzível
+        delay = max(self.latency(self.rng), 0.0)
+        roll = self.rng.random()
+        self.calls += 1
+        self.simulated_seconds += delay
+        return delay, roll
+
+    def _respond(self, messages: List[Any], tool: Optional[str], roll: float) -> FakeMessage:
+        if roll < self.rate_limit_rate:
+            raise FakeRateLimitError("429 injetado")
+        roll -= self.rate_limit_rate
+        if roll < self.error_rate:
+            raise FakeLLMError("Falha injetada")
+        invalid = roll - self.error_rate < self.invalid_rate
+
+        kind = self._classify(messages, tool)
+        tool_calls: List[Dict[str, Any]] = []
+        if invalid:
+            content = "Desculpe, não consegui gerar a resposta no formato pedido."
+        elif kind in ("process", "form"):
+            content = ""
+            tool_calls = [{"name": tool, "args": _TEMPLATE[kind], "id": f"call_{self.calls}"}]
+        else:
+            content = canned_text(kind)
+
+        output = len(content) + len(json.dumps(tool_calls))
+        usage = {"input_tokens": estimate_tokens(messages), "output_tokens": math.ceil(output / 3.5)}
+        return FakeMessage(content, tool_calls, usage)
+
+
+class FakeRunnable:
+    """Chat model "vinculado" (temperatura/max_tokens ignorados, ferramenta opcional)"""
+
+    def __init__(self, model: FakeChatModel, tool: Optional[str]):
+        self.model = model
+        self.tool = tool
+
+    def bind(self, **kwargs) -> "FakeRunnable":
+        return self
+
+    async def ainvoke(self, messages: List[Any]) -> FakeMessage:
+        delay, roll = self.model._draw()
+        await asyncio.sleep(delay)
+        return self.model._respond(messages, self.tool, roll)
+
+    async def astream(self, messages: List[Any]):
+        delay, roll = self.model._draw()
+        message = self.model._respond(messages, self.tool, roll)
+        content = message.content
+        size = max(1, math.ceil(len(content) / self.model.stream_chunks))
+        for i in range(0, len(content), size):
+            await asyncio.sleep(delay / self.model.stream_chunks)
+            last = i + size >= len(content)
+            yield FakeMessage(content[i:i + size], [], message.usage_metadata if last else {})
+
+
+class FakeClientPool(LLMClientPool):
+    """Pool que entrega o chat model falso a todos os agentes"""
+
+    def __init__(self, fake: FakeChatModel, max_concurrency: int = 1000):
+        super().__init__(max_concurrency)
+        self.fake = fake
+
+    def get(self, api_key: str, model: str) -> Any:
+        self._providers[id(self.fake)] = FAKE_PROVIDER
+        return self.fake
+
+
+# ===================== CENÁRIOS =====================
+
+REQUIREMENTS = [example for path in sorted(DEFAULT_TEMPLATES_DIR.glob("*.json"))
+                for example in json.loads(path.read_text(encoding="utf-8"))["examples"]]
+
+
+def build_agents(fake: FakeChatModel, use_templates: bool = False) -> List[Any]:
+    pool = FakeClientPool(fake)
+    templates = TemplateLibrary.load() if use_templates else None
+    return [
+        RequirementAnalyzerAgent("fake", FAKE_MODEL, client_pool=pool),
+        EnhancedProcessDesignerAgent("fake", FAKE_MODEL, client_pool=pool, templates=templates),
+        FormBuilderAgent("fake", FAKE_MODEL, client_pool=pool, templates=templates),
+        EnhancedCodeGeneratorAgent("fake", FAKE_MODEL, client_pool=pool),
+    ]
+
+
+async def run_pipelines(agents: List[Any], total: int, concurrency: int) -> Dict[str, Any]:
+    """Executa `total` pipelines com no máximo `concurrency` simultâneos"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    stage_times: Dict[str, List[float]] = {name: [] for name in GENERATION_STAGES}
+    stage_failures = {name: 0 for name in GENERATION_STAGES}
+    stage_fallbacks = {name: 0 for name in GENERATION_STAGES}
+    ok = 0
+
+    async def pipeline(index: int):
+        nonlocal ok
+        async with semaphore:
+            requirement = REQUIREMENTS[index % len(REQUIREMENTS)]
+            scheduler = build_workflow_scheduler(requirement, *agents, stream=False)
+            start = time.perf_counter()
+            results = await scheduler.run()
+            latencies.append(time.perf_counter() - start)
+        if all(result.ok for result in results.values()):
+            ok += 1
+        for name, result in results.items():
+            if result.ok:
+                stage_times[name].append(result.duration)
+            else:
+                stage_failures[name] += 1
+            stage_fallbacks[name] += int(result.fallback)
+
+    for agent in agents:
+        agent.fallbacks = 0
+    started = time.perf_counter()
+    await asyncio.gather(*(pipeline(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "pipelines": total,
+        "concurrency": concurrency,
+        "ok": ok,
+        "elapsed_seconds": elapsed,
+        "pipelines_per_second": total / elapsed if elapsed else 0.0,
+        "latency": {f"p{p}": percentile(latencies, p) for p in (50, 95, 99)},
+        "stages": {
+            name: {
+                "p50": percentile(times, 50),
+                "p95": percentile(times, 95),
+                "failures": stage_failures[name],
+                "fallbacks": stage_fallbacks[name],
+            }
+            for name, times in stage_times.items()
+        },
+        "agent_fallbacks": {agent.name: agent.fallbacks for agent in agents},
+    }
+
+
+def bench_parsers(iterations: int) -> Dict[str, Dict[str, float]]:
+    """Tempo médio (µs) dos parsers aplicados às respostas do LLM"""
+    analysis_text = canned_text("analysis")
+    backend_text = canned_text("backend")
+    chunks = [backend_text[i:i + 16] for i in range(0, len(backend_text), 16)]
+
+    def stream_extract():
+        extractor = CodeFenceExtractor()
+        for chunk in chunks:
+            extractor.feed(chunk)
+        return extractor.finish()
+
+    cases = {
+        "analysis_json": lambda: parse_analysis_json(analysis_text),
+        "process_definition": lambda: ProcessDefinition.parse_obj(_TEMPLATE["process"]),
+        "form_definition": lambda: FormDefinition.parse_obj(_TEMPLATE["form"]),
+        "code_block": lambda: extract_code_block(backend_text),
+        "code_fence_stream": stream_extract,
+    }
+    results = {}
+    for name, func in cases.items():
+        func()  # Aquecimento
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        elapsed = time.perf_counter() - start
+        results[name] = {"mean_us": elapsed / iterations * 1e6, "iterations": iterations}
+    return results
+
+
+def bench_json_extraction(size_mb: float, chunk_size: int = 64) -> Dict[str, Any]:
+    """Extração de JSON em uma resposta prolixa de vários MB: regex guloso vs. extrator"""
+    # Metade JSON, metade prosa com chaves soltas antes e depois do objeto
+    entry = {"step": 0, "note": 'revisão {interna} "ok"'}
+    entries = max(int(size_mb * 1_000_000 / 2 / len(json.dumps(entry, ensure_ascii=False))), 1)
+    payload = dict(CANNED_ANALYSIS, history=[dict(entry, step=i) for i in range(entries)])
+    prose = "Considerando o contexto {rascunho}, a análise segue abaixo. " * max(int(size_mb * 4000), 1)
+    text = f"{prose}```json\n{json.dumps(payload, ensure_ascii=False)}\n```\n{prose}Fim }}"
+
+    results: Dict[str, Any] = {"size_mb": len(text) / 1_000_000}
+
+    start = time.perf_counter()
+    match = re.search(r'\{.*\}', text, re.DOTALL)
+    try:
+        json.loads(match.group())
+        results["legacy_regex_ok"] = True
+    except (AttributeError, ValueError):
+        results["legacy_regex_ok"] = False
+    results["legacy_regex_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    extracted = extract_json(text, required_keys=("domain",))
+    results["extractor_seconds"] = time.perf_counter() - start
+    results["extractor_ok"] = len(extracted["history"]) == len(payload["history"])
+
+    extractor = JSONObjectExtractor()
+    start = time.perf_counter()
+    found = []
+    for i in range(0, len(text), chunk_size):
+        found.extend(extractor.feed(text[i:i + chunk_size]))
+    found.extend(extractor.finish())
+    results["streamed_seconds"] = time.perf_counter() - start
+    results["streamed_ok"] = found == [payload]
+    results["chunk_size"] = chunk_size
+
+    # Respostas hostis do mesmo tamanho: candidatos inválidos repetidos,
+    # aberturas que nunca fecham e aninhamento profundo
+    unit = max(int(size_mb * 1_000_000), 1)
+    results["adversarial"] = {}
+    for name, piece in (("invalid_objects", '{"a" } '), ("unclosed_strings", '{"'), ("deep_nesting", '{"a":[')):
+        hostile = piece * max(unit // len(piece), 1) + "x"
+        start = time.perf_counter()
+        extract_json_objects(hostile)
+        results["adversarial"][name] = time.perf_counter() - start
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=Path(__file__).resolve().parent, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+async def run_benchmark(latency: str, concurrency_levels: List[int], pipelines: int,
+                        failure_rates: List[float], parser_iterations: int, seed: int,
+                        use_templates: bool = False, json_mb: float = 4.0) -> Dict[str, Any]:
+    """Executa todos os cenários e retorna o relatório em formato serializável"""
+    tracer = get_tracer()
+    report: Dict[str, Any] = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "latency": latency,
+            "seed": seed,
+            "templates": use_templates,
+        },
+    }
+
+    console.print("[cyan]⏱️ Parsers...[/cyan]")
+    report["parsers"] = bench_parsers(parser_iterations)
+    if json_mb > 0:
+        console.print(f"[cyan]🧩 Extração de JSON em {json_mb:g} MB...[/cyan]")
+        report["json_extraction"] = bench_json_extraction(json_mb)
+
+    # Latência zero: o tempo restante é orquestração + parse + renderização de prompts
+    console.print("[cyan]⚙️ Overhead de orquestração...[/cyan]")
+    fake = FakeChatModel(latency="fixed:0", seed=seed)
+    tracer.traces.clear()
+    overhead = await run_pipelines(build_agents(fake, use_templates), pipelines, 1)
+    overhead["llm_calls"] = fake.calls
+    overhead["per_call_us"] = overhead["elapsed_seconds"] / max(fake.calls, 1) * 1e6
+    report["overhead"] = overhead
+
+    report["throughput"] = []
+    for concurrency in concurrency_levels:
+        console.print(f"[cyan]🚀 Throughput com {concurrency} pipelines simultâneos...[/cyan]")
+        fake = FakeChatModel(latency=latency, seed=seed)
+        tracer.traces.clear()
+        result = await run_pipelines(build_agents(fake, use_templates), max(pipelines, concurrency), concurrency)
+        result["llm_calls"] = fake.calls
+        result["simulated_llm_seconds"] = fake.simulated_seconds
+        result["queue_wait_seconds"] = sum(t.queue_wait_seconds for t in tracer.traces)
+        report["throughput"].append(result)
+
+    report["failures"] = []
+    quiet = console.quiet
+    console.quiet = True  # Fallbacks imprimem erros; silenciar durante a injeção
+    try:
+        for rate in failure_rates:
+            fake = FakeChatModel(latency=latency, invalid_rate=rate / 2, error_rate=rate / 2, seed=seed)
+            tracer.traces.clear()
+            result = await run_pipelines(build_agents(fake, use_templates), pipelines, min(10, pipelines))
+            result["failure_rate"] = rate
+            result["llm_calls"] = fake.calls
+            report["failures"].append(result)
+    finally:
+        console.quiet = quiet
+
+    return report
+
+
+def print_report(report: Dict[str, Any]):
+    """Resumo legível do relatório"""
+    table = Table(show_header=True, title="⏱️ Parsers")
+    table.add_column("Parser", style="cyan")
+    table.add_column("Média", style="green")
+    for name, item in report["parsers"].items():
+        table.add_row(name, f"{item['mean_us']:.1f} µs")
+    console.print(table)
+
+    extraction = report.get("json_extraction")
+    if extraction:
+        legacy = "ok" if extraction["legacy_regex_ok"] else "falhou"
+        console.print(
+            f"[bold]🧩 JSON em {extraction['size_mb']:.1f} MB:[/bold] "
+            f"regex guloso {extraction['legacy_regex_seconds'] * 1000:.0f} ms ({legacy}), "
+            f"extrator {extraction['extractor_seconds'] * 1000:.0f} ms, "
+            f"streaming em chunks de {extraction['chunk_size']} B {extraction['streamed_seconds'] * 1000:.0f} ms"
+        )
+        hostile = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in extraction["adversarial"].items())
+        console.print(f"[dim]   ↳ entradas hostis: {hostile}[/dim]")
+
+    overhead = report["overhead"]
+    console.print(
+        f"[bold]⚙️ Overhead:[/bold] p50 {overhead['latency']['p50'] * 1000:.2f} ms por pipeline, "
+        f"{overhead['per_call_us']:.0f} µs por chamada LLM"
+    )
+
+    table = Table(show_header=True, title="🚀 Throughput")
+    table.add_column("Concorrência", style="cyan")
+    table.add_column("Pipelines/s", style="green")
+    table.add_column("p50", style="green")
+    table.add_column("p95", style="yellow")
+    table.add_column("p99", style="red")
+    table.add_column("Fila", style="magenta")
+    for item in report["throughput"]:
+        table.add_row(
+            str(item["concurrency"]), f"{item['pipelines_per_second']:.2f}",
+            f"{item['latency']['p50']:.2f}s", f"{item['latency']['p95']:.2f}s",
+            f"{item['latency']['p99']:.2f}s", f"{item['queue_wait_seconds']:.1f}s"
+        )
+    console.print(table)
+
+    table = Table(show_header=True, title="🧯 Falhas injetadas")
+    table.add_column("Taxa", style="cyan")
+    table.add_column("Pipelines OK", style="green")
+    table.add_column("Fallbacks por agente", style="yellow")
+    for item in report["failures"]:
+        fallbacks = ", ".join(f"{name}: {count}" for name, count in item["agent_fallbacks"].items())
+        table.add_row(f"{item['failure_rate']:.0%}", f"{item['ok']}/{item['pipelines']}", fallbacks)
+    console.print(table)
+
+
+def parse_args():
+    """Argumentos de linha de comando do benchmark"""
+    parser = argparse.ArgumentParser(description="BPM AI Solution - Benchmark offline")
+    parser.add_argument("--latency", default="lognormal:0.8:0.5",
+                        help="Latência por chamada: fixed:S, uniform:A:B, exp:MEDIA ou lognormal:MEDIANA:SIGMA")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100],
+                        help="Níveis de pipelines simultâneos")
+    parser.add_argument("--pipelines", type=int, default=20,
+                        help="Pipelines por cenário (no mínimo a concorrência)")
+    parser.add_argument("--failure-rates", type=float, nargs="+", default=[0.1, 0.3],
+                        help="Taxas de falha injetada (metade inválida, metade exceção)")
+    parser.add_argument("--parser-iterations", type=int, default=2000)
+    parser.add_argument("--json-mb", type=float, default=4.0,
+                        help="Tamanho da resposta no benchmark de extração de JSON (0 desativa)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--templates", action="store_true",
+                        help="Usa a biblioteca de templates (menos chamadas ao modelo)")
+    parser.add_argument("-o", "--output", type=Path, default=Path("benchmark_results.json"),
+                        help="Relatório JSON da execução")
+    parser.add_argument("--history", type=Path, default=None,
+                        help="JSONL ao qual o relatório é anexado para acompanhar a evolução")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        report = asyncio.run(run_benchmark(
+            args.latency, args.concurrency, args.pipelines, args.failure_rates,
+            args.parser_iterations, args.seed, use_templates=args.templates, json_mb=args.json_mb
+        ))
+    except ValueError as e:
+        console.print(f"[red]❌ {e}[/red]")
+        sys.exit(1)
+
+    print_report(report)
+    args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    if args.history:
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(report, ensure_ascii=False) + "\n")
+    console.print(f"[green]✅ Relatório gravado em {args.output}[/green]")
@@ -5,6 +5,7 @@ Demonstração end-to-end: Requisito → Análise → Código → Execução
 """
 
 import asyncio
+import copy
 import json
 import os
 import sys
@@ -13,29 +14,48 @@ import tempfile
 import threading
 import time
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any, List, Optional
-import uvicorn
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple, TYPE_CHECKING
+import argparse
+from contextlib import aclosing
 import shutil
 
-# LangChain imports
-from langchain_anthropic import ChatAnthropic
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
-from langchain_core.output_parsers import PydanticOutputParser
-from langchain_core.pydantic_v1 import BaseModel, Field
+# Modelos Pydantic v1 (mesmo que langchain_core.pydantic_v1, sem importar o LangChain)
+try:
+    from pydantic.v1 import BaseModel, Field
+except ImportError:
+    from pydantic import BaseModel, Field
 
 # Rich for beautiful output
 from rich.console import Console
-from rich.panel import Panel
-from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn
-from rich.syntax import Syntax
-from rich.table import Table
-from rich.live import Live
-from rich.layout import Layout
-from rich.align import Align
-from rich.text import Text
-import webbrowser
+
+# LangChain, provedores e demais módulos pesados são importados sob demanda,
+# no primeiro agente/estágio que precisa deles
+if TYPE_CHECKING:
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import PydanticOutputParser
+
+from llm_cache import LLMResponseCache, make_cache_key
+from llm_client import LLMClientPool, get_default_pool, configure_default_pool, chunk_text
+from rate_limiter import all_rate_limiters, estimate_tokens
+from stage_scheduler import StageScheduler, current_stage, mark_deadline_exceeded, mark_fallback
+from stage_store import StageStore
+from template_library import TemplateLibrary
+from code_stream import CodeFenceExtractor, extract_code_block
+from json_extract import extract_json, required_fields
+from tracing import Tracer, get_tracer, last_trace, mark_trace_fallback
+from model_router import ModelRouter
+from hedging import RequestHedger
+from run_checkpoint import RunCheckpoint
+from deadline import DEFAULT_DEADLINE, DeadlineExceeded, RequestDeadline, within_deadline
+from venv_pool import DEFAULT_DEPENDENCIES, VenvPool
+from app_launcher import AppStartError, LaunchedApp, launch_app
+from app_host import DEFAULT_HOST_URL, AppLoadError, app_url, host_load, unload_from_host
+from code_validation import validate_backend
+from load_test import DEFAULT_MAX_P95_MS, LoadTestConfig, run_load_test
+from static_server import DEFAULT_FRONTEND_HOST, DEFAULT_FRONTEND_PORT, FrontendServer
+from artifact_store import ArtifactStore
 
 from dotenv import load_dotenv, find_dotenv
 _ = load_dotenv(find_dotenv())
@@ -93,26 +113,280 @@ class GeneratedCode(BaseModel):
 
 # ===================== ENHANCED AGENTS =====================
 
-class RequirementAnalyzerAgent:
-    """Agent que analisa e enriquece requisitos usando LangChain"""
+@lru_cache(maxsize=None)
+def compact_tool_schema(schema: type) -> str:
+    """Definição da ferramenta para `schema` em JSON compacto (como enviada ao provedor)"""
+    from langchain_core.utils.function_calling import convert_to_openai_tool
+    return json.dumps(convert_to_openai_tool(schema), ensure_ascii=False, separators=(",", ":"))
+
+@lru_cache(maxsize=None)
+def schema_format_tokens(schema: type) -> Tuple[int, int]:
+    """Tokens estimados de `schema` como instruções de formato no prompt e
+    como ferramenta compacta (calculados uma vez por classe)"""
+    from langchain_core.output_parsers import PydanticOutputParser
+    instructions = PydanticOutputParser(pydantic_object=schema).get_format_instructions()
+    return estimate_tokens([instructions]), estimate_tokens([compact_tool_schema(schema)])
+
+class LLMAgent:
+    """Base dos agentes: criação do LLM e invocação com cache de respostas"""
     
-    def __init__(self, api_key: str, model: str = "claude-sonnet-4-20250514"):
-        self.name = "Requirement Analyzer"
+    default_stage = ""  # Estágio do roteador quando chamado fora do scheduler
+    
+    def __init__(self, api_key: str, model: str, temperature: float = 0.1,
+                 max_tokens: Optional[int] = None, cache: Optional[LLMResponseCache] = None,
+                 client_pool: Optional[LLMClientPool] = None, tracer: Optional[Tracer] = None,
+                 router: Optional[ModelRouter] = None, hedger: Optional[RequestHedger] = None):
+        self.model = model
+        self.router = router
+        self.hedger = hedger
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.cache = cache
+        self.fallbacks = 0  # Respostas substituídas pelo fallback do agente
+        self.prompt_tokens: Dict[str, int] = {}  # Estimativa do último prompt estruturado
+        self.tracer = tracer or get_tracer()
         
-        if "claude" in model.lower():
-            self.llm = ChatAnthropic(
-                anthropic_api_key=api_key,
-                model=model,
-                temperature=0.1,
-                max_tokens=2000
+        # Cliente compartilhado por provedor/modelo (conexões reaproveitadas entre agentes)
+        self.client_pool = client_pool or get_default_pool()
+        self.llm = self.client_pool.get(api_key, model)
+
+    def _stage_name(self) -> str:
+        stage = current_stage.get()
+        return stage.name if stage is not None else self.default_stage
+
+    def _trace(self, model: str):
+        """Span de tracing da chamada, rotulado com o agente e o estágio atual"""
+        stage = current_stage.get()
+        return self.tracer.span(getattr(self, "name", type(self).__name__), model,
+                                stage.name if stage is not None else "")
+
+    def _client(self, model: str) -> Any:
+        if model == self.model:
+            return self.llm
+        keys = self.router if self.router is not None else self.hedger
+        return self.client_pool.get(keys.api_key(model), model)
+
+    async def _call(self, model: str, call: Callable[[str], Awaitable[Any]]) -> Any:
+        """Uma tentativa no modelo, com hedge no outro provedor quando habilitado"""
+        if self.hedger is None:
+            return await call(model)
+        return await self.hedger.run(self._stage_name(), model, call)
+
+    def models_for(self, stage: str) -> List[str]:
+        """Modelos que podem responder pelo estágio (entra na chave de memoização)"""
+        return self.router.ladder(stage) if self.router is not None else [self.model]
+
+    async def _routed(self, call: Callable[[str], Awaitable[Any]]) -> Any:
+        """Executa `call(model)` subindo a escada do estágio enquanto a saída for inválida"""
+        if self.router is None:
+            return await self._call(self.model, call)
+        
+        stage = self._stage_name()
+        models = self.router.candidates(stage)
+        for index, model in enumerate(models):
+            start = time.perf_counter()
+            try:
+                result = await self._call(model, call)
+            except Exception as e:
+                self.router.record(stage, model, ok=False)
+                if index == len(models) - 1:
+                    raise
+                self.router.record_escalation(stage)
+                console.print(f"[yellow]⤴️ {stage}: {model} falhou ({e}); escalando para {models[index + 1]}[/yellow]")
+                continue
+            
+            trace = last_trace.get()
+            elapsed = None if trace is not None and trace.cached else time.perf_counter() - start
+            self.router.record(stage, model, ok=True, seconds=elapsed)
+            return result
+
+    async def _within_deadline(self, call: Awaitable[Any]) -> Any:
+        """Limita a chamada ao prazo do estágio; ao estourar, ela é cancelada e o agente usa o fallback"""
+        try:
+            return await within_deadline(call)
+        except DeadlineExceeded:
+            mark_deadline_exceeded()
+            raise
+
+    def _record_fallback(self):
+        """Contabiliza uma resposta de fallback no agente, no estágio e no trace"""
+        self.fallbacks += 1
+        mark_fallback()
+        mark_trace_fallback()
+
+    def _render(self, prompt: "ChatPromptTemplate", variables: Dict[str, Any],
+                schema: Optional[type] = None, model: Optional[str] = None):
+        """Renderiza as mensagens e calcula a chave de cache correspondente"""
+        messages = prompt.format_messages(**variables)
+        key_parts = [(message.type, message.content) for message in messages]
+        if schema is not None:
+            key_parts.append(("tool", compact_tool_schema(schema)))
+        key = make_cache_key(model or self.model, self.temperature, self.max_tokens, key_parts)
+        return messages, key
+
+    async def _invoke(self, prompt: "ChatPromptTemplate", variables: Dict[str, Any],
+                      parse: Optional[Callable[[str], Any]] = None) -> Any:
+        """Renderiza o prompt, consulta o cache e invoca o LLM
+        
+        Respostas só entram no cache depois de passarem pelo `parse`, para que
+        uma saída inválida não seja reaproveitada em execuções futuras. Com
+        roteador, uma falha no `parse` escala para o próximo modelo do estágio.
+        """
+        return await self._within_deadline(
+            self._routed(lambda model: self._invoke_model(model, prompt, variables, parse))
+        )
+
+    async def _invoke_model(self, model: str, prompt: "ChatPromptTemplate", variables: Dict[str, Any],
+                            parse: Optional[Callable[[str], Any]] = None) -> Any:
+        async with self._trace(model) as trace:
+            messages, key = self._render(prompt, variables, model=model)
+            
+            if self.cache is not None:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    try:
+                        parsed = parse(cached) if parse else cached
+                        trace.cached = True
+                        return parsed
+                    except Exception:
+                        pass  # Entrada inválida: gerar novamente
+            
+            result = await self.client_pool.ainvoke(
+                self._client(model), messages, temperature=self.temperature, max_tokens=self.max_tokens
             )
-        else:
-            self.llm = ChatOpenAI(
-                openai_api_key=api_key,
-                model=model,
-                temperature=0.1,
-                max_tokens=2000
+            content = result.content
+            parsed = parse(content) if parse else content
+            
+            if self.cache is not None:
+                self.cache.set(key, model, content)
+            
+            return parsed
+
+    async def _invoke_structured(self, prompt: "ChatPromptTemplate", variables: Dict[str, Any],
+                                 schema: type, fallback_parser: Optional["PydanticOutputParser"] = None) -> Any:
+        """Invoca o LLM com tool calling nativo forçado para `schema`
+        
+        O schema vai uma única vez, compacto, na definição da ferramenta em vez
+        de instruções de formato no prompt. Se o modelo responder em texto, o
+        JSON embutido é extraído e, por último, o `fallback_parser` é tentado.
+        Com roteador, uma resposta que não valida contra o schema escala para
+        o próximo modelo do estágio.
+        """
+        return await self._within_deadline(self._routed(
+            lambda model: self._invoke_structured_model(model, prompt, variables, schema, fallback_parser)
+        ))
+
+    async def _invoke_structured_model(self, model: str, prompt: "ChatPromptTemplate",
+                                       variables: Dict[str, Any], schema: type,
+                                       fallback_parser: Optional["PydanticOutputParser"] = None) -> Any:
+        async with self._trace(model) as trace:
+            messages, key = self._render(prompt, variables, schema, model)
+            
+            # Comparativo de tokens: instruções de formato no prompt vs. ferramenta compacta
+            prompt_tokens = estimate_tokens(messages)
+            format_tokens, tool_tokens = schema_format_tokens(schema)
+            self.prompt_tokens = {
+                "format_instructions": prompt_tokens + format_tokens,
+                "structured": prompt_tokens + tool_tokens,
+            }
+            
+            if self.cache is not None:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    try:
+                        parsed = schema.parse_raw(cached)
+                        trace.cached = True
+                        return parsed
+                    except Exception:
+                        pass  # Entrada inválida: gerar novamente
+            
+            result = await self.client_pool.ainvoke(
+                self._client(model), messages, temperature=self.temperature, max_tokens=self.max_tokens,
+                schema=schema
             )
+            
+            tool_calls = getattr(result, "tool_calls", None) or []
+            if tool_calls:
+                parsed = schema.parse_obj(tool_calls[0]["args"])
+            elif chunk_text(result.content).strip():
+                parsed = self._parse_text_response(chunk_text(result.content), schema, fallback_parser)
+            else:
+                raise ValueError(f"Modelo não chamou a ferramenta {schema.__name__}")
+            
+            if self.cache is not None:
+                self.cache.set(key, model, parsed.json())
+            
+            return parsed
+
+    @staticmethod
+    def _parse_text_response(content: str, schema: type,
+                             fallback_parser: Optional["PydanticOutputParser"] = None) -> Any:
+        """Interpreta uma resposta em texto: JSON embutido na prosa, depois o `fallback_parser`"""
+        try:
+            return schema.parse_obj(extract_json(content, required_keys=required_fields(schema)))
+        except Exception:
+            if fallback_parser is None:
+                raise
+        return fallback_parser.parse(content)
+
+    async def _stream(self, prompt: "ChatPromptTemplate", variables: Dict[str, Any],
+                      on_text: Callable[[str], bool]) -> str:
+        """Transmite a resposta do LLM para `on_text`, que retorna True para encerrar
+        
+        Encerrar cedo cancela o restante da geração; o conteúdo recebido até
+        ali é o que vai para o cache. Com roteador, usa o primeiro candidato do
+        estágio, sem escalonar (o texto já foi entregue a `on_text`).
+        """
+        model = self.router.candidates(self._stage_name())[0] if self.router is not None else self.model
+        return await self._within_deadline(self._stream_model(model, prompt, variables, on_text))
+
+    async def _stream_model(self, model: str, prompt: "ChatPromptTemplate", variables: Dict[str, Any],
+                            on_text: Callable[[str], bool]) -> str:
+        async with self._trace(model) as trace:
+            messages, key = self._render(prompt, variables, model=model)
+            
+            if self.cache is not None:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    trace.cached = True
+                    on_text(cached)
+                    return cached
+            
+            parts = []
+            stream = self.client_pool.astream(
+                self._client(model), messages, temperature=self.temperature, max_tokens=self.max_tokens
+            )
+            async with aclosing(stream):
+                async for text in stream:
+                    parts.append(text)
+                    if on_text(text):
+                        break
+            content = "".join(parts)
+            
+            if self.cache is not None:
+                self.cache.set(key, model, content)
+            
+            return content
+
+def parse_analysis_json(content: str) -> Dict[str, Any]:
+    """Extrai o JSON da análise a partir da resposta do LLM"""
+    return extract_json(content, required_keys=("domain",))
+
+class RequirementAnalyzerAgent(LLMAgent):
+    """Agent que analisa e enriquece requisitos usando LangChain"""
+    
+    default_stage = "analysis"
+    
+    def __init__(self, api_key: str, model: str = "claude-sonnet-4-20250514",
+                 cache: Optional[LLMResponseCache] = None,
+                 client_pool: Optional[LLMClientPool] = None,
+                 router: Optional[ModelRouter] = None,
+                 hedger: Optional[RequestHedger] = None):
+        super().__init__(api_key, model, temperature=0.1, max_tokens=2000, cache=cache,
+                         client_pool=client_pool, router=router, hedger=hedger)
+        self.name = "Requirement Analyzer"
+        
+        from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
         
         self.prompt = ChatPromptTemplate.from_messages([
             SystemMessagePromptTemplate.from_template(
@@ -157,22 +431,15 @@ class RequirementAnalyzerAgent:
     async def analyze_requirement(self, requirement: str) -> Dict[str, Any]:
         """Analisa requisito e retorna análise estruturada"""
         try:
-            chain = self.prompt | self.llm
-            result = await asyncio.to_thread(
-                chain.invoke,
-                {"requirement": requirement}
+            return await self._invoke(
+                self.prompt,
+                {"requirement": requirement},
+                parse=parse_analysis_json
             )
-            
-            # Parse JSON response
-            import re
-            json_match = re.search(r'\{.*\}', result.content, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
-            else:
-                raise ValueError("No valid JSON found in response")
                 
         except Exception as e:
             console.print(f"[red]Erro na análise: {e}[/red]")
+            self._record_fallback()
             return {
                 "domain": "Processo Corporativo",
                 "stakeholders": ["Usuários", "Gestores", "Administradores"],
@@ -185,26 +452,24 @@ class RequirementAnalyzerAgent:
                 "recommended_approach": "Desenvolvimento incremental"
             }
 
-class EnhancedProcessDesignerAgent:
+class EnhancedProcessDesignerAgent(LLMAgent):
     """Agent melhorado para gerar processos BPMN"""
     
-    def __init__(self, api_key: str, model: str = "claude-sonnet-4-20250514"):
+    default_stage = "process"
+    
+    def __init__(self, api_key: str, model: str = "claude-sonnet-4-20250514",
+                 cache: Optional[LLMResponseCache] = None,
+                 client_pool: Optional[LLMClientPool] = None,
+                 router: Optional[ModelRouter] = None,
+                 hedger: Optional[RequestHedger] = None,
+                 templates: Optional[TemplateLibrary] = None):
+        super().__init__(api_key, model, temperature=0.1, max_tokens=4000, cache=cache,
+                         client_pool=client_pool, router=router, hedger=hedger)
         self.name = "Enhanced Process Designer"
+        self.templates = templates
         
-        if "claude" in model.lower():
-            self.llm = ChatAnthropic(
-                anthropic_api_key=api_key,
-                model=model,
-                temperature=0.1,
-                max_tokens=4000
-            )
-        else:
-            self.llm = ChatOpenAI(
-                openai_api_key=api_key,
-                model=model,
-                temperature=0.1,
-                max_tokens=4000
-            )
+        from langchain_core.output_parsers import PydanticOutputParser
+        from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
         
         self.parser = PydanticOutputParser(pydantic_object=ProcessDefinition)
         
@@ -230,7 +495,7 @@ class EnhancedProcessDesignerAgent:
                 - endEvent: Evento de fim
                 - intermediateCatchEvent: Evento intermediário
                 
-                {format_instructions}"""
+                Retorne o processo chamando a ferramenta ProcessDefinition."""
             ),
             HumanMessagePromptTemplate.from_template(
                 """Com base na seguinte análise de requisitos, gere um processo BPMN detalhado:
@@ -251,17 +516,36 @@ class EnhancedProcessDesignerAgent:
                 - Tratamento de exceções
                 - Integração com sistemas corporativos
                 
-                Gere um processo BPMN completo e otimizado."""
+                Gere um processo BPMN completo e otimizado.{template_example}"""
             )
         ])
-        
-        self.chain = self.prompt | self.llm | self.parser
 
     async def generate_process(self, requirement: str, analysis: Dict[str, Any]) -> ProcessDefinition:
-        """Gera processo BPMN baseado na análise"""
+        """Gera processo BPMN baseado na análise
+        
+        Um template da biblioteca com alta similaridade é devolvido sem chamar o
+        LLM; com similaridade intermediária, entra no prompt como exemplo.
+        """
+        match = self.templates.match(requirement) if self.templates else None
+        if self.templates and self.templates.is_confident(match):
+            console.print(
+                f"[green]📚 Template '{match.template.template_id}' "
+                f"(similaridade {match.score:.2f})[/green]"
+            )
+            result = ProcessDefinition.parse_obj(copy.deepcopy(match.template.process))
+            result.business_rules = analysis.get("business_rules", [])
+            return result
+        
+        template_example = ""
+        if match is not None:
+            template_example = (
+                "\n\nEXEMPLO VALIDADO DE PROCESSO SIMILAR (adapte ao requisito):\n"
+                + json.dumps(match.template.process, ensure_ascii=False)
+            )
+        
         try:
-            result = await asyncio.to_thread(
-                self.chain.invoke,
+            result = await self._invoke_structured(
+                self.prompt,
                 {
                     "original_requirement": requirement,
                     "domain": analysis.get("domain", "N/A"),
@@ -269,8 +553,10 @@ class EnhancedProcessDesignerAgent:
                     "business_rules": ", ".join(analysis.get("business_rules", [])),
                     "complexity": analysis.get("estimated_complexity", "Média"),
                     "compliance": ", ".join(analysis.get("compliance_considerations", [])),
-                    "format_instructions": self.parser.get_format_instructions()
-                }
+                    "template_example": template_example
+                },
+                ProcessDefinition,
+                fallback_parser=self.parser
             )
             
             # Adicionar regras de negócio da análise
@@ -280,6 +566,7 @@ class EnhancedProcessDesignerAgent:
             
         except Exception as e:
             console.print(f"[red]Erro no Process Designer: {e}[/red]")
+            self._record_fallback()
             return ProcessDefinition(
                 process_id="fallback_process",
                 name="Processo de Aprovação",
@@ -303,29 +590,112 @@ class EnhancedProcessDesignerAgent:
                 business_rules=analysis.get("business_rules", [])
             )
 
-class EnhancedCodeGeneratorAgent:
+class EnhancedCodeGeneratorAgent(LLMAgent):
     """Agent melhorado para geração de código full-stack"""
     
-    def __init__(self, api_key: str, model: str = "claude-sonnet-4-20250514"):
+    default_stage = "backend"
+    
+    def __init__(self, api_key: str, model: str = "claude-sonnet-4-20250514",
+                 cache: Optional[LLMResponseCache] = None,
+                 client_pool: Optional[LLMClientPool] = None,
+                 router: Optional[ModelRouter] = None,
+                 hedger: Optional[RequestHedger] = None):
+        super().__init__(api_key, model, temperature=0.1, max_tokens=4000, cache=cache,
+                         client_pool=client_pool, router=router, hedger=hedger)
         self.name = "Enhanced Code Generator"
+        self.repairs = 0  # Regenerações motivadas pela validação estática
+
+    async def _generate_code(self, prompt: "ChatPromptTemplate", variables: Dict[str, Any],
+                             filename: str, output_dir: Optional[Path] = None) -> str:
+        """Gera o código e extrai o bloco cercado por ```
         
-        if "claude" in model.lower():
-            self.llm = ChatAnthropic(
-                anthropic_api_key=api_key,
-                model=model,
-                temperature=0.1,
-                max_tokens=4000
-            )
-        else:
-            self.llm = ChatOpenAI(
-                openai_api_key=api_key,
-                model=model,
-                temperature=0.1,
-                max_tokens=4000
-            )
+        Com `output_dir`, a resposta é transmitida e o arquivo é escrito à medida
+        que o código chega; o stream é encerrado assim que a cerca fecha.
+        """
+        if output_dir is None:
+            return extract_code_block(await self._invoke(prompt, variables))
+        
+        target = Path(output_dir) / filename
+        extractor = CodeFenceExtractor()
+        with open(target, "w", encoding="utf-8") as f:
+            def on_text(text: str) -> bool:
+                code = extractor.feed(text)
+                if code:
+                    f.write(code)
+                    f.flush()
+                return extractor.closed
+            
+            await self._stream(prompt, variables, on_text)
+            code = extractor.finish()
+            
+            # Reescreve com o conteúdo final (resposta sem cerca ou truncada)
+            f.seek(0)
+            f.truncate()
+            f.write(code)
+        
+        return code
 
-    async def generate_executable_backend(self, process_data: ProcessDefinition, form_data: FormDefinition) -> GeneratedCode:
-        """Gera código FastAPI executável"""
+    async def _generate_validated_backend(self, prompt: "ChatPromptTemplate", variables: Dict[str, Any],
+                                          filename: str, output_dir: Optional[Path] = None) -> str:
+        """Gera o backend e o valida estaticamente antes de qualquer deploy
+        
+        Os erros encontrados (sintaxe, imports, endpoints ausentes) voltam ao LLM
+        em uma única regeneração direcionada; se persistirem, a geração falha e
+        o agente usa o fallback. Avisos (endpoint não encontrado num módulo que
+        compila e define `app`) são mostrados, mas não reprovam o código.
+        """
+        from langchain_core.prompts import ChatPromptTemplate
+        
+        code = await self._generate_code(prompt, variables, filename, output_dir)
+        start = time.perf_counter()
+        issues = validate_backend(code, variables["process_id"], filename)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if not any(not issue.warning for issue in issues):
+            self._print_warnings(issues)
+            console.print(f"[dim]🔎 Validação estática do backend: OK ({elapsed_ms:.0f} ms)[/dim]")
+            return code
+        
+        self.repairs += 1
+        errors = "\n".join(f"- {issue}" for issue in issues)
+        console.print(f"[yellow]🔧 Backend reprovado na validação ({len(issues)} problema(s)); regenerando:\n{errors}[/yellow]")
+        repair_prompt = ChatPromptTemplate.from_messages(list(prompt.messages) + [
+            ("ai", "```python\n{previous_code}\n```"),
+            ("human", "O código acima falhou na validação estática:\n{validation_errors}\n\n"
+                      "Corrija exatamente esses problemas, mantendo o restante, e retorne o código Python completo."),
+        ])
+        code = await self._generate_code(
+            repair_prompt, dict(variables, previous_code=code, validation_errors=errors), filename, output_dir
+        )
+        issues = validate_backend(code, variables["process_id"], filename)
+        errors = [issue for issue in issues if not issue.warning]
+        if errors:
+            raise ValueError(f"código inválido após regeneração: {'; '.join(map(str, errors[:5]))}")
+        self._print_warnings(issues)
+        console.print("[green]🔎 Backend corrigido na regeneração[/green]")
+        return code
+
+    @staticmethod
+    def _print_warnings(issues: List[Any]):
+        for issue in issues:
+            console.print(f"[yellow]⚠️ Validação do backend: {issue}[/yellow]")
+
+    async def _notify(self, callback: Optional[Callable[[GeneratedCode], Any]], code: GeneratedCode):
+        """Dispara o callback de código pronto sem derrubar a geração"""
+        if callback is None:
+            return
+        try:
+            result = callback(code)
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception as e:
+            console.print(f"[yellow]⚠️ Callback de código falhou: {e}[/yellow]")
+
+    async def generate_executable_backend(self, process_data: ProcessDefinition, form_data: FormDefinition,
+                                          output_dir: Optional[Path] = None,
+                                          on_code_complete: Optional[Callable[[GeneratedCode], Any]] = None) -> GeneratedCode:
+        """Gera código FastAPI executável (em streaming para `output_dir`, se informado)"""
+        
+        from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
         
         prompt = ChatPromptTemplate.from_messages([
             SystemMessagePromptTemplate.from_template(
@@ -347,6 +717,9 @@ class EnhancedCodeGeneratorAgent:
                 - Código deve executar sem erros
                 - Inclua if __name__ == "__main__": com uvicorn.run()
                 - Use SQLite com tabelas criadas automaticamente
+                - Arquivos de dados (banco SQLite) sempre sob DATA_DIR, definido no topo como
+                  DATA_DIR = globals().get("DATA_DIR") or os.environ.get("DATA_DIR", "."),
+                  por exemplo sqlite3.connect(os.path.join(DATA_DIR, "bpm.db")); nunca caminho relativo fixo
                 - Endpoints devem retornar dados reais
                 - Inclua CORS para frontend
                 - Docstrings e type hints completos
@@ -373,7 +746,7 @@ class EnhancedCodeGeneratorAgent:
                 - GET /docs - Documentação automática
                 
                 REQUISITOS:
-                - Aplicação deve rodar na porta 8000
+                - Porta lida da variável de ambiente PORT (padrão 8000)
                 - CORS habilitado
                 - Logging configurado
                 - Validações de dados
@@ -384,31 +757,37 @@ class EnhancedCodeGeneratorAgent:
         ])
         
         try:
-            chain = prompt | self.llm
-            result = await asyncio.to_thread(
-                chain.invoke,
+            filename = f"{process_data.process_id}_server.py"
+            code = await self._generate_validated_backend(
+                prompt,
                 {
                     "process_name": process_data.name,
                     "process_id": process_data.process_id,
                     "process_description": process_data.description,
                     "business_rules": "; ".join(process_data.business_rules),
                     "form_fields": json.dumps([field.dict() for field in form_data.fields], indent=2)
-                }
+                },
+                filename,
+                output_dir
             )
             
-            return GeneratedCode(
+            generated = GeneratedCode(
                 language="Python",
                 framework="FastAPI",
-                filename=f"{process_data.process_id}_server.py",
-                code=result.content,
+                filename=filename,
+                code=code,
                 dependencies=["fastapi", "uvicorn", "pydantic", "sqlite3", "uuid", "datetime"],
                 documentation="FastAPI server with SQLite backend and REST endpoints"
             )
+            await self._notify(on_code_complete, generated)
+            return generated
             
         except Exception as e:
             console.print(f"[red]Erro gerando backend: {e}[/red]")
+            self._record_fallback()
             # Fallback code
-            fallback_code = '''from fastapi import FastAPI
+            fallback_code = '''import os
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
@@ -426,7 +805,7 @@ async def health_check():
     return {"status": "healthy"}
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 8000)))
 '''
             return GeneratedCode(
                 language="Python",
@@ -436,8 +815,12 @@ if __name__ == "__main__":
                 dependencies=["fastapi", "uvicorn"]
             )
 
-    async def generate_executable_frontend(self, process_data: ProcessDefinition, form_data: FormDefinition) -> GeneratedCode:
-        """Gera código HTML/JS executável"""
+    async def generate_executable_frontend(self, process_data: ProcessDefinition, form_data: FormDefinition,
+                                           output_dir: Optional[Path] = None,
+                                           on_code_complete: Optional[Callable[[GeneratedCode], Any]] = None) -> GeneratedCode:
+        """Gera código HTML/JS executável (em streaming para `output_dir`, se informado)"""
+        
+        from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
         
         prompt = ChatPromptTemplate.from_messages([
             SystemMessagePromptTemplate.from_template(
@@ -494,29 +877,34 @@ if __name__ == "__main__":
         ])
         
         try:
-            chain = prompt | self.llm
-            result = await asyncio.to_thread(
-                chain.invoke,
+            filename = f"{process_data.process_id}_app.html"
+            code = await self._generate_code(
+                prompt,
                 {
                     "process_name": process_data.name,
                     "process_description": process_data.description,
                     "form_title": form_data.title,
                     "form_fields": json.dumps([field.dict() for field in form_data.fields], indent=2),
                     "process_id": process_data.process_id
-                }
+                },
+                filename,
+                output_dir
             )
             
-            return GeneratedCode(
+            generated = GeneratedCode(
                 language="HTML/CSS/JavaScript",
                 framework="Vanilla Web",
-                filename=f"{process_data.process_id}_app.html",
-                code=result.content,
+                filename=filename,
+                code=code,
                 dependencies=[],
                 documentation="Complete web application with embedded CSS/JS"
             )
+            await self._notify(on_code_complete, generated)
+            return generated
             
         except Exception as e:
             console.print(f"[red]Erro gerando frontend: {e}[/red]")
+            self._record_fallback()
             # Fallback HTML
             fallback_code = '''<!DOCTYPE html>
 <html lang="pt-BR">
@@ -561,31 +949,69 @@ if __name__ == "__main__":
 # ===================== EXECUTION ENGINE =====================
 
 class ExecutionEngine:
-    """Engine para executar código gerado"""
+    """Engine para executar código gerado
     
-    def __init__(self):
+    O backend roda no virtualenv do pool correspondente às suas dependências,
+    nunca instalando pacotes no interpretador atual, em uma porta livre
+    alocada por deploy (vários backends gerados convivem lado a lado). Com
+    `host_url` (BPM_APP_HOST_URL), o backend é montado no host de aplicações
+    já aquecido em vez de ganhar um processo próprio. O frontend é servido
+    por HTTP, minificado e pré-comprimido, com cache imutável para os ativos.
+    """
+    
+    def __init__(self, venv_pool: Optional[VenvPool] = None, host_url: Optional[str] = DEFAULT_HOST_URL,
+                 frontend_server: Optional[FrontendServer] = None):
+        self.host_url = host_url
+        self.backend: Optional[LaunchedApp] = None
+        self.backend_url: Optional[str] = None
+        self.hosted_process_id: Optional[str] = None
+        self.frontend_server = frontend_server or FrontendServer()
+        self.frontend_url: Optional[str] = None
         self.backend_process = None
+        self.backend_python = None
         self.temp_dir = None
+        self.venv_pool = venv_pool or VenvPool()
         
+    def ensure_workdir(self) -> Path:
+        """Cria (uma única vez) o diretório onde os artefatos são materializados"""
+        if self.temp_dir is None:
+            self.temp_dir = Path(tempfile.mkdtemp(prefix="bpm_demo_"))
+            console.print(f"[dim]📁 Ambiente: {self.temp_dir}[/dim]")
+        return self.temp_dir
+    
+    def check_syntax(self, code: GeneratedCode) -> Optional[str]:
+        """Verifica a sintaxe do código Python gerado; retorna a mensagem de erro, se houver"""
+        if code.language.lower() != "python":
+            return None
+        try:
+            compile(code.code, code.filename, "exec")
+            return None
+        except SyntaxError as e:
+            return f"{e.msg} (linha {e.lineno})"
+    
+    def on_code_ready(self, code: GeneratedCode):
+        """Callback disparado quando o bloco de código gerado é concluído"""
+        error = self.check_syntax(code)
+        if error:
+            console.print(f"[red]❌ Erro de sintaxe em {code.filename}: {error}[/red]")
+        else:
+            console.print(f"[green]📄 {code.filename} materializado ({len(code.code.splitlines())} linhas)[/green]")
+    
     async def setup_environment(self) -> bool:
         """Configura ambiente de execução"""
         try:
             # Criar diretório temporário
-            self.temp_dir = Path(tempfile.mkdtemp(prefix="bpm_demo_"))
-            console.print(f"[dim]📁 Ambiente: {self.temp_dir}[/dim]")
+            self.ensure_workdir()
             
-            # Verificar Python
-            result = subprocess.run([sys.executable, "--version"], capture_output=True, text=True)
+            # Verificar Python (fora do event loop para não bloquear os estágios LLM)
+            result = await asyncio.to_thread(
+                subprocess.run, [sys.executable, "--version"], capture_output=True, text=True
+            )
             console.print(f"[dim]🐍 Python: {result.stdout.strip()}[/dim]")
             
-            # Instalar dependências se necessário
-            packages = ["fastapi", "uvicorn"]
-            for package in packages:
-                try:
-                    __import__(package)
-                except ImportError:
-                    console.print(f"[yellow]📦 Instalando {package}...[/yellow]")
-                    subprocess.check_call([sys.executable, "-m", "pip", "install", package])
+            # Aquece em segundo plano o ambiente mais provável enquanto o código é gerado
+            if self.venv_pool.warm(DEFAULT_DEPENDENCIES) is not None:
+                console.print(f"[yellow]📦 Preparando ambiente ({', '.join(DEFAULT_DEPENDENCIES)}) em segundo plano...[/yellow]")
             
             return True
             
@@ -593,8 +1019,8 @@ class ExecutionEngine:
             console.print(f"[red]❌ Erro no setup: {e}[/red]")
             return False
     
-    async def deploy_backend(self, backend_code: GeneratedCode) -> bool:
-        """Deploy do código backend"""
+    async def deploy_backend(self, backend_code: GeneratedCode, process_id: Optional[str] = None) -> bool:
+        """Deploy do código backend (montado no host como /apps/<process_id>)"""
         try:
             # Salvar arquivo
             backend_file = self.temp_dir / backend_code.filename
@@ -603,39 +1029,96 @@ class ExecutionEngine:
             
             console.print(f"[green]💾 Backend salvo: {backend_file}[/green]")
             
-            # Iniciar servidor em background
-            self.backend_process = subprocess.Popen([
-                sys.executable, str(backend_file)
-            ], cwd=self.temp_dir)
+            if self.host_url and await self._mount_on_host(backend_file, process_id or backend_file.stem):
+                return True
             
-            # Aguardar inicialização
-            await asyncio.sleep(3)
+            # Ambiente do pool para as dependências declaradas (reaproveitado entre deploys)
+            start = time.perf_counter()
+            try:
+                self.backend_python = await self.venv_pool.acquire(backend_code.dependencies)
+                console.print(f"[dim]🐍 Ambiente pronto em {time.perf_counter() - start:.2f}s[/dim]")
+            except Exception as e:
+                console.print(f"[yellow]⚠️ Ambiente virtual indisponível ({e}); usando o interpretador atual[/yellow]")
+                self.backend_python = None
             
-            # Verificar se está rodando
-            if self.backend_process.poll() is None:
-                console.print("[green]🚀 Backend executando na porta 8000[/green]")
-                return True
-            else:
-                console.print("[red]❌ Backend falhou ao iniciar[/red]")
+            # Iniciar servidor em porta livre e aguardar o health check responder
+            try:
+                self.backend = await launch_app(backend_file, python=self.backend_python)
+            except AppStartError as e:
+                console.print(f"[red]❌ Backend falhou ao iniciar: {e}[/red]")
+                if e.log_tail:
+                    console.print(f"[dim]{e.log_tail}[/dim]")
                 return False
-                
+            
+            self.backend_process = self.backend.process
+            self.backend_url = self.backend.url
+            console.print(
+                f"[green]🚀 Backend pronto em {self.backend.url} "
+                f"({self.backend.startup_seconds:.2f}s, {self.backend.probes} sondagens)[/green]"
+            )
+            console.print(f"[dim]📜 Logs: {self.backend.log_path}[/dim]")
+            return True
+            
         except Exception as e:
             console.print(f"[red]❌ Erro no deploy backend: {e}[/red]")
             return False
     
+    async def _mount_on_host(self, backend_file: Path, process_id: str) -> bool:
+        """Monta o backend no host de aplicações (recarrega se o processo já estiver lá)"""
+        try:
+            info = await host_load(self.host_url, process_id, backend_file)
+        except (AppLoadError, OSError) as e:
+            console.print(f"[yellow]⚠️ Host de aplicações indisponível ({e}); iniciando processo próprio[/yellow]")
+            return False
+        self.backend_url = app_url(self.host_url, process_id)
+        self.hosted_process_id = process_id
+        console.print(f"[green]🏠 Backend montado no host em {self.backend_url} ({info['load_seconds']:.2f}s)[/green]")
+        return True
+    
+    async def load_test(self, process_data: "ProcessDefinition", form_data: "FormDefinition",
+                        config: Optional[LoadTestConfig] = None) -> Dict[str, Any]:
+        """Teste de carga no backend implantado; o RSS só é medido com processo próprio"""
+        config = config or LoadTestConfig()
+        console.print(
+            f"[yellow]🏋️ Teste de carga: {config.concurrency} cliente(s) por {config.duration:.0f}s "
+            f"em {self.backend_url}[/yellow]"
+        )
+        report = await run_load_test(
+            self.backend_url, process_data.process_id, form_data.fields, config,
+            server_pid=self.backend.process.pid if self.backend is not None else None
+        )
+        summary = report.summary()
+        color = "green" if summary["passed"] else "red"
+        verdict = "aprovado" if summary["passed"] else "REPROVADO"
+        console.print(
+            f"[{color}]🏋️ {summary['rps']:.0f} req/s, p95 {summary['p95_ms']:.0f}ms, "
+            f"{summary['error_rate']:.1%} de erros, {summary['client_error_rate']:.1%} de 4xx: {verdict}[/{color}]"
+        )
+        return summary
+    
     async def deploy_frontend(self, frontend_code: GeneratedCode) -> bool:
         """Deploy do código frontend"""
         try:
-            # Salvar arquivo
+            # Salvar arquivo apontando para a porta real do backend
             frontend_file = self.temp_dir / frontend_code.filename
+            code = frontend_code.code
+            if self.backend_url is not None:
+                code = code.replace("http://localhost:8000", self.backend_url)
             with open(frontend_file, "w", encoding="utf-8") as f:
-                f.write(frontend_code.code)
+                f.write(code)
             
             console.print(f"[green]💾 Frontend salvo: {frontend_file}[/green]")
             
-            # Abrir no navegador
-            frontend_url = f"file://{frontend_file.absolute()}"
-            console.print(f"[blue]🌐 Frontend disponível: {frontend_url}[/blue]")
+            # Publicar por HTTP (minificação e compressão acontecem uma vez, aqui)
+            process_id = frontend_file.stem.removesuffix("_app")
+            self.frontend_url = await asyncio.to_thread(self.frontend_server.start().publish, process_id, code)
+            site = self.frontend_server.stats_by_site[process_id]
+            compressed = site["br_bytes"] or site["gzip_bytes"]
+            console.print(
+                f"[blue]🌐 Frontend disponível: {self.frontend_url} "
+                f"({site['original_bytes'] / 1024:.1f} KB → {compressed / 1024:.1f} KB comprimido, "
+                f"{site['assets']} ativo(s) imutável(is))[/blue]"
+            )
             
             return True
             
@@ -646,13 +1129,27 @@ class ExecutionEngine:
     def cleanup(self):
         """Limpa recursos"""
         try:
-            if self.backend_process:
-                self.backend_process.terminate()
-                self.backend_process.wait(timeout=5)
+            if self.backend is not None:
+                self.backend.stop()
                 console.print("[yellow]🛑 Backend finalizado[/yellow]")
         except:
             pass
         
+        # Desmonta do host antes de apagar o arquivo do módulo
+        if self.hosted_process_id is not None:
+            try:
+                unload_from_host(self.host_url, self.hosted_process_id)
+                console.print(f"[yellow]🏠 Backend desmontado do host ({self.hosted_process_id})[/yellow]")
+            except (AppLoadError, OSError) as e:
+                console.print(f"[yellow]⚠️ Não foi possível desmontar {self.hosted_process_id} do host: {e}[/yellow]")
+            self.hosted_process_id = None
+        
+        self.frontend_server.stop()
+        
+        if self.backend_python is not None:
+            self.venv_pool.release(self.backend_python)
+            self.backend_python = None
+        
         try:
             if self.temp_dir and self.temp_dir.exists():
                 shutil.rmtree(self.temp_dir)
@@ -662,26 +1159,186 @@ class ExecutionEngine:
 
 # ===================== MAIN WORKFLOW =====================
 
-async def run_complete_workflow():
-    """Executa workflow completo: Requisito → Código → Execução"""
-    
-    # Verificar API keys
+STAGE_LABELS = {
+    "analysis": "🔍 Análise de Requisitos",
+    "process": "📊 Geração BPMN",
+    "form": "📝 Criação de Formulários",
+    "backend": "🔧 Geração do Backend",
+    "frontend": "🎨 Geração do Frontend",
+    "environment": "⚙️ Configuração do Ambiente",
+    "deploy_backend": "🚀 Deploy Backend",
+    "deploy_frontend": "🌐 Deploy Frontend",
+    "load_test": "🏋️ Teste de Carga",
+}
+
+# Versão de cada estágio memoizável: incrementar ao alterar prompt ou pós-processamento
+STAGE_VERSIONS = {
+    "analysis": "1",
+    "process": "2",
+    "form": "2",
+    "backend": "4",
+    "frontend": "1",
+}
+
+def select_model() -> Optional[tuple]:
+    """Escolhe chave e modelo a partir das variáveis de ambiente"""
     anthropic_key = os.environ.get("ANTHROPIC_API_KEY")
     openai_key = os.environ.get("OPENAI_API_KEY")
     
     if not anthropic_key and not openai_key:
         console.print("[red]❌ Configure ANTHROPIC_API_KEY ou OPENAI_API_KEY[/red]")
-        return
+        return None
     
-    # Escolher modelo
     if anthropic_key:
-        api_key = anthropic_key
-        model = "claude-sonnet-4-20250514"
         console.print("[green]🤖 Usando Claude 3 Sonnet[/green]")
-    else:
-        api_key = openai_key
-        model = "gpt-4"
-        console.print("[green]🤖 Usando GPT-4[/green]")
+        return anthropic_key, "claude-sonnet-4-20250514"
+    
+    console.print("[green]🤖 Usando GPT-4[/green]")
+    return openai_key, "gpt-4"
+
+def available_api_keys() -> Dict[str, str]:
+    """Chaves configuradas por provedor (para o roteamento entre modelos)"""
+    keys = {
+        "anthropic": os.environ.get("ANTHROPIC_API_KEY"),
+        "openai": os.environ.get("OPENAI_API_KEY"),
+    }
+    return {provider: key for provider, key in keys.items() if key}
+
+def build_hedger(percentile: Optional[float] = None) -> Optional[RequestHedger]:
+    """Hedge entre provedores (requer as chaves da Anthropic e da OpenAI)"""
+    keys = available_api_keys()
+    if len(keys) < 2:
+        console.print("[yellow]⚠️ Hedge requer ANTHROPIC_API_KEY e OPENAI_API_KEY; desativado[/yellow]")
+        return None
+    if percentile is None:
+        return RequestHedger(keys)
+    return RequestHedger(keys, percentile=percentile)
+
+def build_router(model: str, stage_models: Optional[List[str]] = None,
+                 stage_budgets: Optional[List[str]] = None) -> ModelRouter:
+    """Roteador de modelos por estágio, avisando quando um modelo sai da escada"""
+    router = ModelRouter.from_options(available_api_keys(), model, stage_models, stage_budgets)
+    router.on_exclude = lambda stage, excluded, reason: console.print(
+        f"[yellow]🧭 {stage}: {excluded} fora da escada ({reason}); "
+        f"nova tentativa a cada {router.probe_every} chamadas[/yellow]"
+    )
+    return router
+
+def build_workflow_scheduler(requirement: str, analyzer: "RequirementAnalyzerAgent",
+                             process_designer: "EnhancedProcessDesignerAgent",
+                             form_agent: "FormBuilderAgent",
+                             code_generator: "EnhancedCodeGeneratorAgent",
+                             execution_engine: Optional["ExecutionEngine"] = None,
+                             stream: bool = True,
+                             load_test: Optional[LoadTestConfig] = None) -> StageScheduler:
+    """Declara o pipeline como grafo de estágios
+    
+    Backend e frontend dependem apenas de processo + formulário, e o ambiente
+    de execução não depende de nenhuma saída do LLM, então rodam em paralelo.
+    Sem `execution_engine`, apenas os estágios de geração são declarados; com
+    `load_test`, o backend implantado passa por um teste de carga em paralelo
+    ao deploy do frontend.
+    """
+    scheduler = StageScheduler()
+    
+    async def analysis_stage():
+        return await analyzer.analyze_requirement(requirement)
+    
+    async def process_stage(analysis):
+        return await process_designer.generate_process(requirement, analysis)
+    
+    async def form_stage(process):
+        return await form_agent.generate_form(process)
+    
+    # Em streaming, o código é escrito no ambiente à medida que chega
+    def code_kwargs():
+        if not stream or execution_engine is None:
+            return {}
+        return {"output_dir": execution_engine.ensure_workdir(), "on_code_complete": execution_engine.on_code_ready}
+    
+    async def backend_stage(process, form):
+        return await code_generator.generate_executable_backend(process, form, **code_kwargs())
+    
+    async def frontend_stage(process, form):
+        return await code_generator.generate_executable_frontend(process, form, **code_kwargs())
+    
+    async def environment_stage():
+        if not await execution_engine.setup_environment():
+            raise RuntimeError("Falha na configuração do ambiente")
+        return True
+    
+    async def deploy_backend_stage(backend, environment, process):
+        return await execution_engine.deploy_backend(backend, process.process_id)
+    
+    async def deploy_frontend_stage(frontend, deploy_backend):
+        return await execution_engine.deploy_frontend(frontend)
+    
+    async def load_test_stage(deploy_backend, process, form):
+        if not deploy_backend:
+            raise RuntimeError("Backend não está em execução")
+        return await execution_engine.load_test(process, form, load_test)
+    
+    # Entradas externas que também invalidam a memoização
+    def memo(name, agent, **params):
+        if agent.router is not None:
+            params["route"] = agent.models_for(name)
+        return {"version": STAGE_VERSIONS[name], "params": {"model": agent.model, **params}}
+    
+    scheduler.add("analysis", analysis_stage, description="[cyan]🔍 Analisando requisitos...",
+                  **memo("analysis", analyzer, requirement=requirement))
+    templates_version = process_designer.templates.fingerprint() if process_designer.templates else None
+    scheduler.add("process", process_stage, ["analysis"], "[green]📊 Gerando processo BPMN...",
+                  decode=ProcessDefinition.parse_obj,
+                  **memo("process", process_designer, requirement=requirement, templates=templates_version))
+    scheduler.add("form", form_stage, ["process"], "[blue]📝 Criando formulários...",
+                  decode=FormDefinition.parse_obj, **memo("form", form_agent, templates=templates_version))
+    scheduler.add("backend", backend_stage, ["process", "form"], "[yellow]💻 Gerando backend...",
+                  decode=GeneratedCode.parse_obj, **memo("backend", code_generator))
+    scheduler.add("frontend", frontend_stage, ["process", "form"], "[yellow]🎨 Gerando frontend...",
+                  decode=GeneratedCode.parse_obj, **memo("frontend", code_generator))
+    
+    if execution_engine is not None:
+        scheduler.add("environment", environment_stage, description="[magenta]⚙️ Configurando ambiente...")
+        scheduler.add("deploy_backend", deploy_backend_stage, ["backend", "environment", "process"],
+                      "[red]🚀 Deploy do backend...")
+        scheduler.add("deploy_frontend", deploy_frontend_stage, ["frontend", "deploy_backend"], "[red]🌐 Deploy do frontend...")
+        if load_test is not None:
+            scheduler.add("load_test", load_test_stage, ["deploy_backend", "process", "form"],
+                          "[red]🏋️ Teste de carga do backend...")
+    
+    return scheduler
+
+async def run_complete_workflow(use_cache: bool = True, max_concurrency: Optional[int] = None,
+                                stream: bool = True, memoize: bool = True,
+                                from_stage: Optional[str] = None, use_templates: bool = True,
+                                metrics_port: Optional[int] = None, routing: bool = True,
+                                stage_models: Optional[List[str]] = None,
+                                stage_budgets: Optional[List[str]] = None,
+                                hedge: bool = False, hedge_percentile: Optional[float] = None,
+                                resume: Optional[str] = None, deadline: Optional[float] = None,
+                                app_host: Optional[str] = DEFAULT_HOST_URL,
+                                load_test: Optional[LoadTestConfig] = None,
+                                frontend_host: str = DEFAULT_FRONTEND_HOST,
+                                frontend_port: int = DEFAULT_FRONTEND_PORT):
+    """Executa workflow completo: Requisito → Código → Execução
+    
+    Cada estágio gerado é gravado sob o ID da execução; `resume` (ID ou
+    `latest`) retoma uma execução interrompida a partir do que já concluiu.
+    Com `deadline` (segundos), chamadas que estouram o orçamento do estágio
+    são canceladas e o estágio segue com o fallback do agente (degradado).
+    Com `load_test`, o backend reprovado no teste de carga não é promovido.
+    """
+    from rich.panel import Panel
+    from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn
+    from rich.syntax import Syntax
+    from rich.table import Table
+    
+    
+    # Verificar API keys e escolher modelo
+    selected = select_model()
+    if selected is None:
+        return
+    api_key, model = selected
     
     # Header
     console.clear()
@@ -694,11 +1351,24 @@ async def run_complete_workflow():
     ))
     
     # Inicializar componentes
-    analyzer = RequirementAnalyzerAgent(api_key, model)
-    process_designer = EnhancedProcessDesignerAgent(api_key, model)
-    form_agent = FormBuilderAgent(api_key, model)
-    code_generator = EnhancedCodeGeneratorAgent(api_key, model)
-    execution_engine = ExecutionEngine()
+    llm_cache = LLMResponseCache(bypass=not use_cache)
+    if max_concurrency:
+        configure_default_pool(max_concurrency)
+    tracer = get_tracer()
+    if metrics_port:
+        tracer.serve_metrics(metrics_port)
+        console.print(f"[dim]📈 Métricas Prometheus em http://localhost:{metrics_port}/metrics[/dim]")
+    router = build_router(model, stage_models, stage_budgets) if routing else None
+    hedger = build_hedger(hedge_percentile) if hedge else None
+    agent_options = {"cache": llm_cache, "router": router, "hedger": hedger}
+    analyzer = RequirementAnalyzerAgent(api_key, model, **agent_options)
+    templates = TemplateLibrary.load() if use_templates else None
+    process_designer = EnhancedProcessDesignerAgent(api_key, model, templates=templates, **agent_options)
+    form_agent = FormBuilderAgent(api_key, model, templates=templates, **agent_options)
+    code_generator = EnhancedCodeGeneratorAgent(api_key, model, **agent_options)
+    execution_engine = ExecutionEngine(
+        host_url=app_host, frontend_server=FrontendServer(frontend_host, frontend_port)
+    )
     
     # Input do usuário - requisito mais complexo
     requirement = """
@@ -727,9 +1397,33 @@ async def run_complete_workflow():
        - Conformidade com políticas SOX
     """
     
+    # Checkpoint da execução: ao retomar, o requisito gravado prevalece
+    if resume:
+        try:
+            checkpoint = RunCheckpoint.open(resume)
+        except ValueError as e:
+            console.print(f"[red]❌ {e}[/red]")
+            return
+        requirement = checkpoint.requirement
+        completed = checkpoint.completed()
+        console.print(
+            f"[green]⏯️ Retomando execução {checkpoint.run_id}: "
+            f"{', '.join(completed) or 'nenhum estágio'} já concluído(s)[/green]"
+        )
+        checkpoint.set_status("running")
+    else:
+        checkpoint = RunCheckpoint.create(requirement, {"model": model})
+    resume_hint = f"python bpm_complete_workflow.py --resume {checkpoint.run_id}"
+    console.print(f"[dim]💾 Execução {checkpoint.run_id} (retomar com: {resume_hint})[/dim]")
+    
     console.print(f"\n[yellow]👤 Requisito Empresarial:[/yellow]\n{requirement[:200]}...")
     
     # Progress tracking
+    scheduler = build_workflow_scheduler(
+        requirement, analyzer, process_designer, form_agent, code_generator, execution_engine,
+        stream=stream, load_test=load_test
+    )
+    
     with Progress(
         SpinnerColumn(),
         TextColumn("[progress.description]{task.description}"),
@@ -737,73 +1431,74 @@ async def run_complete_workflow():
         TaskProgressColumn(),
         expand=True
     ) as progress:
+        stage_tasks = {}
         
-        # ===== STAGE 1: Requirement Analysis =====
-        task1 = progress.add_task("[cyan]🔍 Analisando requisitos...", total=100)
-        
-        start_time = time.time()
-        analysis = await analyzer.analyze_requirement(requirement)
-        analysis_time = time.time() - start_time
-        
-        progress.update(task1, completed=100)
-        progress.remove_task(task1)
-        
-        # ===== STAGE 2: Process Design =====
-        task2 = progress.add_task("[green]📊 Gerando processo BPMN...", total=100)
-        
-        start_time = time.time()
-        process_data = await process_designer.generate_process(requirement, analysis)
-        process_time = time.time() - start_time
-        
-        progress.update(task2, completed=100)
-        progress.remove_task(task2)
-        
-        # ===== STAGE 3: Form Generation =====
-        task3 = progress.add_task("[blue]📝 Criando formulários...", total=100)
-        
-        start_time = time.time()
-        form_data = await form_agent.generate_form(process_data)
-        form_time = time.time() - start_time
-        
-        progress.update(task3, completed=100)
-        progress.remove_task(task3)
+        def on_stage_start(stage):
+            stage_tasks[stage.name] = progress.add_task(stage.description, total=100)
         
-        # ===== STAGE 4: Code Generation =====
-        task4 = progress.add_task("[yellow]💻 Gerando código executável...", total=100)
+        def on_stage_complete(stage, result):
+            task_id = stage_tasks.pop(stage.name, None)
+            if task_id is not None:
+                progress.update(task_id, completed=100)
+                progress.remove_task(task_id)
         
-        backend_start = time.time()
-        backend_code = await code_generator.generate_executable_backend(process_data, form_data)
-        
-        progress.update(task4, completed=50)
-        
-        frontend_start = time.time()
-        frontend_code = await code_generator.generate_executable_frontend(process_data, form_data)
-        code_time = time.time() - backend_start
-        
-        progress.update(task4, completed=100)
-        progress.remove_task(task4)
-        
-        # ===== STAGE 5: Environment Setup =====
-        task5 = progress.add_task("[magenta]⚙️ Configurando ambiente...", total=100)
-        
-        setup_success = await execution_engine.setup_environment()
-        
-        progress.update(task5, completed=100)
-        progress.remove_task(task5)
-        
-        if not setup_success:
-            console.print("[red]❌ Falha na configuração do ambiente[/red]")
-            return
-        
-        # ===== STAGE 6: Deployment =====
-        task6 = progress.add_task("[red]🚀 Fazendo deploy...", total=100)
-        
-        backend_success = await execution_engine.deploy_backend(backend_code)
-        progress.update(task6, completed=50)
-        
-        frontend_success = await execution_engine.deploy_frontend(frontend_code)
-        progress.update(task6, completed=100)
-        progress.remove_task(task6)
+        workflow_start = time.perf_counter()
+        stage_results = await scheduler.run(
+            on_start=on_stage_start, on_complete=on_stage_complete,
+            store=StageStore() if memoize else None, from_stage=from_stage,
+            checkpoint=checkpoint, deadline=RequestDeadline(deadline) if deadline else None
+        )
+        workflow_time = time.perf_counter() - workflow_start
+    
+    if not stage_results["environment"].ok:
+        console.print("[red]❌ Falha na configuração do ambiente[/red]")
+        checkpoint.set_status("failed")
+        console.print(f"[yellow]💾 Estágios concluídos preservados; retome com: {resume_hint}[/yellow]")
+        return
+    
+    failed_stages = [
+        name for name in ("analysis", "process", "form", "backend", "frontend")
+        if not stage_results[name].ok
+    ]
+    if failed_stages:
+        for name in failed_stages:
+            console.print(f"[red]❌ Estágio '{name}' falhou: {stage_results[name].error}[/red]")
+        checkpoint.set_status("failed")
+        console.print(f"[yellow]💾 Estágios concluídos preservados; retome com: {resume_hint}[/yellow]")
+        return
+    checkpoint.set_status("completed")
+    
+    degraded = [name for name, result in stage_results.items() if result.fallback]
+    if degraded:
+        labels = [f"{name} (prazo)" if stage_results[name].deadline_exceeded else name for name in degraded]
+        console.print(f"[yellow]⚠️ Estágios degradados (fallback): {', '.join(labels)}[/yellow]")
+    
+    analysis = stage_results["analysis"].value
+    process_data = stage_results["process"].value
+    form_data = stage_results["form"].value
+    backend_code = stage_results["backend"].value
+    frontend_code = stage_results["frontend"].value
+    backend_success = bool(stage_results["deploy_backend"].value)
+    frontend_success = bool(stage_results["deploy_frontend"].value)
+    # Estágio do teste de carga que falhou (ou foi pulado) reprova o backend
+    load_stage = stage_results.get("load_test")
+    load_report = load_stage.value if load_stage is not None and load_stage.ok else None
+    load_passed = load_stage is None or (load_report is not None and load_report["passed"])
+    
+    # Versão do processo no store de artefatos: só o que foi implantado e aprovado
+    # (saídas degradadas, deploys com falha e backends reprovados não são versionados)
+    publishable = backend_success and frontend_success and load_passed
+    if publishable and not (stage_results["backend"].fallback or stage_results["frontend"].fallback):
+        artifact_store = ArtifactStore()
+        version, created = await asyncio.to_thread(
+            artifact_store.publish, process_data.process_id,
+            {"backend": backend_code, "frontend": frontend_code}, checkpoint.run_id
+        )
+        console.print(
+            f"[dim]📦 Artefatos {'gravados como' if created else 'idênticos a'} {process_data.process_id} v{version} "
+            f"(reimplantar com: python bpm_complete_workflow.py --redeploy {process_data.process_id}@{version})[/dim]"
+        )
+        artifact_store.close()
     
     # ===== RESULTS DISPLAY =====
     
@@ -898,23 +1593,167 @@ async def run_complete_workflow():
     console.print(code_table)
     
     # Mostrar métricas de performance
-    total_time = analysis_time + process_time + form_time + code_time
-    
     console.print(f"\n[bold cyan]⚡ Métricas de Performance:[/bold cyan]")
     metrics_table = Table(show_header=True)
     metrics_table.add_column("Etapa", style="cyan")
     metrics_table.add_column("Tempo", style="green")
     metrics_table.add_column("Status", style="yellow")
     
-    metrics_table.add_row("🔍 Análise de Requisitos", f"{analysis_time:.1f}s", "✅")
-    metrics_table.add_row("📊 Geração BPMN", f"{process_time:.1f}s", "✅")
-    metrics_table.add_row("📝 Criação de Formulários", f"{form_time:.1f}s", "✅")
-    metrics_table.add_row("💻 Geração de Código", f"{code_time:.1f}s", "✅")
-    metrics_table.add_row("🚀 Deploy Total", "3.0s", "✅")
-    metrics_table.add_row("⏱️ TEMPO TOTAL", f"{total_time + 3:.1f}s", "🎯")
+    for name, stage in scheduler.stages.items():
+        result = stage_results[name]
+        status = "✅" if result.ok else ("⏭️" if result.skipped else "❌")
+        if result.resumed:
+            status = "⏯️ retomado"
+        elif result.cached:
+            status = "♻️ reaproveitado"
+        elif result.deadline_exceeded:
+            status = f"⏰ degradado (orçamento {result.budget:.1f}s)"
+        elif result.fallback:
+            status = "⚠️ degradado"
+        metrics_table.add_row(STAGE_LABELS.get(name, name), f"{result.duration:.1f}s", status)
+    
+    critical_path = scheduler.critical_path(stage_results)
+    critical_time = sum(stage_results[name].duration for name in critical_path)
+    metrics_table.add_row("🧭 Caminho Crítico", f"{critical_time:.1f}s", " → ".join(critical_path))
+    metrics_table.add_row("⏱️ TEMPO TOTAL", f"{workflow_time:.1f}s", "🎯")
+    
+    cache_stats = llm_cache.stats()
+    cache_status = "⏭️ Ignorado" if cache_stats["bypass"] else f"{cache_stats['hit_rate']:.0%} hits"
+    metrics_table.add_row(
+        "🗄️ Cache LLM",
+        f"{cache_stats['hits']} hits / {cache_stats['misses']} misses",
+        cache_status
+    )
+    
+    for agent in (process_designer, form_agent):
+        if agent.prompt_tokens:
+            before = agent.prompt_tokens["format_instructions"]
+            after = agent.prompt_tokens["structured"]
+            metrics_table.add_row(
+                f"📉 Prompt {agent.name}",
+                f"{before} → {after} tokens",
+                f"-{(before - after) / before:.0%}" if before else "—"
+            )
+    
+    if router is not None:
+        for name, route in router.stats().items():
+            used = [f"{m} ×{count}" for m, count in route["picks"].items() if count]
+            metrics_table.add_row(
+                f"🧭 Modelo ({name})",
+                ", ".join(used) or "—",
+                f"{route['escalations']} escalonamento(s)"
+            )
+    
+    if hedger is not None:
+        hedge_stats = hedger.stats()
+        metrics_table.add_row(
+            f"🛡️ Hedge (p{hedge_stats['percentile']:g})",
+            f"{hedge_stats['hedged']}/{hedge_stats['calls']} chamadas ({hedge_stats['hedge_rate']:.0%})",
+            f"vitórias: {hedge_stats['wins']['primary']} principal / {hedge_stats['wins']['secondary']} reserva"
+        )
     
+    for limiter in all_rate_limiters():
+        limiter_stats = limiter.stats()
+        metrics_table.add_row(
+            f"🚦 Rate limit ({limiter_stats['provider']})",
+            f"{limiter_stats['wait_seconds']:.1f}s em fila",
+            f"{limiter_stats['rate_limited']} x 429/529"
+        )
+
+    venv_stats = execution_engine.venv_pool.stats()
+    metrics_table.add_row(
+        "🐍 Ambientes virtuais",
+        f"{venv_stats['hits']} reuso(s) / {venv_stats['builds']} construção(ões)",
+        f"{venv_stats['environments']} no pool ({venv_stats['size_bytes'] / 1024 ** 2:.0f} MB)"
+    )
+
+    frontend_stats = execution_engine.frontend_server.stats()
+    if frontend_stats["sites"]:
+        metrics_table.add_row(
+            "🗜️ Frontend servido",
+            f"{frontend_stats['original_bytes'] / 1024:.1f} KB → {frontend_stats['minified_bytes'] / 1024:.1f} KB minificado",
+            f"gzip {frontend_stats['gzip_bytes'] / 1024:.1f} KB"
+            + (f" / br {frontend_stats['br_bytes'] / 1024:.1f} KB" if frontend_stats["br_bytes"] else "")
+        )
+
     console.print(metrics_table)
     
+    # Teste de carga: vazão, latência por endpoint e memória do servidor
+    if load_test is not None:
+        if load_report is None:
+            console.print(
+                f"[red]❌ Teste de carga não executado: {load_stage.error or 'backend indisponível'}; "
+                f"backend não será promovido[/red]"
+            )
+        else:
+            load_table = Table(show_header=True, title="🏋️ Teste de Carga do Backend")
+            load_table.add_column("Endpoint", style="cyan")
+            load_table.add_column("Requisições", style="white")
+            load_table.add_column("Erros (5xx/rede)", style="red")
+            load_table.add_column("4xx", style="yellow")
+            load_table.add_column("p50", style="green")
+            load_table.add_column("p95", style="yellow")
+            load_table.add_column("p99", style="magenta")
+            for endpoint, item in load_report["endpoints"].items():
+                load_table.add_row(
+                    endpoint, str(item["requests"]), str(item["errors"]), str(item["client_errors"]),
+                    f"{item['p50_ms']:.1f}ms", f"{item['p95_ms']:.1f}ms", f"{item['p99_ms']:.1f}ms"
+                )
+            load_table.add_row(
+                "📊 TOTAL", f"{load_report['requests']} ({load_report['rps']:.0f} req/s)",
+                f"{load_report['error_rate']:.1%}", f"{load_report['client_error_rate']:.1%}",
+                f"{load_report['p50_ms']:.1f}ms",
+                f"{load_report['p95_ms']:.1f}ms", f"{load_report['p99_ms']:.1f}ms"
+            )
+            console.print(load_table)
+            if load_report["rss_peak_mb"] is not None:
+                console.print(
+                    f"[dim]🧠 Memória do servidor: {load_report['rss_start_mb']:.0f} MB → "
+                    f"pico {load_report['rss_peak_mb']:.0f} MB[/dim]"
+                )
+            if not load_report["openapi"]:
+                console.print("[dim]   ↳ /openapi.json indisponível: corpos montados só a partir do formulário[/dim]")
+            for sample in load_report["error_samples"]:
+                console.print(f"[dim]   ↳ {sample}[/dim]")
+            if not load_passed:
+                console.print(
+                    f"[red]🚫 Backend reprovado no teste de carga (limites: p95 ≤ {load_test.max_p95_ms:.0f}ms, "
+                    f"erros ≤ {load_test.max_error_rate:.1%}); não será promovido[/red]"
+                )
+    
+    # Tracing por estágio: onde foram o tempo, os tokens e o custo
+    trace_table = Table(show_header=True, title="🔎 Tracing dos Agentes")
+    trace_table.add_column("Etapa", style="cyan")
+    trace_table.add_column("Chamadas", style="white")
+    trace_table.add_column("Tempo", style="green")
+    trace_table.add_column("Fila", style="yellow")
+    trace_table.add_column("Tokens (in/out)", style="magenta")
+    trace_table.add_column("Custo", style="green")
+    trace_table.add_column("Retries/Fallbacks", style="red")
+    
+    trace_summary = tracer.summary()
+    for name, item in trace_summary.items():
+        trace_table.add_row(
+            STAGE_LABELS.get(name, name),
+            f"{item['calls']} ({item['cached']} cache)",
+            f"{item['wall_seconds']:.1f}s",
+            f"{item['queue_wait_seconds']:.1f}s",
+            f"{item['input_tokens']}/{item['output_tokens']}",
+            f"${item['cost_usd']:.4f}",
+            f"{item['retries']}/{item['fallbacks']}"
+        )
+    total_cost = sum(item["cost_usd"] for item in trace_summary.values())
+    trace_table.add_row("💰 TOTAL", "", "", "", "", f"${total_cost:.4f}", "")
+    console.print(trace_table)
+    
+    try:
+        run_id = checkpoint.run_id
+        persisted = await asyncio.to_thread(tracer.persist, None, run_id)
+        if persisted:
+            console.print(f"[dim]🗃️ {persisted} traces gravados em ai_agent_logs (run {run_id})[/dim]")
+    except Exception as e:
+        console.print(f"[yellow]⚠️ Não foi possível gravar ai_agent_logs: {e}[/yellow]")
+    
     # Preview do código backend
     console.print(f"\n[bold green]🔧 Preview - Backend API (FastAPI):[/bold green]")
     backend_preview = '\n'.join(backend_code.code.split('\n')[:25])
@@ -928,14 +1767,14 @@ async def run_complete_workflow():
     console.print(Panel(syntax, title=f"🌐 {frontend_code.filename}", border_style="blue"))
     
     # URLs e instruções
-    if backend_success and frontend_success:
+    if backend_success and frontend_success and load_passed:
         console.print(Panel.fit(
             "[bold green]🎉 APLICAÇÃO EXECUTANDO COM SUCESSO![/bold green]\n\n"
             "[bold cyan]🔗 URLs Disponíveis:[/bold cyan]\n"
-            f"• [blue]Backend API: http://localhost:8000[/blue]\n"
-            f"• [blue]Documentação: http://localhost:8000/docs[/blue]\n"
-            f"• [blue]Health Check: http://localhost:8000/health[/blue]\n"
-            f"• [green]Frontend: {execution_engine.temp_dir / frontend_code.filename}[/green]\n\n"
+            f"• [blue]Backend API: {execution_engine.backend_url}[/blue]\n"
+            f"• [blue]Documentação: {execution_engine.backend_url}/docs[/blue]\n"
+            f"• [blue]Health Check: {execution_engine.backend_url}/health[/blue]\n"
+            f"• [green]Frontend: {execution_engine.frontend_url}[/green]\n\n"
             "[bold yellow]📱 Próximos Passos:[/bold yellow]\n"
             "1. ✅ Testar endpoints da API\n"
             "2. ✅ Abrir frontend no navegador\n"
@@ -948,8 +1787,9 @@ async def run_complete_workflow():
         
         # Abrir documentação da API
         try:
+            import webbrowser
             console.print(f"\n[yellow]🌐 Abrindo documentação da API...[/yellow]")
-            webbrowser.open("http://localhost:8000/docs")
+            webbrowser.open(f"{execution_engine.backend_url}/docs")
             await asyncio.sleep(2)
         except:
             pass
@@ -979,27 +1819,81 @@ async def run_complete_workflow():
     
     # Cleanup
     execution_engine.cleanup()
+    llm_cache.close()
+    checkpoint.close()
+
+async def redeploy_artifacts(spec: str, app_host: Optional[str] = DEFAULT_HOST_URL,
+                             frontend_host: str = DEFAULT_FRONTEND_HOST,
+                             frontend_port: int = DEFAULT_FRONTEND_PORT):
+    """Reimplanta uma versão gravada (`process_id[@versão]`, padrão a mais
+    recente) direto do store de artefatos, sem chamar nenhum LLM"""
+    from rich.panel import Panel
+    
+    process_id, _, version = spec.partition("@")
+    artifact_store = ArtifactStore()
+    try:
+        version = artifact_store.resolve(process_id, int(version) if version else None)
+        artifacts = artifact_store.load(process_id, version)
+    except ValueError as e:
+        console.print(f"[red]❌ {e}[/red]")
+        return
+    finally:
+        artifact_store.close()
+    console.print(f"[green]📦 {process_id} v{version}: {', '.join(sorted(artifacts))} carregado(s) do store[/green]")
+    
+    execution_engine = ExecutionEngine(
+        host_url=app_host, frontend_server=FrontendServer(frontend_host, frontend_port)
+    )
+    try:
+        if not await execution_engine.setup_environment():
+            return
+        backend_success = "backend" in artifacts and await execution_engine.deploy_backend(
+            GeneratedCode.parse_obj(artifacts["backend"]), process_id
+        )
+        frontend_success = "frontend" in artifacts and await execution_engine.deploy_frontend(
+            GeneratedCode.parse_obj(artifacts["frontend"])
+        )
+        if not (backend_success and frontend_success):
+            console.print(f"[red]❌ Falha ao reimplantar {process_id} v{version}[/red]")
+            return
+        
+        console.print(Panel.fit(
+            f"[bold green]🎉 {process_id} v{version} EXECUTANDO![/bold green]\n\n"
+            f"• [blue]Backend API: {execution_engine.backend_url}[/blue]\n"
+            f"• [blue]Documentação: {execution_engine.backend_url}/docs[/blue]\n"
+            f"• [green]Frontend: {execution_engine.frontend_url}[/green]",
+            border_style="green",
+            title="♻️ Reimplantação"
+        ))
+        console.print("[dim]Pressione Ctrl+C para finalizar[/dim]")
+        try:
+            while True:
+                await asyncio.sleep(1)
+        except KeyboardInterrupt:
+            console.print(f"\n[yellow]🛑 Finalizando aplicação...[/yellow]")
+    finally:
+        execution_engine.cleanup()
 
 # ===================== UTILITIES =====================
 
-class FormBuilderAgent:
+class FormBuilderAgent(LLMAgent):
     """Agent reutilizado do código original"""
     
-    def __init__(self, api_key: str, model: str = "claude-sonnet-4-20250514"):
+    default_stage = "form"
+    
+    def __init__(self, api_key: str, model: str = "claude-sonnet-4-20250514",
+                 cache: Optional[LLMResponseCache] = None,
+                 client_pool: Optional[LLMClientPool] = None,
+                 router: Optional[ModelRouter] = None,
+                 hedger: Optional[RequestHedger] = None,
+                 templates: Optional[TemplateLibrary] = None):
+        super().__init__(api_key, model, temperature=0.1, cache=cache,
+                         client_pool=client_pool, router=router, hedger=hedger)
         self.name = "Form Builder Agent"
+        self.templates = templates
         
-        if "claude" in model.lower():
-            self.llm = ChatAnthropic(
-                anthropic_api_key=api_key,
-                model=model,
-                temperature=0.1
-            )
-        else:
-            self.llm = ChatOpenAI(
-                openai_api_key=api_key,
-                model=model,
-                temperature=0.1
-            )
+        from langchain_core.output_parsers import PydanticOutputParser
+        from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
         
         self.parser = PydanticOutputParser(pydantic_object=FormDefinition)
         
@@ -1024,7 +1918,7 @@ class FormBuilderAgent:
                 - file: Upload de documentos
                 - boolean: Checkboxes de confirmação
                 
-                {format_instructions}"""
+                Retorne o formulário chamando a ferramenta FormDefinition."""
             ),
             HumanMessagePromptTemplate.from_template(
                 """Baseado na seguinte definição de processo BPMN de aprovação de despesas, gere um formulário completo:
@@ -1045,25 +1939,29 @@ class FormBuilderAgent:
                 Gere uma definição completa do formulário."""
             )
         ])
-        
-        self.chain = self.prompt | self.llm | self.parser
 
     async def generate_form(self, process_data: ProcessDefinition) -> FormDefinition:
-        """Gera formulário baseado no processo"""
+        """Gera formulário baseado no processo (ou o formulário do template do processo)"""
+        template_form = self.templates.form_for(process_data.process_id) if self.templates else None
+        if template_form is not None:
+            return FormDefinition.parse_obj(copy.deepcopy(template_form))
+        
         try:
-            result = await asyncio.to_thread(
-                self.chain.invoke,
+            result = await self._invoke_structured(
+                self.prompt,
                 {
                     "process_name": process_data.name,
                     "process_description": process_data.description,
                     "business_rules": "; ".join(process_data.business_rules),
-                    "process_elements": [elem.dict() for elem in process_data.elements],
-                    "format_instructions": self.parser.get_format_instructions()
-                }
+                    "process_elements": [elem.dict() for elem in process_data.elements]
+                },
+                FormDefinition,
+                fallback_parser=self.parser
             )
             return result
         except Exception as e:
             console.print(f"[red]Erro no Form Builder Agent: {e}[/red]")
+            self._record_fallback()
             # Fallback para formulário de despesas
             return FormDefinition(
                 form_id=f"form_{process_data.process_id}",
@@ -1086,19 +1984,25 @@ class FormBuilderAgent:
                 ]
             )
 
+CORE_PACKAGES = ["fastapi", "uvicorn", "langchain_core", "rich"]
+PROVIDER_PACKAGES = {"anthropic": "langchain_anthropic", "openai": "langchain_openai"}
+
 async def check_dependencies():
-    """Verifica dependências necessárias"""
-    required_packages = [
-        "fastapi", "uvicorn", "langchain_anthropic", 
-        "langchain_openai", "langchain_core", "rich"
-    ]
+    """Verifica dependências necessárias sem importá-las (apenas localiza os pacotes)"""
+    import importlib.util
     
-    missing = []
-    for package in required_packages:
-        try:
-            __import__(package.replace("-", "_"))
-        except ImportError:
-            missing.append(package)
+    required_packages = list(CORE_PACKAGES)
+    if os.environ.get("ANTHROPIC_API_KEY"):
+        required_packages.append(PROVIDER_PACKAGES["anthropic"])
+    elif os.environ.get("OPENAI_API_KEY"):
+        required_packages.append(PROVIDER_PACKAGES["openai"])
+    else:
+        required_packages.extend(PROVIDER_PACKAGES.values())
+    
+    missing = [
+        package for package in required_packages
+        if importlib.util.find_spec(package.replace("-", "_")) is None
+    ]
     
     if missing:
         console.print(f"[red]❌ Instale as dependências: pip install {' '.join(missing)}[/red]")
@@ -1106,9 +2010,240 @@ async def check_dependencies():
     
     return True
 
+def import_time_report(modules: Optional[List[str]] = None, top: int = 15) -> List[Dict[str, Any]]:
+    """Mede o custo de importação (ms) do workflow e dos módulos adiados
+    
+    Cada módulo é importado em um interpretador novo com `-X importtime`, então
+    o resultado não é afetado pelo que já está carregado neste processo.
+    """
+    from rich.table import Table
+    
+    modules = modules or [
+        "bpm_complete_workflow", "langchain_core.prompts", "langchain_anthropic",
+        "langchain_openai", "rich.progress", "fastapi", "uvicorn",
+    ]
+    script_dir = str(Path(__file__).resolve().parent)
+    
+    def import_entries(statement: str):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", statement],
+            capture_output=True, text=True, cwd=script_dir
+        )
+        entries = []
+        for line in result.stderr.splitlines():
+            parts = line[len("import time:"):].split("|")
+            if not line.startswith("import time:") or len(parts) != 3 or not parts[0].strip().isdigit():
+                continue
+            # Nível de aninhamento: 1 espaço no topo + 2 por nível
+            level = (len(parts[2]) - len(parts[2].lstrip()) - 1) // 2
+            if level <= 1:
+                entries.append((parts[2].strip(), level, int(parts[1]) / 1000))
+        return result.returncode == 0, entries
+    
+    # Módulos carregados pelo próprio interpretador não contam para o relatório
+    _, baseline = import_entries("pass")
+    baseline_names = {name for name, level, _ in baseline if level == 0}
+    
+    report = []
+    for module in modules:
+        ok, entries = import_entries(f"import {module}")
+        report.append({
+            "module": module,
+            "ok": ok,
+            "total_ms": sum(ms for name, level, ms in entries if level == 0 and name not in baseline_names),
+            "heaviest": sorted(
+                ((name, ms) for name, level, ms in entries if level == 1),
+                key=lambda item: item[1], reverse=True
+            )[:top],
+        })
+    
+    table = Table(show_header=True, title="⏱️ Tempo de importação")
+    table.add_column("Módulo", style="cyan")
+    table.add_column("Total", style="green")
+    table.add_column("Dependências mais pesadas", style="yellow")
+    for item in report:
+        heaviest = ", ".join(f"{name} {ms:.0f}ms" for name, ms in item["heaviest"][:4])
+        total = f"{item['total_ms']:.0f}ms" if item["ok"] else "não instalado"
+        table.add_row(item["module"], total, heaviest)
+    console.print(table)
+    
+    return report
+
 # ===================== MAIN EXECUTION =====================
 
+def parse_args():
+    """Argumentos de linha de comando do workflow"""
+    parser = argparse.ArgumentParser(description="BPM AI Solution - Workflow Completo")
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Ignora o cache de respostas LLM (BPM_LLM_CACHE_BYPASS=1 tem o mesmo efeito)"
+    )
+    parser.add_argument(
+        "--max-concurrency", type=int, default=None,
+        help="Limite de chamadas LLM simultâneas (padrão: BPM_LLM_MAX_CONCURRENCY ou 64)"
+    )
+    parser.add_argument(
+        "--from-stage", choices=list(STAGE_VERSIONS), default=None,
+        help="Recalcula este estágio e seus dependentes, reaproveitando os anteriores"
+    )
+    parser.add_argument(
+        "--no-memo", action="store_true",
+        help="Não reaproveita saídas de estágios de execuções anteriores"
+    )
+    parser.add_argument(
+        "--no-templates", action="store_true",
+        help="Sempre gera o processo com o LLM, sem consultar a biblioteca de templates"
+    )
+    parser.add_argument(
+        "--import-report", action="store_true",
+        help="Mostra o tempo de importação (ms) por módulo e encerra"
+    )
+    parser.add_argument(
+        "--no-stream", action="store_true",
+        help="Aguarda a resposta completa em vez de materializar o código em streaming"
+    )
+    parser.add_argument(
+        "--no-routing", action="store_true",
+        help="Usa o mesmo modelo em todos os estágios, sem roteamento nem escalonamento"
+    )
+    parser.add_argument(
+        "--stage-model", action="append", metavar="ESTAGIO=MODELO[,MODELO...]",
+        help="Escada de modelos do estágio, do mais barato ao mais capaz (repetível)"
+    )
+    parser.add_argument(
+        "--stage-budget", action="append", metavar="ESTAGIO=SEGUNDOS",
+        help="Orçamento de latência por chamada do estágio (repetível)"
+    )
+    parser.add_argument(
+        "--hedge", action="store_true",
+        help="Repete no outro provedor as chamadas que passarem do percentil de latência"
+    )
+    parser.add_argument(
+        "--hedge-percentile", type=float, default=None,
+        help="Percentil da latência observada que dispara o hedge (padrão: BPM_HEDGE_PERCENTILE ou 95)"
+    )
+    parser.add_argument(
+        "--metrics-port", type=int, default=None,
+        help="Expõe métricas Prometheus dos agentes em http://localhost:<porta>/metrics"
+    )
+    parser.add_argument(
+        "--resume", nargs="?", const="latest", default=None, metavar="RUN_ID",
+        help="Retoma uma execução interrompida a partir dos estágios gravados (padrão: a mais recente)"
+    )
+    parser.add_argument(
+        "--deadline", type=float, default=DEFAULT_DEADLINE, metavar="SEGUNDOS",
+        help="Prazo total da requisição, repartido entre os estágios (padrão: BPM_DEADLINE_SECONDS)"
+    )
+    parser.add_argument(
+        "--app-host", default=DEFAULT_HOST_URL, metavar="URL",
+        help="Monta o backend no host de aplicações (python app_host.py) em vez de iniciar um processo (BPM_APP_HOST_URL)"
+    )
+    parser.add_argument(
+        "--load-test", action="store_true",
+        help="Submete o backend implantado a um teste de carga e não o promove se reprovar"
+    )
+    parser.add_argument(
+        "--load-concurrency", type=int, default=10,
+        help="Clientes simultâneos no teste de carga"
+    )
+    parser.add_argument(
+        "--load-duration", type=float, default=10.0, metavar="SEGUNDOS",
+        help="Duração do teste de carga"
+    )
+    parser.add_argument(
+        "--load-max-p95", type=float, default=DEFAULT_MAX_P95_MS, metavar="MS",
+        help="p95 máximo para aprovar o backend (padrão: BPM_LOADTEST_MAX_P95_MS ou 500)"
+    )
+    parser.add_argument(
+        "--frontend-host", default=DEFAULT_FRONTEND_HOST,
+        help="Interface do servidor de frontends (0.0.0.0 para compartilhar na rede; padrão: BPM_FRONTEND_HOST)"
+    )
+    parser.add_argument(
+        "--frontend-port", type=int, default=DEFAULT_FRONTEND_PORT,
+        help="Porta do servidor de frontends (padrão: BPM_FRONTEND_PORT ou uma porta livre)"
+    )
+    parser.add_argument(
+        "--redeploy", metavar="PROCESS_ID[@VERSAO]",
+        help="Reimplanta uma versão gravada no store de artefatos, sem gerar código (padrão: a mais recente)"
+    )
+    parser.add_argument(
+        "--list-artifacts", action="store_true",
+        help="Lista as versões gravadas no store de artefatos e encerra"
+    )
+    parser.add_argument(
+        "--prune-artifacts", type=int, metavar="N",
+        help="Mantém as N versões mais recentes de cada processo, apaga os blobs sem referência e encerra"
+    )
+    parser.add_argument(
+        "--list-runs", action="store_true",
+        help="Lista as execuções gravadas e seus estágios concluídos e encerra"
+    )
+    return parser.parse_args()
+
+def print_runs(limit: int = 20):
+    """Mostra as execuções gravadas (ID, status e estágios concluídos)"""
+    from rich.table import Table
+    
+    table = Table(show_header=True, title="💾 Execuções")
+    table.add_column("Run ID", style="cyan")
+    table.add_column("Status", style="yellow")
+    table.add_column("Atualizada", style="dim")
+    table.add_column("Estágios concluídos", style="green")
+    for run in RunCheckpoint.list_runs(limit):
+        updated = datetime.fromtimestamp(run["updated_at"]).strftime("%d/%m/%Y %H:%M:%S")
+        table.add_row(run["run_id"], run["status"], updated, ", ".join(run["stages"]) or "—")
+    console.print(table)
+
+def print_artifacts(limit: int = 20):
+    """Mostra as versões gravadas no store de artefatos e o ganho de deduplicação"""
+    from rich.table import Table
+    
+    artifact_store = ArtifactStore()
+    table = Table(show_header=True, title="📦 Artefatos")
+    table.add_column("Processo", style="cyan")
+    table.add_column("Versão", style="yellow")
+    table.add_column("Criada", style="dim")
+    table.add_column("Artefatos", style="green")
+    table.add_column("Tamanho", style="magenta")
+    table.add_column("Run ID", style="dim")
+    for item in artifact_store.versions()[:limit]:
+        created = datetime.fromtimestamp(item["created_at"]).strftime("%d/%m/%Y %H:%M:%S")
+        table.add_row(item["process_id"], f"v{item['version']}", created, ", ".join(item["kinds"]),
+                      f"{item['size_bytes'] / 1024:.1f} KB", item["run_id"] or "—")
+    console.print(table)
+    stats = artifact_store.stats()
+    console.print(
+        f"[dim]{stats['versions']} versão(ões), {stats['blobs']} blob(s) únicos: "
+        f"{stats['size_bytes'] / 1024:.1f} KB → {stats['stored_bytes'] / 1024:.1f} KB em disco ({stats['root']})[/dim]"
+    )
+    artifact_store.close()
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.import_report:
+        import_time_report()
+        sys.exit(0)
+    if args.list_runs:
+        print_runs()
+        sys.exit(0)
+    if args.list_artifacts:
+        print_artifacts()
+        sys.exit(0)
+    if args.prune_artifacts is not None:
+        artifact_store = ArtifactStore()
+        pruned = artifact_store.prune(args.prune_artifacts)
+        removed, freed = artifact_store.gc()
+        console.print(f"[green]🧹 {pruned} versão(ões) removida(s), {removed} blob(s) apagado(s) ({freed / 1024:.1f} KB)[/green]")
+        artifact_store.close()
+        sys.exit(0)
+    if args.redeploy:
+        try:
+            asyncio.run(redeploy_artifacts(args.redeploy, args.app_host, args.frontend_host, args.frontend_port))
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+    
+    from rich.panel import Panel
     try:
         console.print(Panel.fit(
             "[bold blue]🚀 BPM AI Solution - Complete Workflow[/bold blue]\n"
@@ -1123,10 +2258,23 @@ if __name__ == "__main__":
             sys.exit(1)
         
         # Executar workflow completo
-        asyncio.run(run_complete_workflow())
+        asyncio.run(run_complete_workflow(
+            use_cache=not args.no_cache, max_concurrency=args.max_concurrency,
+            stream=not args.no_stream, memoize=not args.no_memo,
+            from_stage=args.from_stage, use_templates=not args.no_templates,
+            metrics_port=args.metrics_port, routing=not args.no_routing,
+            stage_models=args.stage_model, stage_budgets=args.stage_budget,
+            hedge=args.hedge, hedge_percentile=args.hedge_percentile,
+            resume=args.resume, deadline=args.deadline, app_host=args.app_host,
+            load_test=LoadTestConfig(
+                concurrency=args.load_concurrency, duration=args.load_duration, max_p95_ms=args.load_max_p95
+            ) if args.load_test else None,
+            frontend_host=args.frontend_host, frontend_port=args.frontend_port
+        ))
         
     except KeyboardInterrupt:
         console.print(f"\n[yellow]⚠️ Workflow interrompido pelo usuário[/yellow]")
+        console.print("[yellow]💾 Estágios concluídos preservados; retome com: python bpm_complete_workflow.py --resume[/yellow]")
     except Exception as e:
         console.print(f"\n[red]❌ Erro na execução do workflow: {e}[/red]")
         import traceback
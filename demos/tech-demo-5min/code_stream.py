@@ -0,0 +1,98 @@
+"""
+BPM AI Solution - Extração incremental de código
+Extrai o bloco de código (```lang ... ```) de respostas transmitidas em chunks
+"""
+
+from typing import List
+
+FENCE = "```"
+
+
+class CodeFenceExtractor:
+    """Extrai incrementalmente o primeiro bloco cercado por ``` de um stream de texto
+
+    `feed` devolve apenas o código novo que já é seguro materializar; os últimos
+    caracteres ficam retidos até se saber se iniciam a cerca de fechamento.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.fenced = False
+        self.closed = False
+        self._code_start = 0
+        self._emitted = 0
+        self._code_end = None
+        self._parts: List[str] = []
+
+    def feed(self, chunk: str) -> str:
+        """Consome um chunk e retorna o trecho de código liberado"""
+        if self.closed:
+            return ""
+        self.buffer += chunk
+
+        if not self.fenced:
+            if not self._find_opening():
+                return ""
+
+        return self._scan_code()
+
+    def _find_opening(self) -> bool:
+        index = self.buffer.find(FENCE)
+        while index != -1 and index > 0 and self.buffer[index - 1] != "\n":
+            index = self.buffer.find(FENCE, index + 1)
+        if index == -1:
+            return False
+
+        # A linha de abertura (```python) precisa estar completa
+        newline = self.buffer.find("\n", index)
+        if newline == -1:
+            return False
+
+        self.fenced = True
+        self._code_start = newline + 1
+        self._emitted = self._code_start
+        return True
+
+    def _scan_code(self) -> str:
+        start = self._emitted
+        if self.buffer.startswith(FENCE, self._code_start) and self._emitted == self._code_start:
+            closing = self._code_start
+        else:
+            closing = self.buffer.find("\n" + FENCE, max(start - 1, self._code_start))
+            if closing != -1:
+                closing += 1
+
+        if closing != -1:
+            self.closed = True
+            self._code_end = closing
+            code = self.buffer[start:closing]
+            self._emitted = closing
+        else:
+            # Retém o sufixo que pode ser o início de "\n```"
+            safe = max(len(self.buffer) - len(FENCE), start)
+            code = self.buffer[start:safe]
+            self._emitted = safe
+
+        self._parts.append(code)
+        return code
+
+    def finish(self) -> str:
+        """Finaliza o stream e retorna o código completo
+
+        Sem cerca de abertura, a resposta inteira é tratada como código. Uma
+        cerca que nunca fechou (resposta truncada) libera o restante do buffer.
+        """
+        if not self.fenced:
+            return self.buffer.strip() + "\n"
+        if not self.closed:
+            self._parts.append(self.buffer[self._emitted:])
+            self._emitted = len(self.buffer)
+            self.closed = True
+        return "".join(self._parts)
+
+
+def extract_code_block(content: str) -> str:
+    """Extrai o código de uma resposta completa"""
+    extractor = CodeFenceExtractor()
+    extractor.feed(content)
+    return extractor.finish()
@@ -0,0 +1,194 @@
+"""
+BPM AI Solution - Validação estática do código gerado
+Compila o backend, confere imports contra a lista permitida, caminhos de
+banco SQLite e os endpoints obrigatórios sem executar nada (milissegundos,
+antes do deploy)
+"""
+
+import ast
+import os
+import re
+import sys
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+# Pacotes externos permitidos pelo prompt de geração (a biblioteca padrão é livre)
+ALLOWED_PACKAGES = {"fastapi", "pydantic", "starlette", "uvicorn"}
+
+# (método, rota) obrigatórios; `{}` casa com o process_id literal ou um parâmetro de rota
+REQUIRED_ENDPOINTS = [
+    ("POST", "/api/processes/{}/start"),
+    ("GET", "/api/processes/{}/tasks"),
+    ("POST", "/api/processes/{}/tasks/{}/complete"),
+    ("GET", "/api/processes/{}/status"),
+    ("GET", "/health"),
+]
+
+_HTTP_METHODS = {"get", "post", "put", "patch", "delete"}
+_PATH_PARAM = re.compile(r"\{[^{}/]*\}")
+
+
+@dataclass
+class ValidationIssue:
+    """Problema encontrado no código, com a linha quando conhecida
+
+    Avisos (`warning`) não impedem o deploy: um endpoint que a análise
+    estática não encontrou pode estar registrado de forma dinâmica.
+    """
+    kind: str  # syntax | import | endpoint | app | data
+    message: str
+    line: Optional[int] = None
+    warning: bool = False
+
+    def __str__(self) -> str:
+        return f"linha {self.line}: {self.message}" if self.line else self.message
+
+
+def _normalize_route(path: str, process_id: Optional[str]) -> str:
+    if process_id:
+        path = path.replace(f"/{process_id}/", "/{}/").rstrip("/")
+        if path.endswith(f"/{process_id}"):
+            path = path[: -len(process_id)] + "{}"
+    return _PATH_PARAM.sub("{}", path).rstrip("/") or "/"
+
+
+def _const_str(node: Optional[ast.AST]) -> Optional[str]:
+    return node.value if isinstance(node, ast.Constant) and isinstance(node.value, str) else None
+
+
+def _keyword(call: ast.Call, name: str) -> Optional[str]:
+    return next((_const_str(kw.value) for kw in call.keywords if kw.arg == name), None)
+
+
+def _methods(call: ast.Call, default: List[str]) -> List[str]:
+    methods = next((kw.value for kw in call.keywords if kw.arg == "methods"), None)
+    if methods is None:
+        return default
+    return [_const_str(item).upper() for item in getattr(methods, "elts", []) if _const_str(item)]
+
+
+def _declared_routes(tree: ast.Module) -> Tuple[Set[Tuple[str, str]], bool]:
+    """Rotas (método, caminho) declaradas e se há um `app` no módulo
+
+    Considera decorators (`@app.get`, `@router.api_route`), chamadas diretas
+    (`app.add_api_route`, `app.get("/x")(handler)`), o `prefix` de
+    `APIRouter(...)` e de `app.include_router(...)`.
+    """
+    prefixes: Dict[str, str] = {}
+    apps: Set[str] = set()  # Nomes ligados a FastAPI(...) / APIRouter(...)
+    has_app = False
+    for node in tree.body:
+        if isinstance(node, ast.Assign):
+            targets, value = node.targets, node.value
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            targets, value = [node.target], node.value  # app: FastAPI = FastAPI()
+        else:
+            continue
+        if not isinstance(value, ast.Call):
+            continue
+        func = value.func
+        name = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", "")
+        for target in targets:
+            if not isinstance(target, ast.Name):
+                continue
+            if target.id == "app":
+                has_app = True
+            if name in ("FastAPI", "APIRouter"):
+                apps.add(target.id)
+            if name == "APIRouter":
+                prefixes[target.id] = _keyword(value, "prefix") or ""
+
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and node.func.attr == "include_router" and node.args
+                and isinstance(node.args[0], ast.Name)):
+            router = node.args[0].id
+            prefixes[router] = (_keyword(node, "prefix") or "") + prefixes.get(router, "")
+
+    decorators = {
+        id(decorator) for node in ast.walk(tree)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) for decorator in node.decorator_list
+    }
+    routes: Set[Tuple[str, str]] = set()
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and isinstance(node.func.value, ast.Name)):
+            continue
+        method, owner = node.func.attr, node.func.value.id
+        if id(node) not in decorators and owner not in apps:
+            continue  # Fora de decorator, só chamadas em objetos FastAPI/APIRouter
+        path = _const_str(node.args[0]) if node.args else _keyword(node, "path")
+        if path is None or not path.startswith("/"):
+            continue
+        prefix = prefixes.get(owner, "")
+        if method in _HTTP_METHODS:
+            methods = [method.upper()]
+        elif method == "api_route":
+            methods = _methods(node, [])
+        elif method == "add_api_route":
+            methods = _methods(node, ["GET"])  # Padrão do FastAPI sem `methods`
+        else:
+            continue
+        routes.update((item, prefix + path) for item in methods)
+    return routes, has_app
+
+
+def _sqlite_literal_path(node: ast.AST) -> Optional[str]:
+    # Caminho literal em sqlite3.connect("...") / connect("..."), se houver
+    if not (isinstance(node, ast.Call) and node.args):
+        return None
+    func = node.func
+    is_connect = (
+        (isinstance(func, ast.Attribute) and func.attr == "connect"
+         and isinstance(func.value, ast.Name) and func.value.id == "sqlite3")
+        or (isinstance(func, ast.Name) and func.id == "connect")
+    )
+    return _const_str(node.args[0]) if is_connect else None
+
+
+def validate_backend(code: str, process_id: Optional[str] = None,
+                     filename: str = "<backend>") -> List[ValidationIssue]:
+    """Problemas do backend gerado (sem erros = pode seguir para o deploy;
+    os com `warning` só são reportados)"""
+    try:
+        tree = ast.parse(code, filename)
+        compile(tree, filename, "exec")
+    except SyntaxError as e:
+        return [ValidationIssue("syntax", f"erro de sintaxe: {e.msg}", e.lineno)]
+
+    issues: List[ValidationIssue] = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            root = name.split(".")[0]
+            if root not in ALLOWED_PACKAGES and root not in sys.stdlib_module_names:
+                issues.append(ValidationIssue(
+                    "import", f"import não permitido: {name} (use apenas FastAPI, Pydantic e a biblioteca padrão)",
+                    node.lineno
+                ))
+
+    for node in ast.walk(tree):
+        path = _sqlite_literal_path(node)
+        if path is not None and path != ":memory:" and not os.path.isabs(path):
+            issues.append(ValidationIssue(
+                "data", f"banco SQLite em caminho relativo fixo ({path!r}); use os.path.join(DATA_DIR, {path!r})",
+                node.lineno
+            ))
+
+    routes, has_app = _declared_routes(tree)
+    if not has_app:
+        issues.append(ValidationIssue("app", "o módulo deve definir `app = FastAPI(...)` no nível superior"))
+    # Módulo que compila e define `app`: endpoint não encontrado é só aviso
+    soft = has_app
+    declared = {(method, _normalize_route(path, process_id)) for method, path in routes}
+    for method, path in REQUIRED_ENDPOINTS:
+        if (method, path) not in declared:
+            example = path.replace("{}", process_id or "{process_id}", 1).replace("{}", "{task_id}")
+            issues.append(ValidationIssue("endpoint", f"endpoint obrigatório ausente: {method} {example}",
+                                          warning=soft))
+    return issues
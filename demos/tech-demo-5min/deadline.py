@@ -0,0 +1,89 @@
+"""
+BPM AI Solution - Prazos por requisição
+O prazo total da requisição é dividido em orçamentos por estágio e propagado
+a cada chamada de agente; ao estourar, a chamada é cancelada e o agente
+devolve o seu fallback
+"""
+
+import asyncio
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Dict, Optional
+
+from model_router import DEFAULT_BUDGETS
+from tracing import collect_traces
+
+DEFAULT_DEADLINE = float(os.environ.get("BPM_DEADLINE_SECONDS", "0")) or None
+
+# Prazo absoluto (time.monotonic) do estágio em execução na task atual
+current_deadline: ContextVar[Optional[float]] = ContextVar("current_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Orçamento do estágio esgotado antes da resposta do LLM"""
+
+
+def remaining_time() -> Optional[float]:
+    """Segundos até o prazo do estágio atual (None sem prazo)"""
+    deadline = current_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+async def within_deadline(call: Awaitable[Any]) -> Any:
+    """Aguarda `call` até o prazo do estágio atual, cancelando-a ao estourar
+
+    `wait_for` executa a chamada em outra task; `collect_traces` devolve o
+    trace dela ao chamador, para que o fallback seja marcado no trace certo.
+    """
+    remaining = remaining_time()
+    if remaining is None:
+        return await call
+    if remaining <= 0:
+        if asyncio.iscoroutine(call):
+            call.close()
+        raise DeadlineExceeded("prazo do estágio esgotado")
+    try:
+        with collect_traces():
+            return await asyncio.wait_for(call, remaining)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"prazo do estágio esgotado ({remaining:.1f}s)") from None
+
+
+class RequestDeadline:
+    """Prazo total de uma requisição, repartido entre os estágios do grafo
+
+    Ao iniciar, cada estágio recebe do tempo restante a fração `peso /
+    peso do caminho mais longo a partir dele`, então a folga deixada por
+    estágios rápidos passa para os seguintes e estágios paralelos (backend e
+    frontend) dividem o mesmo tempo. Os pesos padrão são os orçamentos de
+    latência do roteador; estágios sem peso (ambiente, deploy) ficam apenas
+    sob o prazo total.
+    """
+
+    def __init__(self, total_seconds: float, weights: Optional[Dict[str, float]] = None):
+        self.total_seconds = total_seconds
+        self.weights = dict(DEFAULT_BUDGETS, **(weights or {}))
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + total_seconds
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def _path_weight(self, scheduler: Any, name: str, memo: Dict[str, float]) -> float:
+        # Peso do caminho mais longo que começa no estágio (ele + dependentes)
+        if name not in memo:
+            dependents = [stage.name for stage in scheduler.stages.values() if name in stage.depends_on]
+            memo[name] = self.weights.get(name, 0.0) + max(
+                (self._path_weight(scheduler, child, memo) for child in dependents), default=0.0
+            )
+        return memo[name]
+
+    def stage_deadline(self, scheduler: Any, name: str) -> float:
+        """Prazo absoluto do estágio que está começando agora"""
+        now = time.monotonic()
+        weight = self.weights.get(name, 0.0)
+        path = self._path_weight(scheduler, name, {})
+        if weight <= 0 or path <= 0:
+            return self.expires_at
+        return now + max(self.expires_at - now, 0.0) * weight / path
@@ -0,0 +1,146 @@
+"""
+BPM AI Solution - Requisições com hedge entre provedores
+Se a chamada não responde até o percentil configurado da sua latência
+histórica, a mesma requisição é disparada no provedor secundário; a
+primeira resposta válida vence e a outra é cancelada
+"""
+
+import asyncio
+import os
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from llm_client import provider_for_model
+from tracing import last_trace
+
+# Modelo equivalente no outro provedor
+HEDGE_PAIRS = {
+    "claude-sonnet-4-20250514": "gpt-4o",
+    "claude-3-5-haiku-20241022": "gpt-4o-mini",
+    "gpt-4": "claude-sonnet-4-20250514",
+    "gpt-4o": "claude-sonnet-4-20250514",
+    "gpt-4o-mini": "claude-3-5-haiku-20241022",
+}
+DEFAULT_SECONDARY = {"anthropic": "gpt-4o", "openai": "claude-sonnet-4-20250514"}
+
+DEFAULT_PERCENTILE = float(os.environ.get("BPM_HEDGE_PERCENTILE", "95"))
+DEFAULT_INITIAL_DELAY = float(os.environ.get("BPM_HEDGE_INITIAL_DELAY", "10"))
+
+
+class RequestHedger:
+    """Dispara uma requisição de reserva quando a principal passa do percentil de latência
+
+    Até haver `min_samples` latências do (estágio, modelo), o limiar é
+    `initial_delay`. Só respostas válidas vencem: a chamada inclui o parse,
+    então uma saída inválida de um provedor ainda espera pelo outro. Se a
+    principal falhar antes do limiar (429, 5xx, conexão recusada), a reserva
+    é disparada na hora.
+    """
+
+    def __init__(self, api_keys: Dict[str, str], percentile: float = DEFAULT_PERCENTILE,
+                 initial_delay: float = DEFAULT_INITIAL_DELAY, min_samples: int = 10,
+                 window: int = 200):
+        self.api_keys = {provider: key for provider, key in api_keys.items() if key}
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.window = window
+
+        self._latencies: Dict[Tuple[str, str], Deque[float]] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedged = 0
+        self.failovers = 0  # Reserva disparada por falha da principal antes do limiar
+        self.wins: Dict[str, int] = {"primary": 0, "secondary": 0}
+        self.wins_by_provider: Dict[str, int] = {}
+
+    def api_key(self, model: str) -> str:
+        return self.api_keys[provider_for_model(model)]
+
+    def secondary_for(self, model: str) -> Optional[str]:
+        """Modelo equivalente no outro provedor (None sem chave configurada)"""
+        secondary = HEDGE_PAIRS.get(model) or DEFAULT_SECONDARY[provider_for_model(model)]
+        provider = provider_for_model(secondary)
+        if provider == provider_for_model(model) or provider not in self.api_keys:
+            return None
+        return secondary
+
+    def threshold(self, stage: str, model: str) -> float:
+        """Tempo de espera antes do hedge: percentil da latência observada"""
+        with self._lock:
+            samples = sorted(self._latencies.get((stage, model), ()))
+        if len(samples) < self.min_samples:
+            return self.initial_delay
+        rank = min(int(len(samples) * self.percentile / 100), len(samples) - 1)
+        return samples[rank]
+
+    def record(self, stage: str, model: str, seconds: float):
+        with self._lock:
+            samples = self._latencies.setdefault((stage, model), deque(maxlen=self.window))
+            samples.append(seconds)
+
+    async def run(self, stage: str, model: str, call: Callable[[str], Awaitable[Any]]) -> Any:
+        """Executa `call(model)` com hedge no provedor secundário"""
+        self.calls += 1
+        secondary = self.secondary_for(model)
+        if secondary is None:
+            return await call(model)
+
+        loop = asyncio.get_running_loop()
+
+        async def attempt(target: str):
+            start = loop.time()
+            result = await call(target)
+            trace = last_trace.get()
+            if trace is None or not trace.cached:
+                self.record(stage, target, loop.time() - start)
+            return result, trace
+
+        primary = asyncio.create_task(attempt(model))
+        tasks = {primary: "primary"}
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.threshold(stage, model))
+            failed = bool(done) and not primary.cancelled() and primary.exception() is not None
+            if not done or failed:
+                self.hedged += 1
+                self.failovers += int(failed)
+                tasks[asyncio.create_task(attempt(secondary))] = "secondary"
+
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                        continue
+                    result, trace = task.result()
+                    role = tasks[task]
+                    winner = model if role == "primary" else secondary
+                    with self._lock:
+                        self.wins[role] += 1
+                        provider = provider_for_model(winner)
+                        self.wins_by_provider[provider] = self.wins_by_provider.get(provider, 0) + 1
+                    # Tasks rodam em cópias do contexto: propaga o trace do vencedor
+                    if trace is not None:
+                        last_trace.set(trace)
+                    return result
+            raise error
+        finally:
+            losers = [task for task in tasks if not task.done()]
+            for task in losers:
+                task.cancel()
+            if losers:
+                await asyncio.gather(*losers, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_rate": self.hedged / self.calls if self.calls else 0.0,
+            "failovers": self.failovers,
+            "wins": dict(self.wins),
+            "wins_by_provider": dict(self.wins_by_provider),
+            "percentile": self.percentile,
+        }
@@ -0,0 +1,199 @@
+"""
+BPM AI Solution - Extração de JSON das respostas LLM
+Varredura única e incremental de objetos balanceados ({...}) em meio a prosa,
+cercas de código e múltiplos objetos, inclusive em chunks de streaming
+"""
+
+import json
+import re
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+# String sem chaves, colchetes nem escapes (pulada de uma vez), sequência de
+# barras invertidas (escapa o caractere seguinte se for ímpar), aspas ou
+# chave/colchete
+_TOKEN = re.compile(r'"[^"\\{}\[\]]*"|\\+|[{}\[\]"]')
+_CLOSERS = {"{": "}", "[": "]"}
+_OBJECT_START = re.compile(r'\{\s*["}]')
+_NOT_OBJECT = re.compile(r'\{\s*[^\s"}]')  # Chave de prosa: `{rascunho}`
+_FAILED = -1
+_DECODER = json.JSONDecoder()
+
+
+class JSONObjectExtractor:
+    """Extrai objetos JSON de nível superior à medida que o texto chega
+
+    Uma única passada visita só barras, aspas, chaves e colchetes. Se um
+    objeto começa numa chave, o que está dentro de string a partir dela só
+    depende da paridade das aspas não escapadas antes dessa chave, então
+    basta uma pilha de chaves/colchetes abertos por paridade: cada candidato
+    `{` fecha (trecho balanceado), ou é descartado num fechamento sem par ou
+    no fim da resposta. O decoder roda uma única vez por trecho balanceado,
+    só sobre o próprio trecho. Candidatos inválidos (chaves soltas na prosa)
+    cedem a vez ao próximo `{`, como se a varredura recomeçasse logo após a
+    chave de abertura; o custo é linear no tamanho da resposta mais o dos
+    trechos decodificados.
+
+    Sem candidato pendente, um objeto inteiro dentro do chunk é decodificado
+    direto pelo `raw_decode` (C); como a falha custa até a posição do erro,
+    essa tentativa é feita no máximo uma vez por chunk sem sucesso.
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self._parts: Deque[Tuple[int, str]] = deque()  # (posição absoluta, chunk) ainda necessários
+        self._size = 0  # Caracteres recebidos
+        self._parity = 0  # Aspas não escapadas até aqui, módulo 2
+        self._escaped = -1  # Posição escapada pela última sequência ímpar de `\\`
+        self._run_end = -1  # Fim da última sequência de `\\` e se ela era ímpar
+        self._run_odd = 0
+        self._stacks: Tuple[List[Tuple[str, int]], List[Tuple[str, int]]] = ([], [])
+        self._candidates: Deque[int] = deque()  # Inícios dos candidatos, em ordem
+        self._ends: Dict[int, Optional[int]] = {}  # Início → fim, _FAILED ou None (aberto)
+        self._pos = 0  # Objetos emitidos terminam antes daqui
+
+    @property
+    def inside(self) -> bool:
+        """Há um objeto aberto aguardando mais texto"""
+        return bool(self._candidates)
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Processa um trecho e retorna os objetos que fecharam nele"""
+        offset = self._size
+        self._size += len(chunk)
+        self._parts.append((offset, chunk))
+        ends = self._ends
+        found: List[Any] = []
+        fast = True  # Ainda vale tentar o raw_decode neste chunk
+        pos = 0
+
+        while True:
+            match = _TOKEN.search(chunk, pos)
+            if match is None:
+                break
+            token = match.group()
+            pos = match.end()
+            i = offset + match.start()
+            if len(token) > 1 and token[0] == '"':
+                if i == self._escaped:
+                    self._parity ^= 1  # Aspa escapada + aspa real: uma única troca
+            elif token[0] == "\\":
+                odd = len(token) % 2
+                if i == self._run_end:
+                    odd ^= self._run_odd  # Sequência que começou no chunk anterior
+                self._run_end, self._run_odd = offset + match.end(), odd
+                self._escaped = self._run_end if odd else -1
+            elif token == '"':
+                if i != self._escaped:
+                    self._parity ^= 1
+            elif token == "{" and fast and not self._candidates and i >= self._pos \
+                    and _OBJECT_START.match(chunk, match.start()):
+                try:
+                    value, end = _DECODER.raw_decode(chunk, match.start())
+                except (ValueError, RecursionError):
+                    fast = False  # Incompleto ou inválido: segue pela varredura
+                    pos = match.start()
+                    continue
+                # Objeto válido: paridade das aspas inalterada e pilhas irrelevantes daqui em diante
+                found.append(value)
+                pos = end
+                self._pos = offset + end
+                self._stacks[0].clear()
+                self._stacks[1].clear()
+                self._escaped = self._run_end = -1
+            elif token in _CLOSERS:
+                self._stacks[self._parity].append((_CLOSERS[token], i))
+                if token == "{" and i >= self._pos and not _NOT_OBJECT.match(chunk, match.start()):
+                    self._candidates.append(i)
+                    ends[i] = None
+            else:
+                stack = self._stacks[self._parity]
+                if stack and stack[-1][0] == token:
+                    _, start = stack.pop()
+                    if start in ends:
+                        ends[start] = i
+                        if start == self._candidates[0]:
+                            found.extend(self._resolve())
+                else:
+                    # Fechamento sem par: nenhum candidato aberto nesta paridade é JSON
+                    for _, start in stack:
+                        if start in ends:
+                            ends[start] = _FAILED
+                    stack.clear()
+
+        found.extend(self._resolve())
+        keep = self._candidates[0] if self._candidates else self._size
+        while self._parts and self._parts[0][0] + len(self._parts[0][1]) <= keep:
+            self._parts.popleft()
+        return found
+
+    def _resolve(self) -> List[Any]:
+        """Decide os candidatos em ordem até o primeiro ainda aberto"""
+        found: List[Any] = []
+        while self._candidates:
+            start = self._candidates[0]
+            end = self._ends[start]
+            if end is None and start >= self._pos:
+                break
+            self._candidates.popleft()
+            del self._ends[start]
+            if end is None or end == _FAILED or start < self._pos:
+                continue  # Inválido ou dentro de um objeto já emitido
+            try:
+                found.append(_DECODER.decode(self._text(start, end + 1)))
+            except (ValueError, RecursionError):
+                continue  # Balanceado mas não é JSON (ou fundo demais): tenta o próximo `{`
+            self._pos = end + 1
+        return found
+
+    def _text(self, start: int, end: int) -> str:
+        pieces = []
+        for offset, chunk in self._parts:
+            if offset >= end:
+                break
+            if offset + len(chunk) > start:
+                pieces.append(chunk[max(start - offset, 0):end - offset])
+        return "".join(pieces)
+
+    def finish(self) -> List[Any]:
+        """Fim da resposta: candidatos ainda abertos não fecham mais (chaves soltas na prosa)"""
+        for start, end in self._ends.items():
+            if end is None:
+                self._ends[start] = _FAILED
+        found = self._resolve()
+        self._reset()
+        return found
+
+
+def extract_json_objects(text: str) -> List[Any]:
+    """Todos os objetos JSON de nível superior do texto, em ordem"""
+    extractor = JSONObjectExtractor()
+    return extractor.feed(text) + extractor.finish()
+
+
+def select_json_object(objects: Iterable[Any], required_keys: Iterable[str] = ()) -> Dict[str, Any]:
+    """Escolhe o objeto com todas as `required_keys` ou, sem nenhum, o de mais chaves"""
+    candidates = [obj for obj in objects if isinstance(obj, dict)]
+    required = set(required_keys)
+    if required:
+        for obj in candidates:
+            if required.issubset(obj):
+                return obj
+    if not candidates:
+        raise ValueError("No valid JSON found in response")
+    return max(candidates, key=len)
+
+
+def extract_json(text: str, required_keys: Iterable[str] = ()) -> Dict[str, Any]:
+    """Objeto JSON principal de uma resposta LLM (ValueError se não houver nenhum)"""
+    return select_json_object(extract_json_objects(text), required_keys)
+
+
+def required_fields(schema: type) -> List[str]:
+    """Campos obrigatórios de um modelo Pydantic (v1 ou v2)"""
+    fields: Optional[Dict[str, Any]] = getattr(schema, "model_fields", None)
+    if fields is not None:
+        return [name for name, field in fields.items() if field.is_required()]
+    return [name for name, field in schema.__fields__.items() if field.required]
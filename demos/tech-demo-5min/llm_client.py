@@ -0,0 +1,212 @@
+"""
+BPM AI Solution - Pool de clientes LLM
+Clientes compartilhados por provedor/modelo com chamadas assíncronas nativas
+"""
+
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from rate_limiter import estimate_tokens, get_rate_limiter, rate_limit_status
+from tracing import record_queue_wait, record_retry, record_usage
+
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("BPM_LLM_MAX_CONCURRENCY", "64"))
+
+
+def provider_for_model(model: str) -> str:
+    """Identifica o provedor a partir do nome do modelo"""
+    return "anthropic" if "claude" in model.lower() else "openai"
+
+
+def chunk_text(content: Any) -> str:
+    """Normaliza o conteúdo de um chunk (texto ou lista de blocos) para string"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            block.get("text", "") if isinstance(block, dict) else str(block)
+            for block in content
+        )
+    return str(content or "")
+
+
+class LLMClientPool:
+    """Mantém um único chat model por provedor/modelo/chave e limita chamadas simultâneas
+
+    Cada instância de ChatAnthropic/ChatOpenAI carrega o cliente HTTP do SDK
+    (httpx com keep-alive), então compartilhar a instância compartilha as
+    conexões. Temperatura e max_tokens são aplicados por chamada via `bind`.
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.waiting = 0
+        self.total_calls = 0
+
+        self._clients: Dict[Tuple[str, str, str], Any] = {}
+        self._providers: Dict[int, str] = {}
+        self._semaphores: Dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+        self._lock = threading.Lock()
+
+    def get(self, api_key: str, model: str) -> Any:
+        """Retorna (criando uma única vez) o chat model compartilhado"""
+        provider = provider_for_model(model)
+        key = (provider, model, api_key)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._create(provider, api_key, model)
+                self._clients[key] = client
+                self._providers[id(client)] = provider
+            return client
+
+    def _create(self, provider: str, api_key: str, model: str) -> Any:
+        if provider == "anthropic":
+            from langchain_anthropic import ChatAnthropic
+            return ChatAnthropic(anthropic_api_key=api_key, model=model)
+
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(openai_api_key=api_key, model=model)
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # Semáforos ficam presos ao loop em que foram usados; um por loop
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    def _bind(self, llm: Any, temperature: Optional[float], max_tokens: Optional[int],
+              schema: Optional[type] = None) -> Any:
+        # Com schema, força a chamada da ferramenta (saída estruturada nativa)
+        runnable = llm.bind_tools([schema], tool_choice=schema.__name__) if schema is not None else llm
+        params: Dict[str, Any] = {}
+        if temperature is not None:
+            params["temperature"] = temperature
+        if max_tokens is not None:
+            params["max_tokens"] = max_tokens
+        return runnable.bind(**params) if params else runnable
+
+    @asynccontextmanager
+    async def _slot(self):
+        """Reserva uma vaga de concorrência durante a chamada"""
+        semaphore = self._semaphore()
+        self.waiting += 1
+        start = time.monotonic()
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+            record_queue_wait(time.monotonic() - start)
+
+        self.in_flight += 1
+        self.total_calls += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            semaphore.release()
+
+    @staticmethod
+    async def _acquire_budget(limiter: Any, estimated: int):
+        start = time.monotonic()
+        await limiter.acquire(estimated)
+        record_queue_wait(time.monotonic() - start)
+
+    async def ainvoke(self, llm: Any, messages: List[Any], temperature: Optional[float] = None,
+                      max_tokens: Optional[int] = None, schema: Optional[type] = None) -> Any:
+        """Invoca o modelo de forma assíncrona respeitando rate limit e concorrência
+
+        Respostas 429/529 não derrubam a chamada: o provedor inteiro entra em
+        backoff e a requisição volta para a fila do limiter. Com `schema`, o
+        modelo é obrigado a responder via tool calling.
+        """
+        runnable = self._bind(llm, temperature, max_tokens, schema)
+        limiter = get_rate_limiter(self._providers.get(id(llm), "openai"))
+        estimated = estimate_tokens(messages)
+
+        attempt = 0
+        while True:
+            await self._acquire_budget(limiter, estimated)
+            try:
+                async with self._slot():
+                    result = await runnable.ainvoke(messages)
+            except Exception as e:
+                if rate_limit_status(e) is None or attempt >= limiter.max_retries:
+                    raise
+                record_retry()
+                await asyncio.sleep(limiter.backoff(attempt, e))
+                attempt += 1
+                continue
+
+            usage = getattr(result, "usage_metadata", None) or {}
+            record_usage(usage)
+            limiter.settle(estimated, usage.get("input_tokens"))
+            return result
+
+    async def astream(self, llm: Any, messages: List[Any], temperature: Optional[float] = None,
+                      max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """Transmite o texto da resposta à medida que os tokens chegam
+
+        O backoff em 429/529 só se aplica antes do primeiro chunk; depois disso
+        o erro é propagado para não duplicar conteúdo já entregue.
+        """
+        runnable = self._bind(llm, temperature, max_tokens)
+        limiter = get_rate_limiter(self._providers.get(id(llm), "openai"))
+        estimated = estimate_tokens(messages)
+
+        attempt = 0
+        while True:
+            await self._acquire_budget(limiter, estimated)
+            started = False
+            try:
+                async with self._slot():
+                    async for chunk in runnable.astream(messages):
+                        # Chunks trazem uso incremental (entrada no início, saída no fim)
+                        record_usage(getattr(chunk, "usage_metadata", None))
+                        text = chunk_text(chunk.content)
+                        if text:
+                            started = True
+                            yield text
+                return
+            except Exception as e:
+                if started or rate_limit_status(e) is None or attempt >= limiter.max_retries:
+                    raise
+                record_retry()
+                delay = limiter.backoff(attempt, e)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna uso atual do pool"""
+        return {
+            "clients": len(self._clients),
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "total_calls": self.total_calls,
+        }
+
+
+_default_pool: Optional[LLMClientPool] = None
+
+
+def get_default_pool() -> LLMClientPool:
+    """Pool compartilhado pelo processo"""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = LLMClientPool()
+    return _default_pool
+
+
+def configure_default_pool(max_concurrency: int) -> LLMClientPool:
+    """Ajusta o limite de concorrência do pool compartilhado"""
+    pool = get_default_pool()
+    pool.max_concurrency = max_concurrency
+    pool._semaphores.clear()
+    return pool
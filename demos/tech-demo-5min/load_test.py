@@ -0,0 +1,441 @@
+"""
+BPM AI Solution - Teste de carga do backend gerado
+Exercita os endpoints do processo (iniciar, listar tarefas, completar) com
+payloads montados a partir do /openapi.json do app (campos do formulário
+como dicas) e mede RPS, latência, erros e memória do servidor
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+DEFAULT_MAX_P95_MS = float(os.environ.get("BPM_LOADTEST_MAX_P95_MS", "500"))
+DEFAULT_MAX_ERROR_RATE = float(os.environ.get("BPM_LOADTEST_MAX_ERROR_RATE", "0.01"))
+
+
+@dataclass
+class LoadTestConfig:
+    """Parâmetros do teste e limites para aprovar o serviço gerado"""
+    concurrency: int = 10
+    duration: float = 10.0
+    timeout: float = 5.0
+    max_p95_ms: float = DEFAULT_MAX_P95_MS
+    max_error_rate: float = DEFAULT_MAX_ERROR_RATE
+    seed: int = 42
+
+
+# ===================== PAYLOADS SINTÉTICOS =====================
+
+def synthetic_value(field: Any, rng: random.Random) -> Any:
+    """Valor plausível para um FormField, respeitando opções e limites de validação"""
+    validation = field.validation or {}
+    options = (field.properties or {}).get("options") or (field.properties or {}).get("enum")
+    kind = field.type.lower()
+    if options:
+        return rng.choice(options)
+    if kind in ("number", "integer", "currency"):
+        low = float(validation.get("min", 1))
+        high = float(validation.get("max", low + 10000))
+        value = rng.uniform(low, min(high, low + 10000))
+        return int(value) if kind == "integer" else round(value, 2)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    if kind in ("date", "datetime"):
+        return date.today().isoformat()
+    if kind == "email":
+        return f"usuario{rng.randint(1, 9999)}@empresa.com"
+    if kind == "file":
+        return f"comprovante_{rng.randint(1, 9999)}.pdf"
+    return f"{field.title} {rng.randint(1, 9999)}"
+
+
+def synthetic_payload(fields: List[Any], rng: random.Random) -> Dict[str, Any]:
+    return {field.name: synthetic_value(field, rng) for field in fields}
+
+
+# ===================== CORPOS A PARTIR DO OPENAPI =====================
+
+# Corpo usado em `complete` quando o app não publica o esquema
+DEFAULT_COMPLETE_BODY = {"approved": True, "comment": "teste de carga"}
+
+
+def _resolve(schema: Dict[str, Any], spec: Dict[str, Any]) -> Dict[str, Any]:
+    while isinstance(schema, dict) and "$ref" in schema:
+        node: Any = spec
+        for part in schema["$ref"].lstrip("#/").split("/"):
+            node = node.get(part, {})
+        schema = node
+    return schema if isinstance(schema, dict) else {}
+
+
+def schema_value(schema: Dict[str, Any], spec: Dict[str, Any], rng: random.Random,
+                 hints: Optional[Dict[str, Any]] = None, depth: int = 0) -> Any:
+    """Valor válido para o esquema JSON; propriedades com o nome de um campo do
+    formulário usam o valor sintético do campo quando o tipo é compatível"""
+    schema = _resolve(schema, spec)
+    if depth > 6:
+        return None
+    if "allOf" in schema:
+        merged: Dict[str, Any] = {}
+        for part in schema["allOf"]:
+            merged.update(_resolve(part, spec))
+        return schema_value(merged, spec, rng, hints, depth + 1)
+    for key in ("anyOf", "oneOf"):
+        if key in schema:
+            options = [option for option in schema[key] if _resolve(option, spec).get("type") != "null"]
+            return schema_value(options[0] if options else {}, spec, rng, hints, depth + 1)
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    for key in ("example", "default"):
+        if schema.get(key) is not None:
+            return schema[key]
+
+    kind = schema.get("type")
+    if kind == "object" or "properties" in schema:
+        properties = schema.get("properties") or {}
+        if not properties:
+            return dict(hints or {})  # Dict livre: o formulário inteiro
+        value = {}
+        required = set(schema.get("required") or [])
+        for name, prop in properties.items():
+            if name not in required and name not in (hints or {}):
+                continue
+            generated = schema_value(prop, spec, rng, None, depth + 1)
+            hint = (hints or {}).get(name)
+            compatible = hint is not None and (
+                type(hint) is type(generated) or (isinstance(hint, (int, float)) and isinstance(generated, (int, float))
+                                                  and not isinstance(hint, bool) and not isinstance(generated, bool))
+            )
+            value[name] = hint if compatible and not _resolve(prop, spec).get("enum") else generated
+        return value
+    if kind == "array":
+        return [schema_value(schema.get("items") or {}, spec, rng, hints, depth + 1)]
+    if kind in ("integer", "number"):
+        low = schema.get("minimum", schema.get("exclusiveMinimum", 0))
+        high = schema.get("maximum", schema.get("exclusiveMaximum", low + 1000))
+        value = rng.uniform(low, high)
+        return int(min(max(round(value), low + 1 if "exclusiveMinimum" in schema else low), high)) \
+            if kind == "integer" else round(value, 2)
+    if kind == "boolean":
+        return True
+    if kind == "null":
+        return None
+    fmt = schema.get("format", "")
+    if fmt == "date":
+        return date.today().isoformat()
+    if fmt == "date-time":
+        return datetime.now().isoformat()
+    if fmt == "email":
+        return f"usuario{rng.randint(1, 9999)}@empresa.com"
+    if fmt == "uuid":
+        return "00000000-0000-4000-8000-%012d" % rng.randint(0, 10 ** 12 - 1)
+    text = f"teste {rng.randint(1, 9999)}"
+    return text.ljust(int(schema.get("minLength", 0)), "x")[: int(schema.get("maxLength", 1000))]
+
+
+def _find_operation(spec: Dict[str, Any], method: str, path: str) -> Optional[Dict[str, Any]]:
+    # Casa o caminho concreto com os templates do OpenAPI ({param} = um segmento)
+    for template, operations in (spec.get("paths") or {}).items():
+        pattern = "^" + re.sub(r"\\\{[^/]+?\\\}", "[^/]+", re.escape(template.rstrip("/"))) + "/?$"
+        if re.match(pattern, path) and method.lower() in operations:
+            return operations[method.lower()]
+    return None
+
+
+RequestBuilder = Callable[[random.Random], Tuple[str, Any]]
+
+
+def request_builder(spec: Optional[Dict[str, Any]], method: str, path: str, fields: List[Any],
+                    default_body: Callable[[random.Random], Any]) -> RequestBuilder:
+    """Função rng → (query string, corpo) para o endpoint, conforme o OpenAPI
+    (parâmetros de query obrigatórios e requestBody); sem esquema, `default_body`"""
+    operation = _find_operation(spec, method, path) if spec else None
+    if operation is None:
+        return lambda rng: ("", default_body(rng))
+
+    query_params = [
+        param for param in (_resolve(p, spec) for p in operation.get("parameters") or [])
+        if param.get("in") == "query" and param.get("required")
+    ]
+    content = ((_resolve(operation.get("requestBody") or {}, spec).get("content") or {})
+               .get("application/json") or {})
+    body_schema = content.get("schema")
+
+    def build(rng: random.Random) -> Tuple[str, Any]:
+        hints = synthetic_payload(fields, rng)
+        query = {param["name"]: schema_value(param.get("schema") or {}, spec, rng) for param in query_params}
+        query = {name: str(value).lower() if isinstance(value, bool) else value for name, value in query.items()}
+        body = schema_value(body_schema, spec, rng, hints) if body_schema is not None else None
+        return ("?" + urlencode(query, doseq=True)) if query else "", body
+
+    return build
+
+
+# ===================== CLIENTE HTTP =====================
+
+class _Connection:
+    """Conexão HTTP/1.1 keep-alive mínima (sem dependências externas)"""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, payload: Any = None) -> Tuple[int, bytes]:
+        return await asyncio.wait_for(self._request(method, path, payload), self.timeout)
+
+    async def _request(self, method: str, path: str, payload: Any) -> Tuple[int, bytes]:
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode() if payload is not None else b""
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+        self._writer.write(head.encode() + body)
+        await self._writer.drain()
+
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise ConnectionError("Conexão encerrada pelo servidor")
+        status = int(status_line.split()[1])
+        headers: Dict[str, str] = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            data = bytearray()
+            while True:
+                size = int((await self._reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await self._reader.readline()
+                    break
+                data += await self._reader.readexactly(size)
+                await self._reader.readline()
+            data = bytes(data)
+        else:
+            data = await self._reader.readexactly(int(headers.get("content-length", "0")))
+
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, data
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+
+# ===================== MEMÓRIA DO SERVIDOR =====================
+
+def process_rss(pid: int) -> Optional[int]:
+    """RSS do processo em bytes (psutil se instalado, senão /proc no Linux)"""
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except ImportError:
+        pass
+    except Exception:
+        return None
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+# ===================== EXECUÇÃO =====================
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+@dataclass
+class LoadTestReport:
+    """Resultado do teste de carga por endpoint e no total
+
+    `errors` (5xx, timeouts e falhas de conexão) reprovam o serviço;
+    `client_errors` (4xx, ex. tarefa já concluída ou corpo recusado) são
+    reportados à parte.
+    """
+    duration: float
+    latencies: Dict[str, List[float]] = field(default_factory=dict)
+    errors: Dict[str, int] = field(default_factory=dict)
+    client_errors: Dict[str, int] = field(default_factory=dict)
+    error_samples: List[str] = field(default_factory=list)
+    rss_start: Optional[int] = None
+    rss_peak: Optional[int] = None
+    config: Optional[LoadTestConfig] = None
+    openapi: bool = False
+
+    def record(self, endpoint: str, seconds: float, status: Optional[int], detail: str = ""):
+        """`status` None = falha de transporte (timeout, conexão)"""
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        if status is not None and 200 <= status < 300:
+            return
+        bucket = self.client_errors if status is not None and 400 <= status < 500 else self.errors
+        bucket[endpoint] = bucket.get(endpoint, 0) + 1
+        if len(self.error_samples) < 5:
+            self.error_samples.append(f"{endpoint}: {detail or f'HTTP {status}'}")
+
+    @property
+    def requests(self) -> int:
+        return sum(len(values) for values in self.latencies.values())
+
+    @property
+    def error_rate(self) -> float:
+        return sum(self.errors.values()) / self.requests if self.requests else 0.0
+
+    @property
+    def client_error_rate(self) -> float:
+        return sum(self.client_errors.values()) / self.requests if self.requests else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        everything = [value for values in self.latencies.values() for value in values]
+        p95_ms = percentile(everything, 95) * 1000
+        config = self.config or LoadTestConfig()
+        return {
+            "requests": self.requests,
+            "rps": self.requests / self.duration if self.duration else 0.0,
+            "error_rate": self.error_rate,
+            "client_error_rate": self.client_error_rate,
+            "openapi": self.openapi,
+            "p50_ms": percentile(everything, 50) * 1000,
+            "p95_ms": p95_ms,
+            "p99_ms": percentile(everything, 99) * 1000,
+            "endpoints": {
+                endpoint: {
+                    "requests": len(values),
+                    "errors": self.errors.get(endpoint, 0),
+                    "client_errors": self.client_errors.get(endpoint, 0),
+                    "p50_ms": percentile(values, 50) * 1000,
+                    "p95_ms": percentile(values, 95) * 1000,
+                    "p99_ms": percentile(values, 99) * 1000,
+                }
+                for endpoint, values in self.latencies.items()
+            },
+            "error_samples": self.error_samples,
+            "rss_start_mb": self.rss_start / 1024 ** 2 if self.rss_start else None,
+            "rss_peak_mb": self.rss_peak / 1024 ** 2 if self.rss_peak else None,
+            "passed": p95_ms <= config.max_p95_ms and self.error_rate <= config.max_error_rate,
+        }
+
+
+async def fetch_openapi(host: str, port: int, path: str, timeout: float) -> Optional[Dict[str, Any]]:
+    """Esquema OpenAPI do app (None se indisponível)"""
+    connection = _Connection(host, port, timeout)
+    try:
+        status, data = await connection.request("GET", path)
+        spec = json.loads(data) if status == 200 else None
+    except (OSError, asyncio.TimeoutError, ValueError, asyncio.IncompleteReadError):
+        spec = None
+    finally:
+        connection.close()
+    return spec if isinstance(spec, dict) and "paths" in spec else None
+
+
+def _task_id(data: bytes) -> Optional[str]:
+    # Primeiro id de tarefa na resposta de listagem (lista ou {"tasks": [...]})
+    try:
+        tasks = json.loads(data or b"null")
+    except ValueError:
+        return None
+    if isinstance(tasks, dict):
+        tasks = tasks.get("tasks") or tasks.get("items") or []
+    for task in tasks if isinstance(tasks, list) else []:
+        if isinstance(task, dict):
+            for key in ("task_id", "id"):
+                if task.get(key) is not None:
+                    return str(task[key])
+    return None
+
+
+async def run_load_test(base_url: str, process_id: str, fields: List[Any],
+                        config: Optional[LoadTestConfig] = None,
+                        server_pid: Optional[int] = None) -> LoadTestReport:
+    """Ciclos iniciar → listar tarefas → completar tarefa com `concurrency` clientes
+
+    Os corpos e parâmetros obrigatórios seguem o /openapi.json do app (sem
+    ele, o payload do formulário e DEFAULT_COMPLETE_BODY). Só 5xx e falhas
+    de transporte reprovam; `complete` só é exercitado quando a listagem
+    devolve alguma tarefa.
+    """
+    config = config or LoadTestConfig()
+    url = urlsplit(base_url)
+    host, port = url.hostname or "localhost", url.port or 80
+    root = url.path.rstrip("/")
+    api = f"/api/processes/{process_id}"
+    prefix = f"{root}{api}"
+    rng = random.Random(config.seed)
+
+    spec = await fetch_openapi(host, port, f"{root}/openapi.json", config.timeout)
+    start_request = request_builder(spec, "POST", f"{api}/start", fields,
+                                    lambda rng: synthetic_payload(fields, rng))
+    complete_request = request_builder(spec, "POST", f"{api}/tasks/task/complete", fields,
+                                       lambda rng: dict(DEFAULT_COMPLETE_BODY))
+
+    report = LoadTestReport(0.0, config=config, openapi=spec is not None)
+    if server_pid:
+        report.rss_start = report.rss_peak = process_rss(server_pid)
+
+    start = time.perf_counter()
+    stop_at = start + config.duration
+
+    async def call(connection: _Connection, endpoint: str, method: str, path: str,
+                   payload: Any = None) -> Optional[bytes]:
+        began = time.perf_counter()
+        try:
+            status, data = await connection.request(method, path, payload)
+        except (OSError, asyncio.TimeoutError, ValueError, asyncio.IncompleteReadError) as e:
+            connection.close()
+            report.record(endpoint, time.perf_counter() - began, None, type(e).__name__)
+            return None
+        report.record(endpoint, time.perf_counter() - began, status)
+        return data if 200 <= status < 300 else None
+
+    async def client():
+        connection = _Connection(host, port, config.timeout)
+        try:
+            while time.perf_counter() < stop_at:
+                query, body = start_request(rng)
+                await call(connection, "start", "POST", f"{prefix}/start{query}", body)
+                tasks = await call(connection, "tasks", "GET", f"{prefix}/tasks")
+                task_id = _task_id(tasks) if tasks is not None else None
+                if task_id is not None:
+                    query, body = complete_request(rng)
+                    await call(connection, "complete", "POST", f"{prefix}/tasks/{task_id}/complete{query}", body)
+        finally:
+            connection.close()
+
+    async def sample_rss():
+        while True:
+            await asyncio.sleep(0.5)
+            rss = process_rss(server_pid)
+            if rss is not None:
+                report.rss_peak = max(report.rss_peak or 0, rss)
+
+    sampler = asyncio.create_task(sample_rss()) if server_pid else None
+    try:
+        await asyncio.gather(*(client() for _ in range(config.concurrency)))
+    finally:
+        if sampler is not None:
+            sampler.cancel()
+    report.duration = time.perf_counter() - start
+    return report
@@ -0,0 +1,221 @@
+"""
+BPM AI Solution - Roteamento de modelos por estágio
+Cada estágio tem uma escada de modelos (do mais barato ao mais capaz), um
+orçamento de latência e um portão de qualidade; saídas inválidas escalam
+para o próximo modelo da escada
+"""
+
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from llm_client import provider_for_model
+from tracing import estimate_cost
+
+# Escadas padrão por provedor: análise e formulário cabem em modelos menores
+DEFAULT_LADDERS = {
+    "anthropic": {
+        "analysis": ["claude-3-5-haiku-20241022", "claude-sonnet-4-20250514"],
+        "process": ["claude-3-5-haiku-20241022", "claude-sonnet-4-20250514"],
+        "form": ["claude-3-5-haiku-20241022", "claude-sonnet-4-20250514"],
+        "backend": ["claude-sonnet-4-20250514"],
+        "frontend": ["claude-sonnet-4-20250514"],
+    },
+    "openai": {
+        "analysis": ["gpt-4o-mini", "gpt-4"],
+        "process": ["gpt-4o-mini", "gpt-4"],
+        "form": ["gpt-4o-mini", "gpt-4"],
+        "backend": ["gpt-4"],
+        "frontend": ["gpt-4"],
+    },
+}
+
+# Orçamento de latência (s) por chamada de cada estágio
+DEFAULT_BUDGETS = {"analysis": 10.0, "process": 20.0, "form": 15.0, "backend": 90.0, "frontend": 60.0}
+
+MIN_QUALITY = 0.5   # Taxa mínima de saídas válidas para manter um modelo no estágio
+MIN_SAMPLES = 3     # Amostras antes de o portão de qualidade valer
+QUALITY_WINDOW = 20  # Ao atingir este total, as contagens de qualidade caem pela metade
+
+# A cada N escolhas do estágio, um modelo excluído é tentado de novo (sonda)
+PROBE_EVERY = int(os.environ.get("BPM_ROUTER_PROBE_EVERY", "20"))
+
+
+def parse_stage_option(values: Optional[List[str]]) -> Dict[str, str]:
+    """Converte opções `estagio=valor` da linha de comando em dicionário"""
+    parsed = {}
+    for value in values or []:
+        stage, sep, setting = value.partition("=")
+        if not sep or not setting:
+            raise ValueError(f"Formato esperado estagio=valor: {value}")
+        parsed[stage.strip()] = setting.strip()
+    return parsed
+
+
+class ModelRouter:
+    """Escolhe, por estágio, o modelo mais barato que cabe no orçamento de latência
+
+    A latência de cada (estágio, modelo) é uma média móvel exponencial das
+    chamadas que não vieram do cache; a qualidade é a fração de respostas que
+    passaram na validação do agente. Modelos acima do orçamento ou abaixo do
+    portão de qualidade são pulados, mas o último da escada sempre fica como
+    destino de escalonamento.
+
+    Como só modelos tentados são medidos, a cada `probe_every` escolhas do
+    estágio um modelo excluído volta à lista como sonda; o resultado da sonda
+    substitui a latência e a qualidade antigas (um pico de cold start ou
+    algumas saídas ruins no início não rebaixam o modelo para sempre).
+    """
+
+    def __init__(self, api_keys: Dict[str, str], default_model: str,
+                 ladders: Optional[Dict[str, List[str]]] = None,
+                 budgets: Optional[Dict[str, float]] = None, alpha: float = 0.3,
+                 probe_every: int = PROBE_EVERY):
+        self.api_keys = {provider: key for provider, key in api_keys.items() if key}
+        self.default_model = default_model
+        self.budgets = dict(DEFAULT_BUDGETS, **(budgets or {}))
+        self.alpha = alpha
+        self.probe_every = max(probe_every, 1)
+
+        provider = provider_for_model(default_model)
+        self.ladders: Dict[str, List[str]] = {}
+        for stage, models in dict(DEFAULT_LADDERS.get(provider, {}), **(ladders or {})).items():
+            available = [model for model in models if provider_for_model(model) in self.api_keys]
+            self.ladders[stage] = sorted(available or [default_model], key=self._price)
+
+        self._latency: Dict[Tuple[str, str], float] = {}
+        self._quality: Dict[Tuple[str, str], List[int]] = {}  # [válidas, total]
+        self.picks: Dict[Tuple[str, str], int] = {}
+        self.escalations: Dict[str, int] = {}
+        self.excluded: Dict[Tuple[str, str], str] = {}  # (estágio, modelo) → motivo
+        self.probes: Dict[str, int] = {}
+        self.on_exclude: Optional[Callable[[str, str, str], None]] = None  # (estágio, modelo, motivo)
+        self._choices: Dict[str, int] = {}
+        self._probing: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_options(cls, api_keys: Dict[str, str], default_model: str,
+                     stage_models: Optional[List[str]] = None,
+                     stage_budgets: Optional[List[str]] = None) -> "ModelRouter":
+        """Monta o roteador a partir de BPM_STAGE_MODELS/BPM_STAGE_BUDGETS (JSON) e da CLI
+
+        Na CLI: `--stage-model analysis=gpt-4o-mini,gpt-4` e `--stage-budget analysis=5`.
+        """
+        ladders = json.loads(os.environ.get("BPM_STAGE_MODELS", "{}"))
+        budgets = json.loads(os.environ.get("BPM_STAGE_BUDGETS", "{}"))
+        for stage, models in parse_stage_option(stage_models).items():
+            ladders[stage] = [model.strip() for model in models.split(",") if model.strip()]
+        for stage, budget in parse_stage_option(stage_budgets).items():
+            budgets[stage] = float(budget)
+        return cls(api_keys, default_model, ladders, budgets)
+
+    @staticmethod
+    def _price(model: str) -> float:
+        # Custo de referência (1k entrada + 1k saída); sem preço conhecido vai ao fim
+        cost = estimate_cost(model, 1000, 1000)
+        return cost if cost > 0 else float("inf")
+
+    def ladder(self, stage: str) -> List[str]:
+        """Escada configurada do estágio, do modelo mais barato ao mais caro"""
+        return self.ladders.get(stage) or [self.default_model]
+
+    def api_key(self, model: str) -> str:
+        return self.api_keys[provider_for_model(model)]
+
+    def latency(self, stage: str, model: str) -> Optional[float]:
+        return self._latency.get((stage, model))
+
+    def quality(self, stage: str, model: str) -> Optional[float]:
+        valid, total = self._quality.get((stage, model), (0, 0))
+        return valid / total if total >= MIN_SAMPLES else None
+
+    def _exclusion(self, stage: str, model: str) -> Optional[str]:
+        budget = self.budgets.get(stage)
+        latency = self.latency(stage, model)
+        quality = self.quality(stage, model)
+        if budget is not None and latency is not None and latency > budget:
+            return f"latência {latency:.1f}s acima do orçamento de {budget:g}s"
+        if quality is not None and quality < MIN_QUALITY:
+            return f"qualidade {quality:.0%} abaixo de {MIN_QUALITY:.0%}"
+        return None
+
+    def candidates(self, stage: str) -> List[str]:
+        """Modelos a tentar, em ordem: os que cabem no orçamento e passam no portão, depois o maior
+
+        Na vez da sonda, o primeiro modelo excluído entra na sua posição da escada.
+        """
+        ladder = self.ladder(stage)
+        with self._lock:
+            self._choices[stage] = self._choices.get(stage, 0) + 1
+            probe_turn = self._choices[stage] % self.probe_every == 0
+        selected = []
+        newly_excluded = []
+        for model in ladder:
+            reason = self._exclusion(stage, model)
+            with self._lock:
+                if reason is None:
+                    self.excluded.pop((stage, model), None)
+                elif (stage, model) not in self.excluded:
+                    self.excluded[(stage, model)] = reason
+                    newly_excluded.append((model, reason))
+                if reason is not None and probe_turn:
+                    probe_turn = False
+                    self._probing.add((stage, model))
+                    self.probes[stage] = self.probes.get(stage, 0) + 1
+                    reason = None
+            if reason is None:
+                selected.append(model)
+        if self.on_exclude is not None:
+            for model, reason in newly_excluded:
+                self.on_exclude(stage, model, reason)
+
+        if not selected:
+            # Nenhum cabe no orçamento: o mais rápido observado
+            selected = [min(ladder, key=lambda model: self.latency(stage, model) or 0.0)]
+        if ladder[-1] not in selected:
+            selected.append(ladder[-1])
+        return selected
+
+    def record(self, stage: str, model: str, ok: bool, seconds: Optional[float] = None):
+        """Registra o resultado de uma tentativa (latência só para chamadas reais)"""
+        with self._lock:
+            if (stage, model) in self._probing:
+                # Sonda: a medição nova substitui o histórico que excluiu o modelo
+                self._probing.discard((stage, model))
+                self._quality.pop((stage, model), None)
+                if seconds is not None:
+                    self._latency.pop((stage, model), None)
+            quality = self._quality.setdefault((stage, model), [0, 0])
+            quality[0] += int(ok)
+            quality[1] += 1
+            if quality[1] >= QUALITY_WINDOW:
+                quality[0] //= 2  # Janela: o passado pesa cada vez menos
+                quality[1] //= 2
+            if ok:
+                self.picks[(stage, model)] = self.picks.get((stage, model), 0) + 1
+            if seconds is not None:
+                previous = self._latency.get((stage, model))
+                self._latency[(stage, model)] = (
+                    seconds if previous is None else self.alpha * seconds + (1 - self.alpha) * previous
+                )
+
+    def record_escalation(self, stage: str):
+        with self._lock:
+            self.escalations[stage] = self.escalations.get(stage, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Modelo usado, latência observada e escalonamentos por estágio"""
+        stages: Dict[str, Any] = {}
+        for stage, ladder in self.ladders.items():
+            stages[stage] = {
+                "ladder": ladder,
+                "budget": self.budgets.get(stage),
+                "picks": {model: self.picks.get((stage, model), 0) for model in ladder},
+                "latency": {model: self.latency(stage, model) for model in ladder},
+                "escalations": self.escalations.get(stage, 0),
+                "excluded": {model: reason for (name, model), reason in self.excluded.items() if name == stage},
+                "probes": self.probes.get(stage, 0),
+            }
+        return stages
@@ -0,0 +1,198 @@
+"""
+BPM AI Solution - Rate limiting por provedor
+Token buckets de requisições/min e tokens/min compartilhados entre agentes,
+com backoff exponencial (jitter) em respostas 429/529
+"""
+
+import asyncio
+import math
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+# Limites padrão por provedor (sobrescritos por BPM_<PROVEDOR>_RPM / BPM_<PROVEDOR>_TPM)
+DEFAULT_LIMITS = {
+    "anthropic": {"rpm": 50, "tpm": 40000},
+    "openai": {"rpm": 500, "tpm": 30000},
+}
+RATE_LIMIT_STATUS = (429, 529)
+CHARS_PER_TOKEN = 3.5
+
+
+def estimate_tokens(messages: List[Any]) -> int:
+    """Estimativa barata de tokens de entrada (caracteres / 3.5 + overhead por mensagem)"""
+    total = 0
+    for message in messages:
+        content = getattr(message, "content", message)
+        total += math.ceil(len(str(content)) / CHARS_PER_TOKEN) + 4
+    return total
+
+
+def rate_limit_status(error: BaseException) -> Optional[int]:
+    """Retorna 429/529 se o erro for de rate limit/sobrecarga do provedor"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    if status in RATE_LIMIT_STATUS:
+        return status
+
+    name = type(error).__name__
+    if name == "RateLimitError":
+        return 429
+    if name == "OverloadedError":
+        return 529
+    return None
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Lê o cabeçalho Retry-After da resposta, quando disponível"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after") if hasattr(headers, "get") else None
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Bucket com reposição contínua: `capacity` unidades a cada `period` segundos"""
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        self._refill()
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        self._refill()
+        self.tokens -= amount
+
+    def refund(self, amount: float):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ProviderRateLimiter:
+    """Orçamento de RPM/TPM de um provedor, com fila FIFO e pausa adaptativa"""
+
+    def __init__(self, provider: str, rpm: int, tpm: int, base_delay: float = 1.0,
+                 max_delay: float = 60.0, max_retries: int = 6):
+        self.provider = provider
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+
+        self.blocked_until = 0.0
+        self.acquired = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+        self.rate_limited = 0
+        self.retries = 0
+
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._lock
+
+    async def acquire(self, estimated_tokens: int):
+        """Aguarda orçamento para uma requisição; chamadores são atendidos em ordem de chegada"""
+        amount = min(estimated_tokens, self.tokens.capacity)
+        start = time.monotonic()
+        async with self._get_lock():
+            while True:
+                wait = max(
+                    self.blocked_until - time.monotonic(),
+                    self.requests.wait_time(1),
+                    self.tokens.wait_time(amount),
+                )
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+
+            self.requests.consume(1)
+            self.tokens.consume(amount)
+
+        # Inclui o tempo na fila atrás de outros chamadores
+        waited = time.monotonic() - start
+        self.acquired += 1
+        if waited > 0.001:
+            self.throttled += 1
+            self.wait_seconds += waited
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Corrige o bucket de tokens com o uso real reportado pelo provedor"""
+        if actual_tokens is None:
+            return
+        difference = actual_tokens - min(estimated_tokens, self.tokens.capacity)
+        if difference > 0:
+            self.tokens.consume(difference)
+        elif difference < 0:
+            self.tokens.refund(-difference)
+
+    def backoff(self, attempt: int, error: BaseException) -> float:
+        """Registra um 429/529 e pausa o provedor para todos os chamadores
+
+        Usa Retry-After quando presente; caso contrário, backoff exponencial
+        com full jitter.
+        """
+        self.rate_limited += 1
+        self.retries += 1
+        delay = retry_after_seconds(error)
+        if delay is None:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+        return delay
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "provider": self.provider,
+            "requests": self.acquired,
+            "throttled": self.throttled,
+            "wait_seconds": self.wait_seconds,
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+        }
+
+
+_limiters: Dict[str, ProviderRateLimiter] = {}
+
+
+def get_rate_limiter(provider: str) -> ProviderRateLimiter:
+    """Limiter compartilhado do provedor (criado na primeira utilização)"""
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        defaults = DEFAULT_LIMITS.get(provider, DEFAULT_LIMITS["openai"])
+        prefix = f"BPM_{provider.upper()}"
+        limiter = ProviderRateLimiter(
+            provider,
+            rpm=int(os.environ.get(f"{prefix}_RPM", defaults["rpm"])),
+            tpm=int(os.environ.get(f"{prefix}_TPM", defaults["tpm"])),
+        )
+        _limiters[provider] = limiter
+    return limiter
+
+
+def all_rate_limiters() -> List[ProviderRateLimiter]:
+    """Limiters já utilizados no processo"""
+    return list(_limiters.values())
@@ -0,0 +1,188 @@
+"""
+BPM AI Solution - Checkpoints de execução
+Cada estágio concluído é gravado de forma durável (SQLite) sob o ID da
+execução, para que uma execução interrompida seja retomada sem refazer
+as chamadas LLM que já terminaram
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from stage_store import canonical_json
+
+DEFAULT_RUNS_DIR = Path(os.environ.get("BPM_RUNS_DIR", Path.home() / ".cache" / "bpm_ai"))
+
+
+def new_run_id() -> str:
+    return f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+class RunCheckpoint:
+    """Checkpoints dos estágios de uma execução (tabelas runs e run_stages)
+
+    Cada estágio é confirmado em sua própria transação com `synchronous=FULL`,
+    então sobrevive a queda do processo logo após a chamada LLM.
+    """
+
+    def __init__(self, run_id: str, runs_dir: Optional[Path] = None):
+        self.run_id = run_id
+        self.runs_dir = Path(runs_dir or DEFAULT_RUNS_DIR)
+        self.runs_dir.mkdir(parents=True, exist_ok=True)
+        self.resumed: List[str] = []  # Estágios reaproveitados nesta execução
+        self._lock = threading.Lock()
+        self._conn = self._connect(self.runs_dir)
+
+    @staticmethod
+    def _connect(runs_dir: Path) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(runs_dir / "runs.db"), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                requirement TEXT NOT NULL,
+                options TEXT NOT NULL,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS run_stages (
+                run_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                data TEXT NOT NULL,
+                finished_at REAL NOT NULL,
+                PRIMARY KEY (run_id, stage)
+            )"""
+        )
+        conn.commit()
+        return conn
+
+    @classmethod
+    def create(cls, requirement: str, options: Optional[Dict[str, Any]] = None,
+               runs_dir: Optional[Path] = None) -> "RunCheckpoint":
+        """Registra uma nova execução"""
+        checkpoint = cls(new_run_id(), runs_dir)
+        now = time.time()
+        with checkpoint._lock:
+            checkpoint._conn.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, 'running', ?, ?)",
+                (checkpoint.run_id, requirement, json.dumps(options or {}, default=str), now, now)
+            )
+            checkpoint._conn.commit()
+        return checkpoint
+
+    @classmethod
+    def open(cls, run_id: str = "latest", runs_dir: Optional[Path] = None) -> "RunCheckpoint":
+        """Abre uma execução existente (`latest` = a mais recente não concluída)"""
+        checkpoint = cls(run_id, runs_dir)
+        if run_id == "latest":
+            row = checkpoint._conn.execute(
+                "SELECT run_id FROM runs WHERE status != 'completed' ORDER BY created_at DESC LIMIT 1"
+            ).fetchone()
+        else:
+            row = checkpoint._conn.execute("SELECT run_id FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            checkpoint.close()
+            raise ValueError(f"Execução não encontrada: {run_id}")
+        checkpoint.run_id = row[0]
+        return checkpoint
+
+    @property
+    def requirement(self) -> str:
+        return self.info()["requirement"]
+
+    def info(self) -> Dict[str, Any]:
+        row = self._conn.execute(
+            "SELECT requirement, options, status, created_at, updated_at FROM runs WHERE run_id = ?",
+            (self.run_id,)
+        ).fetchone()
+        requirement, options, status, created_at, updated_at = row
+        return {
+            "run_id": self.run_id,
+            "requirement": requirement,
+            "options": json.loads(options),
+            "status": status,
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "stages": self.completed(),
+        }
+
+    def completed(self) -> List[str]:
+        """Estágios já gravados, na ordem em que terminaram"""
+        rows = self._conn.execute(
+            "SELECT stage FROM run_stages WHERE run_id = ? ORDER BY finished_at", (self.run_id,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def load(self, stage: str) -> Optional[Tuple[str, Any]]:
+        """Retorna (hash de conteúdo, dados) do estágio, se já concluído nesta execução"""
+        row = self._conn.execute(
+            "SELECT content_hash, data FROM run_stages WHERE run_id = ? AND stage = ?",
+            (self.run_id, stage)
+        ).fetchone()
+        if row is None:
+            return None
+        self.resumed.append(stage)
+        return row[0], json.loads(row[1])
+
+    def save(self, stage: str, value: Any) -> str:
+        """Grava a saída do estágio e confirma imediatamente"""
+        data = canonical_json(value)
+        content_hash = hashlib.sha256(data.encode("utf-8")).hexdigest()
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO run_stages VALUES (?, ?, ?, ?, ?)",
+                (self.run_id, stage, content_hash, data, now)
+            )
+            self._conn.execute("UPDATE runs SET updated_at = ? WHERE run_id = ?", (now, self.run_id))
+            self._conn.commit()
+        return content_hash
+
+    def set_status(self, status: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE runs SET status = ?, updated_at = ? WHERE run_id = ?",
+                (status, time.time(), self.run_id)
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @classmethod
+    def list_runs(cls, limit: int = 20, runs_dir: Optional[Path] = None) -> List[Dict[str, Any]]:
+        """Execuções mais recentes com seus estágios concluídos"""
+        conn = cls._connect(Path(runs_dir or DEFAULT_RUNS_DIR))
+        try:
+            runs = conn.execute(
+                "SELECT run_id, status, created_at, updated_at FROM runs ORDER BY created_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+            result = []
+            for run_id, status, created_at, updated_at in runs:
+                stages = conn.execute(
+                    "SELECT stage FROM run_stages WHERE run_id = ? ORDER BY finished_at", (run_id,)
+                ).fetchall()
+                result.append({
+                    "run_id": run_id,
+                    "status": status,
+                    "created_at": created_at,
+                    "updated_at": updated_at,
+                    "stages": [row[0] for row in stages],
+                })
+            return result
+        finally:
+            conn.close()
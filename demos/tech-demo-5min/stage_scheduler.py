@@ -0,0 +1,277 @@
+"""
+BPM AI Solution - Scheduler de estágios
+Executa o pipeline como um grafo de dependências (DAG) com máxima concorrência
+"""
+
+import asyncio
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from deadline import RequestDeadline, current_deadline
+from run_checkpoint import RunCheckpoint
+from stage_store import StageStore, hash_value
+
+
+class StageSkipped(Exception):
+    """Estágio não executado porque uma dependência falhou"""
+
+
+@dataclass
+class Stage:
+    """Estágio do pipeline: recebe os resultados das dependências como kwargs
+
+    Estágios com `version` são memoizáveis: a saída é reaproveitada enquanto
+    versão, `params` (entradas externas) e saídas das dependências não mudarem.
+    """
+    name: str
+    func: Callable[..., Awaitable[Any]]
+    depends_on: List[str] = field(default_factory=list)
+    description: str = ""
+    version: Optional[str] = None
+    params: Dict[str, Any] = field(default_factory=dict)
+    decode: Optional[Callable[[Any], Any]] = None
+
+
+@dataclass
+class StageResult:
+    """Resultado e tempos de um estágio executado"""
+    name: str
+    value: Any = None
+    error: Optional[BaseException] = None
+    ready_at: float = 0.0
+    started_at: float = 0.0
+    finished_at: float = 0.0
+    fallback: bool = False
+    cached: bool = False
+    resumed: bool = False  # Recuperado do checkpoint da execução
+    deadline_exceeded: bool = False  # Fallback por orçamento de tempo esgotado
+    budget: Optional[float] = None  # Segundos concedidos ao estágio pelo prazo da requisição
+    content_hash: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        return max(self.finished_at - self.started_at, 0.0)
+
+    @property
+    def skipped(self) -> bool:
+        return isinstance(self.error, StageSkipped)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+# Resultado do estágio em execução na task atual (cada estágio roda na sua task)
+current_stage: ContextVar[Optional[StageResult]] = ContextVar("current_stage", default=None)
+
+
+def mark_fallback():
+    """Sinaliza que o estágio atual devolveu uma resposta de fallback"""
+    result = current_stage.get()
+    if result is not None:
+        result.fallback = True
+
+
+def mark_deadline_exceeded():
+    """Sinaliza que o estágio atual esgotou seu orçamento de tempo"""
+    result = current_stage.get()
+    if result is not None:
+        result.deadline_exceeded = True
+
+
+class StageScheduler:
+    """Scheduler asyncio que inicia cada estágio assim que suas entradas ficam prontas"""
+
+    def __init__(self):
+        self.stages: Dict[str, Stage] = {}
+
+    def add(self, name: str, func: Callable[..., Awaitable[Any]],
+            depends_on: Optional[List[str]] = None, description: str = "",
+            version: Optional[str] = None, params: Optional[Dict[str, Any]] = None,
+            decode: Optional[Callable[[Any], Any]] = None) -> "StageScheduler":
+        """Registra um estágio; dependências são nomes de estágios já registrados ou futuros"""
+        if name in self.stages:
+            raise ValueError(f"Estágio duplicado: {name}")
+        self.stages[name] = Stage(
+            name, func, list(depends_on or []), description or name, version, dict(params or {}), decode
+        )
+        return self
+
+    def descendants(self, name: str) -> Set[str]:
+        """O estágio e todos os que dependem dele, direta ou indiretamente"""
+        if name not in self.stages:
+            raise ValueError(f"Estágio inexistente: {name}")
+        found = {name}
+        changed = True
+        while changed:
+            changed = False
+            for stage in self.stages.values():
+                if stage.name not in found and found.intersection(stage.depends_on):
+                    found.add(stage.name)
+                    changed = True
+        return found
+
+    def ancestors(self, name: str) -> Set[str]:
+        """O estágio e todos aqueles de que ele depende, direta ou indiretamente"""
+        if name not in self.stages:
+            raise ValueError(f"Estágio inexistente: {name}")
+        found = set()
+        pending = [name]
+        while pending:
+            current = pending.pop()
+            if current not in found:
+                found.add(current)
+                pending.extend(self.stages[current].depends_on)
+        return found
+
+    def subgraph(self, targets: List[str]) -> "StageScheduler":
+        """Novo scheduler apenas com os estágios necessários para produzir `targets`"""
+        keep: Set[str] = set()
+        for name in targets:
+            keep |= self.ancestors(name)
+        scheduler = StageScheduler()
+        scheduler.stages = {name: stage for name, stage in self.stages.items() if name in keep}
+        return scheduler
+
+    def topological_order(self) -> List[str]:
+        """Ordena os estágios respeitando dependências (falha em ciclos e nomes inválidos)"""
+        for stage in self.stages.values():
+            for dep in stage.depends_on:
+                if dep not in self.stages:
+                    raise ValueError(f"Estágio '{stage.name}' depende de '{dep}', que não existe")
+
+        order: List[str] = []
+        state: Dict[str, int] = {}
+
+        def visit(name: str, path: List[str]):
+            if state.get(name) == 2:
+                return
+            if state.get(name) == 1:
+                raise ValueError(f"Ciclo de dependências: {' → '.join(path + [name])}")
+            state[name] = 1
+            for dep in self.stages[name].depends_on:
+                visit(dep, path + [name])
+            state[name] = 2
+            order.append(name)
+
+        for name in self.stages:
+            visit(name, [])
+        return order
+
+    async def run(
+        self,
+        on_start: Optional[Callable[[Stage], None]] = None,
+        on_complete: Optional[Callable[[Stage, StageResult], None]] = None,
+        store: Optional[StageStore] = None,
+        from_stage: Optional[str] = None,
+        checkpoint: Optional[RunCheckpoint] = None,
+        deadline: Optional[RequestDeadline] = None,
+    ) -> Dict[str, StageResult]:
+        """Executa o grafo e retorna o resultado de cada estágio
+
+        Falhas não interrompem estágios independentes; dependentes de um estágio
+        com erro são marcados como pulados (StageSkipped). Com `store`, estágios
+        versionados cujas entradas não mudaram são reaproveitados (estilo make);
+        `from_stage` força o recálculo desse estágio e de seus dependentes.
+        Com `checkpoint`, cada estágio versionado concluído é gravado sob o ID
+        da execução e, ao retomá-la, reaproveitado antes de consultar o store.
+        Com `deadline`, cada estágio recebe sua fração do tempo restante,
+        propagada às chamadas dos agentes por `current_deadline`.
+        """
+        results: Dict[str, StageResult] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+        forced = self.descendants(from_stage) if from_stage else set()
+
+        async def execute(stage: Stage) -> Any:
+            result = StageResult(stage.name)
+            results[stage.name] = result
+            current_stage.set(result)
+            try:
+                if stage.depends_on:
+                    await asyncio.gather(*(tasks[dep] for dep in stage.depends_on), return_exceptions=True)
+                failed = [dep for dep in stage.depends_on if not results[dep].ok]
+                result.ready_at = time.perf_counter()
+                result.started_at = result.ready_at
+                if failed:
+                    raise StageSkipped(f"dependências com falha: {', '.join(failed)}")
+
+                if checkpoint is not None and stage.version is not None and stage.name not in forced:
+                    saved = checkpoint.load(stage.name)
+                    if saved is not None:
+                        result.content_hash, data = saved
+                        result.value = stage.decode(data) if stage.decode else data
+                        result.cached = result.resumed = True
+                        return result.value
+
+                key = None
+                if store is not None and stage.version is not None:
+                    key = store.input_key(
+                        stage.name, stage.version, stage.params,
+                        {dep: self._content_hash(results[dep]) for dep in stage.depends_on}
+                    )
+                    if stage.name not in forced:
+                        hit = store.load(key)
+                        if hit is not None:
+                            result.content_hash, data = hit
+                            result.value = stage.decode(data) if stage.decode else data
+                            result.cached = True
+                            if checkpoint is not None:
+                                checkpoint.save(stage.name, data)
+                            return result.value
+
+                if deadline is not None:
+                    stage_deadline = deadline.stage_deadline(self, stage.name)
+                    result.budget = stage_deadline - time.monotonic()
+                    current_deadline.set(stage_deadline)
+                if on_start:
+                    on_start(stage)
+                inputs = {dep: results[dep].value for dep in stage.depends_on}
+                result.value = await stage.func(**inputs)
+
+                # Fallbacks não são memoizados: a próxima execução tenta de novo
+                if key is not None and not result.fallback:
+                    result.content_hash = store.save(key, result.value)
+                if checkpoint is not None and stage.version is not None and not result.fallback:
+                    result.content_hash = checkpoint.save(stage.name, result.value)
+                return result.value
+            except BaseException as e:
+                result.error = e
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                return None
+            finally:
+                result.finished_at = time.perf_counter()
+                if on_complete:
+                    on_complete(stage, result)
+
+        for name in self.topological_order():
+            tasks[name] = asyncio.create_task(execute(self.stages[name]), name=f"stage:{name}")
+
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+
+        return results
+
+    @staticmethod
+    def _content_hash(result: StageResult) -> str:
+        if result.content_hash is None:
+            result.content_hash = hash_value(result.value)
+        return result.content_hash
+
+    def critical_path(self, results: Dict[str, StageResult]) -> List[str]:
+        """Cadeia de estágios que determinou o tempo total (caminho crítico)"""
+        if not results:
+            return []
+        path = []
+        current = max(results.values(), key=lambda r: r.finished_at).name
+        while current:
+            path.append(current)
+            deps = [d for d in self.stages[current].depends_on if d in results]
+            current = max(deps, key=lambda d: results[d].finished_at) if deps else None
+        return list(reversed(path))
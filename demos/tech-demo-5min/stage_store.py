@@ -0,0 +1,95 @@
+"""
+BPM AI Solution - Store de artefatos por estágio
+Saídas de estágio endereçadas por conteúdo e memoizadas pelo hash das entradas
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_STORE_DIR = Path(os.environ.get("BPM_STAGE_STORE_DIR", Path.home() / ".cache" / "bpm_ai" / "stages"))
+
+
+def to_jsonable(value: Any) -> Any:
+    """Converte modelos Pydantic (e listas/dicts deles) em estruturas serializáveis"""
+    if hasattr(value, "dict") and callable(value.dict):
+        return value.dict()
+    if isinstance(value, dict):
+        return {key: to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(item) for item in value]
+    return value
+
+
+def canonical_json(value: Any) -> str:
+    return json.dumps(to_jsonable(value), ensure_ascii=False, sort_keys=True, default=str)
+
+
+def hash_value(value: Any) -> str:
+    """Hash de conteúdo de um valor (estável entre execuções)"""
+    return hashlib.sha256(canonical_json(value).encode("utf-8")).hexdigest()
+
+
+class StageStore:
+    """Store em disco: objects/ guarda saídas por hash de conteúdo, refs/ mapeia
+    hash de entradas → hash de conteúdo
+
+    Saídas idênticas produzidas por entradas diferentes ocupam um único objeto.
+    """
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = Path(root or DEFAULT_STORE_DIR)
+        self.objects = self.root / "objects"
+        self.refs = self.root / "refs"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.refs.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def input_key(self, stage: str, version: str, params: Dict[str, Any],
+                  dependency_hashes: Dict[str, str]) -> str:
+        """Chave de memoização: estágio, versão, parâmetros externos e hashes das dependências"""
+        return hash_value({
+            "stage": stage,
+            "version": version,
+            "params": params,
+            "inputs": dependency_hashes,
+        })
+
+    def _object_path(self, content_hash: str) -> Path:
+        return self.objects / content_hash[:2] / f"{content_hash}.json"
+
+    def _atomic_write(self, path: Path, data: str):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp_")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def load(self, key: str) -> Optional[Tuple[str, Any]]:
+        """Retorna (hash de conteúdo, dados) memoizados para a chave, se houver"""
+        ref = self.refs / key
+        try:
+            content_hash = ref.read_text(encoding="utf-8").strip()
+            data = json.loads(self._object_path(content_hash).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return content_hash, data
+
+    def save(self, key: str, value: Any) -> str:
+        """Persiste a saída e aponta a chave de entradas para ela"""
+        data = canonical_json(value)
+        content_hash = hashlib.sha256(data.encode("utf-8")).hexdigest()
+        path = self._object_path(content_hash)
+        if not path.exists():
+            self._atomic_write(path, data)
+        self._atomic_write(self.refs / key, content_hash)
+        return content_hash
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "root": str(self.root)}
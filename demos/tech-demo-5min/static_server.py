@@ -0,0 +1,346 @@
+"""
+BPM AI Solution - Servidor HTTP dos frontends gerados
+Minifica o HTML no deploy, extrai CSS/JS inline para arquivos com hash do
+conteúdo (cache imutável), pré-comprime variantes gzip/brotli e responde com
+ETags fortes (revalidação 304 para o HTML)
+"""
+
+import gzip
+import hashlib
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # Sem o pacote `brotli`, apenas gzip
+
+DEFAULT_FRONTEND_HOST = os.environ.get("BPM_FRONTEND_HOST", "127.0.0.1")
+DEFAULT_FRONTEND_PORT = int(os.environ.get("BPM_FRONTEND_PORT", "0"))  # 0 = porta livre
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+MIN_COMPRESS_BYTES = 256
+
+_STRINGS_OR_COMMENTS = r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|/\*.*?\*/"""
+_INLINE_ASSET = re.compile(
+    r"<(style|script)\b([^>]*)>(.*?)</\1\s*>", re.IGNORECASE | re.DOTALL
+)
+_RAW_BLOCK = re.compile(r"(<(pre|textarea|script|style)\b.*?</\2\s*>)", re.IGNORECASE | re.DOTALL)
+_TAG = re.compile(r"""(<[!/]?[a-zA-Z](?:"[^"]*"|'[^']*'|[^'">])*>)""")
+_REGEX_PRECEDERS = set("(,=:[!&|?{};+-*%<>~^")
+_JS_TYPES = {"", "text/javascript", "application/javascript", "module"}
+
+
+# ===================== MINIFICAÇÃO =====================
+
+def minify_css(css: str) -> str:
+    """Remove comentários e espaços supérfluos (strings preservadas)"""
+    def compact(match: re.Match) -> str:
+        return match.group(1) or ""
+    css = re.sub(_STRINGS_OR_COMMENTS, compact, css, flags=re.DOTALL)
+    parts = re.split(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')""", css)
+    for i in range(0, len(parts), 2):
+        text = re.sub(r"\s+", " ", parts[i])
+        text = re.sub(r"\s*([{};,>])\s*", r"\1", text)
+        text = re.sub(r":\s+", ":", text)  # Espaço antes de `:` pode ser seletor descendente
+        parts[i] = text.replace(";}", "}")
+    return "".join(parts).strip()
+
+
+def _js_line_states(js: str) -> List[bool]:
+    """Para cada linha, se ela começa dentro de uma template string ou de um
+    comentário de bloco (conteúdo que não pode ser reindentado nem removido)"""
+    states: List[bool] = []
+    stack: List[str] = []  # "`" = template; "{" = chave dentro de ${...} ou de código
+    quote = ""  # ' ou " (strings simples terminam na linha)
+    block_comment = False
+    previous = ""  # Último caractere significativo do código (decide `/` = regex)
+    i, n = 0, len(js)
+    at_line_start = True
+    while i < n:
+        if at_line_start:
+            states.append(block_comment or bool(stack and stack[-1] == "`"))
+            at_line_start = False
+        char = js[i]
+        if char == "\n":
+            quote = ""
+            at_line_start = True
+            i += 1
+            continue
+        if block_comment:
+            if js.startswith("*/", i):
+                block_comment, i = False, i + 2
+                continue
+        elif quote:
+            if char == "\\":
+                i += 1
+            elif char == quote:
+                quote = ""
+        elif stack and stack[-1] == "`":
+            if char == "\\":
+                i += 1
+            elif char == "`":
+                stack.pop()
+                previous = "`"
+            elif js.startswith("${", i):
+                stack.append("{")
+                i += 1
+        elif js.startswith("//", i):
+            i = js.find("\n", i)
+            i = n if i < 0 else i
+            continue
+        elif js.startswith("/*", i):
+            block_comment, i = True, i + 2
+            continue
+        elif char in "'\"":
+            quote = char
+        elif char == "`":
+            stack.append("`")
+        elif char == "/" and (not previous or previous in _REGEX_PRECEDERS):
+            in_class = False
+            i += 1
+            while i < n and js[i] != "\n" and (in_class or js[i] != "/"):
+                if js[i] == "\\":
+                    i += 1
+                elif js[i] in "[]":
+                    in_class = js[i] == "["
+                i += 1
+            previous = "/"
+        else:
+            if char == "{":
+                stack.append("{")
+            elif char == "}" and stack:
+                stack.pop()
+            if not char.isspace():
+                previous = char
+        i += 1
+    return states
+
+
+def minify_js(js: str) -> str:
+    """Minificação conservadora: indentação, linhas vazias e comentários de linha
+    inteira (as quebras de linha ficam, então a inserção automática de `;` não muda)
+
+    Linhas que começam dentro de template strings ou comentários de bloco ficam
+    intactas (`//` e espaços ali fazem parte do conteúdo).
+    """
+    out: List[str] = []
+    for line, verbatim in zip(js.splitlines(), _js_line_states(js)):
+        if verbatim:
+            out.append(line)
+            continue
+        line = line.strip()
+        if line and not line.startswith("//"):
+            out.append(line)
+    return "\n".join(out)
+
+
+def minify_html(html: str) -> str:
+    """Remove comentários e colapsa espaços no texto entre as tags, fora de
+    pre/textarea/script/style (as tags e seus atributos ficam intactos)"""
+    parts = _RAW_BLOCK.split(html)
+    out: List[str] = []
+    i = 0
+    while i < len(parts):
+        text = re.sub(r"<!--(?!\[if).*?-->", "", parts[i], flags=re.DOTALL)
+        tokens = _TAG.split(text)
+        for j in range(0, len(tokens), 2):
+            tokens[j] = re.sub(r"[ \t]*\n\s*", "\n", re.sub(r"[ \t]{2,}", " ", tokens[j]))
+        out.append("".join(tokens))
+        if i + 1 < len(parts):
+            out.append(parts[i + 1])  # Bloco bruto inalterado
+        i += 3
+    return "".join(out).strip()
+
+
+# ===================== ATIVOS =====================
+
+@dataclass
+class StaticAsset:
+    """Arquivo publicado com as variantes pré-comprimidas e suas ETags"""
+    body: bytes
+    content_type: str
+    cache_control: str
+    digest: str = ""
+    variants: Dict[str, bytes] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self.digest = hashlib.sha256(self.body).hexdigest()[:32]
+        if len(self.body) < MIN_COMPRESS_BYTES:
+            return
+        candidates = {"gzip": gzip.compress(self.body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            candidates["br"] = brotli.compress(self.body, quality=11)
+        self.variants = {enc: data for enc, data in candidates.items() if len(data) < len(self.body)}
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        # ETag forte distinta por codificação (representações diferentes)
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+    def select(self, accept_encoding: str) -> Tuple[Optional[str], bytes]:
+        """Melhor variante aceita pelo cliente (br > gzip > identidade)"""
+        accepted = {}
+        for item in accept_encoding.split(","):
+            name, _, params = item.strip().partition(";")
+            q = 1.0
+            match = re.search(r"q\s*=\s*([0-9.]+)", params)
+            if match:
+                try:
+                    q = float(match.group(1))
+                except ValueError:
+                    q = 0.0
+            accepted[name.strip().lower()] = q
+        for encoding in ("br", "gzip"):
+            q = accepted.get(encoding, accepted.get("*", 0.0))
+            if encoding in self.variants and q > 0:
+                return encoding, self.variants[encoding]
+        return None, self.body
+
+
+def bundle_frontend(html: str, base_path: str) -> Tuple[str, Dict[str, StaticAsset]]:
+    """Extrai <style>/<script> inline para `<base_path>/assets/<hash>.css|js`
+    minificados e devolve o HTML minificado que os referencia"""
+    assets: Dict[str, StaticAsset] = {}
+
+    def extract(match: re.Match) -> str:
+        tag, attrs, content = match.group(1).lower(), match.group(2), match.group(3)
+        script_type = re.search(r"""\btype\s*=\s*["']?([^"'\s>]+)""", attrs, re.IGNORECASE)
+        script_type = script_type.group(1).lower() if script_type else ""
+        if not content.strip():
+            return match.group(0)
+        if tag == "script" and (re.search(r"\bsrc\s*=", attrs, re.IGNORECASE) or script_type not in _JS_TYPES):
+            return match.group(0)  # Script externo ou bloco de dados (JSON, templates)
+        if tag == "style":
+            body, content_type, ext = minify_css(content), "text/css; charset=utf-8", "css"
+        else:
+            body, content_type, ext = minify_js(content), "text/javascript; charset=utf-8", "js"
+        asset = StaticAsset(body.encode("utf-8"), content_type, IMMUTABLE)
+        url = f"{base_path}/assets/{asset.digest[:16]}.{ext}"
+        assets[url] = asset
+        if tag == "style":
+            media = re.search(r"""\bmedia\s*=\s*["'][^"']*["']""", attrs, re.IGNORECASE)
+            return f'<link rel="stylesheet" href="{url}"{" " + media.group(0) if media else ""}>'
+        return f'<script{attrs} src="{url}"></script>'
+
+    return minify_html(_INLINE_ASSET.sub(extract, html)), assets
+
+
+# ===================== SERVIDOR =====================
+
+class FrontendServer:
+    """Serve os frontends publicados em /<process_id>/ (thread daemon)
+
+    O HTML usa `no-cache` (o navegador revalida e recebe 304 enquanto a ETag
+    não mudar); os ativos têm o hash no nome e são imutáveis. Republicar um
+    processo troca todos os seus arquivos de uma vez.
+    """
+
+    def __init__(self, host: str = DEFAULT_FRONTEND_HOST, port: int = DEFAULT_FRONTEND_PORT):
+        self.host = host
+        self.port = port
+        self.sites: Dict[str, Dict[str, StaticAsset]] = {}
+        self.stats_by_site: Dict[str, Dict[str, int]] = {}
+        self.requests = 0
+        self.not_modified = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{'localhost' if self.host in ('0.0.0.0', '127.0.0.1') else self.host}:{self.port}"
+
+    def publish(self, process_id: str, html: str) -> str:
+        """Prepara (minifica, extrai e comprime) e publica o frontend; retorna a URL"""
+        base_path = f"/{process_id}"
+        index_html, files = bundle_frontend(html, base_path)
+        index = StaticAsset(index_html.encode("utf-8"), "text/html; charset=utf-8", REVALIDATE)
+        site = dict(files)
+        site[f"{base_path}/"] = index
+        self.sites[process_id] = site  # Troca atômica
+        published = list(site.values())
+        self.stats_by_site[process_id] = {
+            "original_bytes": len(html.encode("utf-8")),
+            "minified_bytes": sum(len(asset.body) for asset in published),
+            "gzip_bytes": sum(len(asset.variants.get("gzip", asset.body)) for asset in published),
+            "br_bytes": sum(len(asset.variants.get("br", asset.body)) for asset in published) if brotli else 0,
+            "assets": len(files),
+        }
+        return f"{self.url}{base_path}/"
+
+    def unpublish(self, process_id: str) -> bool:
+        self.stats_by_site.pop(process_id, None)
+        return self.sites.pop(process_id, None) is not None
+
+    def lookup(self, path: str) -> Optional[StaticAsset]:
+        path = path.split("?", 1)[0].split("#", 1)[0]
+        process_id = path.strip("/").split("/", 1)[0]
+        site = self.sites.get(process_id)
+        if site is None:
+            return None
+        if path in (f"/{process_id}", f"/{process_id}/index.html"):
+            path = f"/{process_id}/"
+        return site.get(path)
+
+    def start(self) -> "FrontendServer":
+        if self._server is not None:
+            return self
+        frontend = self
+
+        class FrontendHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_HEAD(self):
+                self.do_GET(head=True)
+
+            def do_GET(self, head: bool = False):
+                frontend.requests += 1
+                asset = frontend.lookup(self.path)
+                if asset is None:
+                    self.send_error(404)
+                    return
+                encoding, body = asset.select(self.headers.get("Accept-Encoding", ""))
+                etag = asset.etag(encoding)
+                if_none_match = self.headers.get("If-None-Match", "")
+                not_modified = if_none_match.strip() == "*" or etag in (
+                    tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+                )
+                self.send_response(304 if not_modified else 200)
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", asset.cache_control)
+                self.send_header("Vary", "Accept-Encoding")
+                if not_modified:
+                    frontend.not_modified += 1
+                    self.end_headers()
+                    return
+                self.send_header("Content-Type", asset.content_type)
+                if encoding:
+                    self.send_header("Content-Encoding", encoding)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if not head:
+                    self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), FrontendHandler)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True, name="frontends").start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def stats(self) -> Dict[str, int]:
+        totals = {"sites": len(self.sites), "requests": self.requests, "not_modified": self.not_modified}
+        for site in self.stats_by_site.values():
+            for key, value in site.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
@@ -0,0 +1,169 @@
+"""
+BPM AI Solution - Biblioteca de templates de processo
+Templates validados de ProcessDefinition/FormDefinition com busca por similaridade
+TF-IDF (n-gramas de caracteres + palavras) local, sem serviços externos
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+DEFAULT_TEMPLATES_DIR = Path(__file__).resolve().parent / "templates"
+DIRECT_THRESHOLD = float(os.environ.get("BPM_TEMPLATE_DIRECT_THRESHOLD", "0.5"))
+SEED_THRESHOLD = float(os.environ.get("BPM_TEMPLATE_SEED_THRESHOLD", "0.25"))
+
+STOPWORDS = {
+    "a", "o", "as", "os", "de", "da", "do", "das", "dos", "e", "em", "um", "uma", "para",
+    "por", "com", "que", "no", "na", "nos", "nas", "ao", "aos", "se", "ou", "sistema",
+    "processo", "implementar", "criar", "preciso", "deve", "seguintes", "the", "of", "and",
+}
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sem acentos e sem pontuação"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return re.sub(r"[^a-z0-9]+", " ", text).strip()
+
+
+def extract_terms(text: str, ngram_range=(3, 5)) -> Counter:
+    """Termos do documento: palavras relevantes + n-gramas de caracteres por palavra"""
+    terms: Counter = Counter()
+    for word in normalize(text).split():
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        terms[f"w:{word}"] += 1
+        padded = f" {word} "
+        for n in range(ngram_range[0], ngram_range[1] + 1):
+            for i in range(len(padded) - n + 1):
+                terms[f"c:{padded[i:i + n]}"] += 1
+    return terms
+
+
+@dataclass
+class ProcessTemplate:
+    """Template validado: exemplos de requisito + processo e formulário prontos"""
+    template_id: str
+    title: str
+    examples: List[str]
+    process: Dict[str, Any]
+    form: Dict[str, Any]
+
+    @property
+    def document(self) -> str:
+        return " ".join([self.title] + self.examples)
+
+
+@dataclass
+class TemplateMatch:
+    template: ProcessTemplate
+    score: float
+
+
+class TemplateLibrary:
+    """Índice invertido TF-IDF sobre os templates para busca por similaridade de cosseno"""
+
+    def __init__(self, templates: Optional[List[ProcessTemplate]] = None,
+                 direct_threshold: float = DIRECT_THRESHOLD, seed_threshold: float = SEED_THRESHOLD):
+        self.direct_threshold = direct_threshold
+        self.seed_threshold = seed_threshold
+        self.templates: List[ProcessTemplate] = []
+        self._idf: Dict[str, float] = {}
+        self._postings: Dict[str, List[tuple]] = {}
+        self._by_process_id: Dict[str, ProcessTemplate] = {}
+        self.hits = 0
+        self.seeds = 0
+        self.misses = 0
+        self.build(templates or [])
+
+    @classmethod
+    def load(cls, directory: Optional[Path] = None, **kwargs) -> "TemplateLibrary":
+        """Carrega todos os templates *.json do diretório"""
+        directory = Path(directory or DEFAULT_TEMPLATES_DIR)
+        templates = []
+        for path in sorted(directory.glob("*.json")):
+            data = json.loads(path.read_text(encoding="utf-8"))
+            templates.append(ProcessTemplate(
+                template_id=data.get("template_id", path.stem),
+                title=data["title"],
+                examples=data.get("examples", []),
+                process=data["process"],
+                form=data["form"],
+            ))
+        return cls(templates, **kwargs)
+
+    def build(self, templates: List[ProcessTemplate]):
+        """(Re)constrói o índice invertido"""
+        self.templates = list(templates)
+        self._by_process_id = {t.process["process_id"]: t for t in self.templates}
+
+        term_counts = [extract_terms(t.document) for t in self.templates]
+        document_frequency: Counter = Counter()
+        for terms in term_counts:
+            document_frequency.update(terms.keys())
+
+        total = len(self.templates)
+        self._idf = {term: math.log((1 + total) / (1 + df)) + 1 for term, df in document_frequency.items()}
+
+        postings: Dict[str, List[tuple]] = defaultdict(list)
+        for index, terms in enumerate(term_counts):
+            vector = self._weigh(terms)
+            for term, weight in vector.items():
+                postings[term].append((index, weight))
+        self._postings = dict(postings)
+
+    def _weigh(self, terms: Counter) -> Dict[str, float]:
+        # TF sublinear × IDF, normalizado (norma L2 = 1)
+        vector = {
+            term: (1 + math.log(count)) * self._idf[term]
+            for term, count in terms.items() if term in self._idf
+        }
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+    def search(self, text: str, limit: int = 3) -> List[TemplateMatch]:
+        """Templates mais similares ao texto, por similaridade de cosseno"""
+        scores: Dict[int, float] = defaultdict(float)
+        for term, weight in self._weigh(extract_terms(text)).items():
+            for index, template_weight in self._postings.get(term, ()):
+                scores[index] += weight * template_weight
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [TemplateMatch(self.templates[index], score) for index, score in ranked]
+
+    def match(self, text: str) -> Optional[TemplateMatch]:
+        """Melhor template acima do limiar de few-shot (ou None)"""
+        results = self.search(text, limit=1)
+        if not results or results[0].score < self.seed_threshold:
+            self.misses += 1
+            return None
+        if results[0].score >= self.direct_threshold:
+            self.hits += 1
+        else:
+            self.seeds += 1
+        return results[0]
+
+    def is_confident(self, match: Optional[TemplateMatch]) -> bool:
+        return match is not None and match.score >= self.direct_threshold
+
+    def form_for(self, process_id: str) -> Optional[Dict[str, Any]]:
+        """Formulário do template cujo processo tem este id"""
+        template = self._by_process_id.get(process_id)
+        return template.form if template else None
+
+    def fingerprint(self) -> str:
+        """Hash do conteúdo da biblioteca (invalida memoizações quando os templates mudam)"""
+        payload = json.dumps(
+            [(t.template_id, t.examples, t.process, t.form) for t in self.templates],
+            ensure_ascii=False, sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"templates": len(self.templates), "hits": self.hits, "seeds": self.seeds, "misses": self.misses}
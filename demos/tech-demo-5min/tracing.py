@@ -0,0 +1,383 @@
+"""
+BPM AI Solution - Tracing dos agentes
+Registra tempo, fila, tokens, custo, retries e fallbacks de cada chamada LLM,
+exporta métricas no formato Prometheus e persiste em `ai_agent_logs`
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+# Preço em USD por 1M tokens (entrada, saída); prefixo mais longo vence
+MODEL_PRICES = {
+    "claude-opus-4": (15.0, 75.0),
+    "claude-sonnet-4": (3.0, 15.0),
+    "claude-3-5-sonnet": (3.0, 15.0),
+    "claude-3-5-haiku": (0.8, 4.0),
+    "claude-3-haiku": (0.25, 1.25),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4-turbo": (10.0, 30.0),
+    "gpt-4": (30.0, 60.0),
+    "gpt-3.5-turbo": (0.5, 1.5),
+}
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+# Traces individuais mantidos em memória (os totais e métricas não dependem deles)
+DEFAULT_TRACE_HISTORY = int(os.environ.get("BPM_TRACE_HISTORY", "10000"))
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    """Custo estimado da chamada em USD (0 para modelos sem preço conhecido)"""
+    matches = [prefix for prefix in MODEL_PRICES if model.startswith(prefix)]
+    if not matches:
+        return 0.0
+    input_price, output_price = MODEL_PRICES[max(matches, key=len)]
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+@dataclass
+class AgentCallTrace:
+    """Uma chamada de agente ao LLM"""
+    agent: str
+    model: str
+    stage: str = ""
+    started_at: float = field(default_factory=time.time)
+    wall_seconds: float = 0.0
+    queue_wait_seconds: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost_usd: float = 0.0
+    retries: int = 0
+    cached: bool = False
+    fallback: bool = False
+    cancelled: bool = False
+    error: Optional[str] = None
+
+    def mark_fallback(self):
+        """Marca a chamada como substituída por fallback (conta uma única vez)"""
+        if self.fallback:
+            return
+        self.fallback = True
+        tracer = getattr(self, "_tracer", None)  # Atributo simples: fora de asdict()
+        if tracer is not None:
+            tracer._record_fallback(self)
+
+    @property
+    def status(self) -> str:
+        if self.cached:
+            return "cached"
+        if self.cancelled:
+            return "cancelled"
+        return "error" if self.error else "ok"
+
+
+# Trace ativo na task atual (preenchido pelo pool de clientes e pelo rate limiter)
+current_trace: ContextVar[Optional[AgentCallTrace]] = ContextVar("current_trace", default=None)
+last_trace: ContextVar[Optional[AgentCallTrace]] = ContextVar("last_trace", default=None)
+# Lista do chamador que recebe os traces fechados em tasks filhas (o contexto
+# copiado referencia a mesma lista, ao contrário de um last_trace.set)
+trace_sink: ContextVar[Optional[List[AgentCallTrace]]] = ContextVar("trace_sink", default=None)
+
+
+def record_queue_wait(seconds: float):
+    trace = current_trace.get()
+    if trace is not None:
+        trace.queue_wait_seconds += seconds
+
+
+def record_retry():
+    trace = current_trace.get()
+    if trace is not None:
+        trace.retries += 1
+
+
+def record_usage(usage: Optional[Dict[str, Any]]):
+    trace = current_trace.get()
+    if trace is not None and usage:
+        trace.input_tokens += int(usage.get("input_tokens") or 0)
+        trace.output_tokens += int(usage.get("output_tokens") or 0)
+
+
+@contextmanager
+def collect_traces():
+    """Traz de volta como `last_trace` o último trace fechado dentro do bloco,
+    mesmo que a chamada rode em outra task (ex.: asyncio.wait_for)"""
+    sink: List[AgentCallTrace] = []
+    token = trace_sink.set(sink)
+    try:
+        yield sink
+    finally:
+        trace_sink.reset(token)
+        if sink:
+            last_trace.set(sink[-1])
+            outer = trace_sink.get()
+            if outer is not None:
+                outer.extend(sink)
+
+
+def mark_trace_fallback():
+    """Marca a última chamada desta task como substituída por fallback"""
+    trace = current_trace.get() or last_trace.get()
+    if trace is not None:
+        trace.mark_fallback()
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, labels: Dict[str, str], amount: float = 1.0):
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in self.values.items():
+            lines.append(f"{self.name}{_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.values: Dict[Tuple, Dict[str, Any]] = {}
+
+    def observe(self, labels: Dict[str, str], value: float):
+        key = tuple(sorted(labels.items()))
+        series = self.values.setdefault(key, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series["counts"][i] += 1
+        series["sum"] += value
+        series["count"] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in self.values.items():
+            for bound, count in zip(self.buckets, series["counts"]):
+                lines.append(f"{self.name}_bucket{_labels(key + (('le', str(bound)),))} {count}")
+            lines.append(f"{self.name}_bucket{_labels(key + (('le', '+Inf'),))} {series['count']}")
+            lines.append(f"{self.name}_sum{_labels(key)} {series['sum']}")
+            lines.append(f"{self.name}_count{_labels(key)} {series['count']}")
+        return lines
+
+
+def _labels(key: Tuple) -> str:
+    if not key:
+        return ""
+    escaped = (
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in key
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class Tracer:
+    """Coleta traces das chamadas e mantém as métricas Prometheus agregadas
+
+    Métricas e totais por estágio são atualizados a cada span (custo
+    constante por scrape); apenas os `max_traces` traces mais recentes ficam
+    em memória, para `persist` e inspeção.
+    """
+
+    def __init__(self, max_traces: int = DEFAULT_TRACE_HISTORY):
+        self.traces: deque = deque(maxlen=max_traces)
+        self._stages: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self.calls = Counter("bpm_agent_calls_total", "Chamadas de agentes ao LLM por status")
+        self.latency = Histogram("bpm_agent_call_seconds", "Tempo total da chamada do agente")
+        self.queue_wait = Histogram("bpm_agent_queue_wait_seconds", "Tempo em fila (rate limit + concorrência)")
+        self.tokens = Counter("bpm_agent_tokens_total", "Tokens consumidos por direção")
+        self.cost = Counter("bpm_agent_cost_usd_total", "Custo estimado em USD")
+        self.retries = Counter("bpm_agent_retries_total", "Retries após 429/529")
+        self.fallbacks = Counter("bpm_agent_fallbacks_total", "Respostas substituídas por fallback")
+
+    @asynccontextmanager
+    async def span(self, agent: str, model: str, stage: str = ""):
+        """Envolve uma chamada de agente; o pool preenche fila, tokens e retries"""
+        trace = AgentCallTrace(agent=agent, model=model, stage=stage)
+        token = current_trace.set(trace)
+        start = time.perf_counter()
+        try:
+            yield trace
+        except asyncio.CancelledError:
+            trace.cancelled = True  # Ex.: perdedor de um hedge
+            raise
+        except BaseException as e:
+            trace.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            trace.wall_seconds = time.perf_counter() - start
+            trace.cost_usd = estimate_cost(model, trace.input_tokens, trace.output_tokens)
+            current_trace.reset(token)
+            last_trace.set(trace)
+            sink = trace_sink.get()
+            if sink is not None:
+                sink.append(trace)
+            trace._tracer = self
+            with self._lock:
+                self.traces.append(trace)
+                self._record_metrics(trace)
+                self._record_stage(trace)
+
+    def _record_stage(self, trace: AgentCallTrace):
+        item = self._stages.setdefault(trace.stage or trace.agent, {
+            "calls": 0, "wall_seconds": 0.0, "queue_wait_seconds": 0.0, "input_tokens": 0,
+            "output_tokens": 0, "cost_usd": 0.0, "retries": 0, "fallbacks": 0, "cached": 0,
+        })
+        item["calls"] += 1
+        item["wall_seconds"] += trace.wall_seconds
+        item["queue_wait_seconds"] += trace.queue_wait_seconds
+        item["input_tokens"] += trace.input_tokens
+        item["output_tokens"] += trace.output_tokens
+        item["cost_usd"] += trace.cost_usd
+        item["retries"] += trace.retries
+        item["fallbacks"] += int(trace.fallback)
+        item["cached"] += int(trace.cached)
+
+    def _record_fallback(self, trace: AgentCallTrace):
+        # Fallback marcado depois do span: só o que muda nos agregados
+        with self._lock:
+            self.fallbacks.inc({"agent": trace.agent, "stage": trace.stage})
+            item = self._stages.get(trace.stage or trace.agent)
+            if item is not None:
+                item["fallbacks"] += 1
+
+    def prune(self, before: float) -> int:
+        """Descarta os traces iniciados antes de `before` (os totais permanecem)"""
+        with self._lock:
+            kept = [trace for trace in self.traces if trace.started_at >= before]
+            removed = len(self.traces) - len(kept)
+            self.traces.clear()
+            self.traces.extend(kept)
+        return removed
+
+    def _record_metrics(self, trace: AgentCallTrace):
+        labels = {"agent": trace.agent, "stage": trace.stage}
+        self.calls.inc({**labels, "model": trace.model, "status": trace.status})
+        self.latency.observe(labels, trace.wall_seconds)
+        self.queue_wait.observe(labels, trace.queue_wait_seconds)
+        self.tokens.inc({**labels, "model": trace.model, "direction": "input"}, trace.input_tokens)
+        self.tokens.inc({**labels, "model": trace.model, "direction": "output"}, trace.output_tokens)
+        self.cost.inc({"agent": trace.agent, "model": trace.model}, trace.cost_usd)
+        if trace.retries:
+            self.retries.inc(labels, trace.retries)
+        if trace.fallback:
+            self.fallbacks.inc(labels)
+
+    def render_prometheus(self) -> str:
+        """Métricas no formato de exposição texto do Prometheus"""
+        lines: List[str] = []
+        with self._lock:
+            for metric in (self.calls, self.latency, self.queue_wait, self.tokens, self.cost, self.retries, self.fallbacks):
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def serve_metrics(self, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+        """Expõe /metrics para o scrape do Prometheus em uma thread daemon"""
+        tracer = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = tracer.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+        return server
+
+    def write_textfile(self, path: str):
+        """Grava as métricas para o textfile collector do node_exporter"""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp, path)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Totais por estágio: tempo, fila, tokens, custo, retries e fallbacks"""
+        with self._lock:
+            return {stage: dict(item) for stage, item in self._stages.items()}
+
+    def persist(self, database_url: Optional[str] = None, run_id: Optional[str] = None,
+                user_id: Optional[str] = None) -> int:
+        """Grava os traces na tabela `ai_agent_logs` (PostgreSQL via DATABASE_URL)
+
+        Usa apenas as colunas documentadas no dicionário de dados (`user_id`,
+        detalhes de execução e timestamp); agente, estágio e métricas da
+        chamada vão em `execution_details`. `user_id` (ou BPM_USER_ID) é o
+        usuário que disparou a execução. Usa psycopg (3) ou psycopg2, o que
+        estiver instalado; sem URL ou sem driver, não faz nada. Retorna o
+        número de linhas gravadas.
+        """
+        database_url = database_url or os.environ.get("DATABASE_URL")
+        user_id = user_id or os.environ.get("BPM_USER_ID")
+        with self._lock:
+            traces = list(self.traces)
+        if not database_url or not traces:
+            return 0
+
+        try:
+            import psycopg as driver
+        except ImportError:
+            try:
+                import psycopg2 as driver
+            except ImportError:
+                return 0
+
+        rows = [
+            (
+                user_id,
+                json.dumps({**asdict(trace), "action": trace.stage or "llm_call", "run_id": run_id},
+                           ensure_ascii=False),
+                datetime.fromtimestamp(trace.started_at, tz=timezone.utc),
+            )
+            for trace in traces
+        ]
+        conn = driver.connect(database_url)
+        try:
+            with conn.cursor() as cursor:
+                cursor.executemany(
+                    "INSERT INTO ai_agent_logs (user_id, execution_details, created_at) "
+                    "VALUES (%s, %s::jsonb, %s)",
+                    rows,
+                )
+            conn.commit()
+        finally:
+            conn.close()
+        return len(rows)
+
+
+_default_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """Tracer compartilhado pelo processo"""
+    global _default_tracer
+    if _default_tracer is None:
+        _default_tracer = Tracer()
+    return _default_tracer
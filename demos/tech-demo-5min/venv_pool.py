@@ -0,0 +1,318 @@
+"""
+BPM AI Solution - Pool de ambientes virtuais
+Virtualenvs pré-construídos, indexados pelo hash das dependências do código
+gerado, reaproveitados entre deploys e despejados por LRU ao passar do
+limite de disco
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Sem flock (Windows): marcação de uso só dentro do processo
+
+DEFAULT_POOL_DIR = Path(os.environ.get("BPM_VENV_POOL_DIR", Path.home() / ".cache" / "bpm_ai" / "venvs"))
+DEFAULT_MAX_BYTES = int(os.environ.get("BPM_VENV_POOL_MAX_BYTES", str(2 * 1024 ** 3)))
+
+# Dependências do backend de fallback e do código gerado mais comum
+DEFAULT_DEPENDENCIES = ["fastapi", "uvicorn", "pydantic"]
+
+# Nome de import → nome do pacote no PyPI
+PACKAGE_ALIASES = {"yaml": "pyyaml", "PIL": "pillow", "sklearn": "scikit-learn", "jose": "python-jose"}
+
+_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*")
+_MANIFEST = "manifest.json"
+_LAST_USED = ".last_used"
+
+
+def normalize_dependencies(dependencies: Iterable[str]) -> List[str]:
+    """Requisitos pip ordenados e sem duplicatas, sem módulos da biblioteca padrão"""
+    packages: Set[str] = set()
+    for dependency in dependencies or []:
+        dependency = dependency.strip()
+        match = _NAME.match(dependency)
+        if not match:
+            continue
+        name = match.group()
+        if name in sys.stdlib_module_names:
+            continue  # sqlite3, uuid, datetime... vêm com o interpretador
+        spec = dependency[len(name):].replace(" ", "")
+        packages.add(PACKAGE_ALIASES.get(name, name).lower() + spec)
+    return sorted(packages)
+
+
+def dependency_key(packages: List[str]) -> str:
+    """Chave do ambiente: versão do Python + requisitos normalizados"""
+    payload = json.dumps({"python": sys.version_info[:2], "packages": packages})
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class VenvPool:
+    """Virtualenvs por conjunto de dependências, criados uma única vez
+
+    Os pacotes são instalados a partir de um wheelhouse local (`wheels/`); só
+    quando falta algum wheel o pip acessa a rede para baixá-lo, então um
+    conjunto já aquecido é recriado offline mesmo depois de despejado. Um
+    ambiente só é usado depois que o manifest é gravado (construção completa).
+
+    O pool fica num diretório compartilhado entre processos, então o uso é
+    marcado com flock em `.locks/<chave>.lock`: quem usa um ambiente segura um
+    lock compartilhado, e construção e despejo exigem o exclusivo (um
+    ambiente em uso por outro processo nunca é apagado).
+    """
+
+    def __init__(self, root: Optional[Path] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root or DEFAULT_POOL_DIR)
+        self.wheelhouse = self.root / "wheels"
+        self.max_bytes = max_bytes
+        self.wheelhouse.mkdir(parents=True, exist_ok=True)
+
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._warming: Dict[str, asyncio.Task] = {}
+        self._in_use: Dict[str, int] = {}
+        self._lock_fds: Dict[str, int] = {}  # Lock compartilhado segurado enquanto em uso
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+        self.build_seconds = 0.0
+        self.evictions = 0
+
+    # ---------- caminhos ----------
+
+    def _env_dir(self, key: str) -> Path:
+        return self.root / key
+
+    @staticmethod
+    def python_path(env_dir: Path) -> Path:
+        if os.name == "nt":
+            return env_dir / "Scripts" / "python.exe"
+        return env_dir / "bin" / "python"
+
+    def _manifest(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads((self._env_dir(key) / _MANIFEST).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    # ---------- locks entre processos ----------
+
+    def _open_lock(self, key: str) -> int:
+        locks = self.root / ".locks"
+        locks.mkdir(exist_ok=True)
+        return os.open(locks / f"{key}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+
+    async def _lock(self, key: str, exclusive: bool) -> Optional[int]:
+        """Descritor com o flock do ambiente (espera fora do event loop)"""
+        if fcntl is None:
+            return None
+        fd = self._open_lock(key)
+        try:
+            await asyncio.to_thread(fcntl.flock, fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        except BaseException:
+            os.close(fd)
+            raise
+        return fd
+
+    def _try_exclusive(self, key: str) -> Optional[int]:
+        """Lock exclusivo sem esperar; -1 se o ambiente estiver em uso em algum processo"""
+        if fcntl is None:
+            return None
+        fd = self._open_lock(key)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return -1
+        return fd
+
+    @staticmethod
+    def _unlock(fd: Optional[int]):
+        if fd is not None and fd >= 0:
+            os.close(fd)  # Fechar o descritor solta o flock
+
+    def is_ready(self, dependencies: Iterable[str]) -> bool:
+        return self._manifest(dependency_key(normalize_dependencies(dependencies))) is not None
+
+    # ---------- aquisição ----------
+
+    async def acquire(self, dependencies: Iterable[str]) -> Path:
+        """Python de um ambiente com as dependências (constrói na primeira vez)
+
+        O ambiente fica marcado como em uso (neste e nos outros processos) até
+        `release`, para não ser despejado.
+        """
+        packages = normalize_dependencies(dependencies)
+        key = dependency_key(packages)
+        if self._manifest(key) is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        while True:
+            if self._manifest(key) is None:
+                await self._ensure(key, packages)
+            if key in self._lock_fds:
+                break  # Já seguramos o lock compartilhado
+            fd = await self._lock(key, exclusive=False)
+            if self._manifest(key) is not None:
+                if fd is not None and key in self._lock_fds:
+                    self._unlock(fd)  # Outro acquire concorrente já guardou o seu
+                elif fd is not None:
+                    self._lock_fds[key] = fd
+                break
+            self._unlock(fd)  # Despejado por outro processo antes do lock: reconstruir
+        self._in_use[key] = self._in_use.get(key, 0) + 1
+        (self._env_dir(key) / _LAST_USED).touch()
+        return self.python_path(self._env_dir(key))
+
+    def release(self, python: Path):
+        key = Path(python).parents[1].name
+        if self._in_use.get(key):
+            self._in_use[key] -= 1
+            if not self._in_use[key]:
+                self._unlock(self._lock_fds.pop(key, None))
+
+    def warm(self, dependencies: Iterable[str]) -> Optional[asyncio.Task]:
+        """Constrói o ambiente em segundo plano (None se já estiver pronto)"""
+        packages = normalize_dependencies(dependencies)
+        key = dependency_key(packages)
+        if self._manifest(key) is not None:
+            return None
+        task = self._warming.get(key)
+        if task is None or task.done():
+            task = asyncio.create_task(self._ensure(key, packages), name=f"venv-warm:{key}")
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())  # Erro fica para o acquire
+            self._warming[key] = task
+        return task
+
+    async def _ensure(self, key: str, packages: List[str]):
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            if self._manifest(key) is None:
+                # Exclusivo: outro processo pode estar construindo a mesma chave
+                fd = await self._lock(key, exclusive=True)
+                try:
+                    if self._manifest(key) is None:
+                        await self._build(key, packages)
+                finally:
+                    self._unlock(fd)
+        self._evict()
+
+    # ---------- construção ----------
+
+    @staticmethod
+    async def _run(command: List[Any]) -> Optional[str]:
+        """Executa o comando fora do event loop; retorna o fim do stderr em caso de erro"""
+        process = await asyncio.create_subprocess_exec(
+            *map(str, command), stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await process.communicate()
+        if process.returncode == 0:
+            return None
+        return " ".join(stderr.decode(errors="replace").strip().splitlines()[-3:]) or f"código {process.returncode}"
+
+    async def _build(self, key: str, packages: List[str]):
+        env_dir = self._env_dir(key)
+        if env_dir.exists():
+            shutil.rmtree(env_dir, ignore_errors=True)  # Construção anterior incompleta
+        start = time.perf_counter()
+
+        error = await self._run([sys.executable, "-m", "venv", env_dir])
+        if error:
+            raise RuntimeError(f"Falha ao criar venv: {error}")
+        python = self.python_path(env_dir)
+        if packages:
+            offline = [python, "-m", "pip", "install", "--quiet", "--disable-pip-version-check",
+                       "--no-index", "--find-links", self.wheelhouse, *packages]
+            if await self._run(offline):
+                # Wheel ausente no wheelhouse: baixa uma única vez e instala offline
+                download = [python, "-m", "pip", "wheel", "--quiet", "--disable-pip-version-check",
+                            "-w", self.wheelhouse, *packages]
+                error = await self._run(download) or await self._run(offline)
+                if error:
+                    shutil.rmtree(env_dir, ignore_errors=True)
+                    raise RuntimeError(f"Falha ao instalar {', '.join(packages)}: {error}")
+
+        elapsed = time.perf_counter() - start
+        manifest = {
+            "packages": packages,
+            "python": sys.version.split()[0],
+            "created_at": time.time(),
+            "build_seconds": elapsed,
+            "size_bytes": _dir_size(env_dir),
+        }
+        (env_dir / _MANIFEST).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        (env_dir / _LAST_USED).touch()
+        self.builds += 1
+        self.build_seconds += elapsed
+
+    # ---------- despejo ----------
+
+    def environments(self) -> List[Dict[str, Any]]:
+        """Ambientes prontos, do usado há mais tempo ao mais recente"""
+        envs = []
+        for env_dir in self.root.iterdir():
+            if env_dir == self.wheelhouse or not env_dir.is_dir():
+                continue
+            manifest = self._manifest(env_dir.name)
+            if manifest is None:
+                continue
+            try:
+                last_used = (env_dir / _LAST_USED).stat().st_mtime
+            except OSError:
+                last_used = manifest["created_at"]
+            envs.append({"key": env_dir.name, "last_used": last_used, **manifest})
+        return sorted(envs, key=lambda env: env["last_used"])
+
+    def _evict(self):
+        """Remove os ambientes menos usados até caber no limite (os em uso, aqui
+        ou em outro processo, ficam)"""
+        envs = self.environments()
+        total = sum(env["size_bytes"] for env in envs)
+        for env in envs:
+            if total <= self.max_bytes:
+                break
+            if self._in_use.get(env["key"]) or env["key"] in self._locks and self._locks[env["key"]].locked():
+                continue
+            fd = self._try_exclusive(env["key"])
+            if fd == -1:
+                continue
+            try:
+                shutil.rmtree(self._env_dir(env["key"]), ignore_errors=True)
+            finally:
+                self._unlock(fd)
+            total -= env["size_bytes"]
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        envs = self.environments()
+        return {
+            "environments": len(envs),
+            "size_bytes": sum(env["size_bytes"] for env in envs),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "builds": self.builds,
+            "build_seconds": self.build_seconds,
+            "evictions": self.evictions,
+        }
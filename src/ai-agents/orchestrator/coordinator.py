@@ -0,0 +1,394 @@
+"""
+BPM AI Solution - Orchestrator
+Serviço FastAPI persistente que executa o pipeline de agentes a partir de uma
+fila assíncrona de jobs, mantendo agentes e conexões aquecidos entre requisições
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field
+
+# Os módulos do pipeline vivem no demo (diretório com hífen, importado por caminho)
+PIPELINE_DIR = Path(os.environ.get(
+    "BPM_PIPELINE_DIR", Path(__file__).resolve().parents[3] / "demos" / "tech-demo-5min"
+))
+sys.path.insert(0, str(PIPELINE_DIR))
+
+from bpm_complete_workflow import (  # noqa: E402
+    available_api_keys,
+    build_hedger,
+    build_workflow_scheduler,
+    select_model,
+    RequirementAnalyzerAgent,
+    EnhancedProcessDesignerAgent,
+    FormBuilderAgent,
+    EnhancedCodeGeneratorAgent,
+)
+from deadline import DEFAULT_DEADLINE, RequestDeadline  # noqa: E402
+from llm_cache import LLMResponseCache  # noqa: E402
+from llm_client import configure_default_pool, get_default_pool  # noqa: E402
+from model_router import ModelRouter  # noqa: E402
+from rate_limiter import all_rate_limiters  # noqa: E402
+from stage_store import StageStore, to_jsonable  # noqa: E402
+from template_library import TemplateLibrary  # noqa: E402
+from tracing import get_tracer  # noqa: E402
+
+DEFAULT_WORKERS = int(os.environ.get("BPM_ORCHESTRATOR_WORKERS", "4"))
+QUEUE_SIZE = int(os.environ.get("BPM_ORCHESTRATOR_QUEUE_SIZE", "100"))
+MAX_JOBS = int(os.environ.get("BPM_ORCHESTRATOR_MAX_JOBS", "1000"))
+# Espera (s) pelo encerramento de um job em execução antes de responder ao DELETE
+CANCEL_WAIT = float(os.environ.get("BPM_ORCHESTRATOR_CANCEL_WAIT", "2"))
+
+# Estágios finais de cada tipo de tarefa (as dependências entram automaticamente)
+TASK_STAGES = {
+    "ANALYZE_REQUIREMENT": ["analysis"],
+    "CREATE_PROCESS": ["process"],
+    "CREATE_FORM": ["form"],
+    "GENERATE_CODE": ["backend", "frontend"],
+    "FULL_PIPELINE": ["analysis", "process", "form", "backend", "frontend"],
+}
+
+# ===================== MODELOS DA API =====================
+
+class OrchestrateRequest(BaseModel):
+    task_type: str = Field(default="CREATE_PROCESS", description="Tipo de tarefa (ver TASK_STAGES)")
+    user_input: str = Field(description="Requisito em linguagem natural")
+    context: Dict[str, Any] = Field(default={}, description="Contexto adicional (departamento, papel...)")
+    deadline_seconds: Optional[float] = Field(
+        default=DEFAULT_DEADLINE, gt=0,
+        description="Prazo do job; estágios que estouram o orçamento devolvem o fallback"
+    )
+
+
+@dataclass
+class Job:
+    """Job do orquestrador e seu progresso por estágio"""
+    job_id: str
+    task_type: str
+    user_input: str
+    context: Dict[str, Any]
+    deadline_seconds: Optional[float] = None
+    status: str = "queued"  # queued | running | cancelling | completed | failed | cancelled
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    stages: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    result: Optional[Dict[str, Any]] = None
+    degraded: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+    task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+
+    @property
+    def requirement(self) -> str:
+        if not self.context:
+            return self.user_input
+        details = "\n".join(f"- {key}: {value}" for key, value in self.context.items())
+        return f"{self.user_input}\n\nContexto:\n{details}"
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        data = {
+            "job_id": self.job_id,
+            "task_type": self.task_type,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "stages": self.stages,
+            "degraded": self.degraded,
+            "error": self.error,
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+# ===================== ORQUESTRADOR =====================
+
+class Orchestrator:
+    """Fila de jobs com workers asyncio sobre agentes criados uma única vez
+
+    Os agentes compartilham o pool de clientes LLM (conexões keep-alive), o
+    cache de respostas, o roteador de modelos e o store de estágios, então
+    uma requisição não paga importação, criação de clientes nem handshake.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, queue_size: int = QUEUE_SIZE,
+                 max_jobs: int = MAX_JOBS, memoize: bool = True, use_templates: bool = True,
+                 hedge: bool = False):
+        self.worker_count = workers
+        self.max_jobs = max_jobs
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.busy = 0
+        self.started_at = time.time()
+        self._workers: List[asyncio.Task] = []
+
+        selected = select_model()
+        if selected is None:
+            raise RuntimeError("Configure ANTHROPIC_API_KEY ou OPENAI_API_KEY")
+        api_key, self.model = selected
+
+        self.cache = LLMResponseCache()
+        self.store = StageStore() if memoize else None
+        self.router = ModelRouter.from_options(available_api_keys(), self.model)
+        self.hedger = build_hedger() if hedge else None
+        agent_options = {"cache": self.cache, "router": self.router, "hedger": self.hedger}
+        templates = TemplateLibrary.load() if use_templates else None
+        self.analyzer = RequirementAnalyzerAgent(api_key, self.model, **agent_options)
+        self.process_designer = EnhancedProcessDesignerAgent(api_key, self.model, templates=templates, **agent_options)
+        self.form_agent = FormBuilderAgent(api_key, self.model, templates=templates, **agent_options)
+        self.code_generator = EnhancedCodeGeneratorAgent(api_key, self.model, **agent_options)
+
+    @property
+    def agents(self) -> List[Any]:
+        return [self.analyzer, self.process_designer, self.form_agent, self.code_generator]
+
+    async def start(self):
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"orchestrator-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+
+    async def stop(self):
+        for job in self.jobs.values():
+            if job.task is not None and not job.task.done():
+                job.task.cancel()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self.cache.close()
+
+    def submit(self, request: OrchestrateRequest) -> Job:
+        """Enfileira um job; falha com 503 quando a fila está cheia"""
+        if request.task_type not in TASK_STAGES:
+            raise HTTPException(400, f"task_type inválido; use um de: {', '.join(TASK_STAGES)}")
+        job = Job(uuid.uuid4().hex, request.task_type, request.user_input, dict(request.context),
+                  request.deadline_seconds)
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise HTTPException(503, "Fila do orquestrador cheia; tente novamente")
+        self.jobs[job.job_id] = job
+        self._prune()
+        return job
+
+    async def cancel(self, job_id: str, wait: float = CANCEL_WAIT) -> Job:
+        """Cancela o job; um job em execução fica `cancelling` até o worker encerrá-lo"""
+        job = self.get(job_id)
+        if job.done:
+            return job
+        if job.task is not None:
+            job.status = "cancelling"  # Em execução: o worker finaliza como cancelado
+            job.task.cancel()
+            await asyncio.wait({job.task}, timeout=wait)
+        else:
+            job.status = "cancelled"  # Ainda na fila: o worker ignora
+            job.finished_at = time.time()
+        return job
+
+    def get(self, job_id: str) -> Job:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(404, "Job não encontrado")
+        return job
+
+    def _prune(self):
+        # Descarta os jobs finalizados mais antigos acima do limite de retenção,
+        # junto com os traces anteriores ao job mais antigo que ficou
+        pruned = False
+        while len(self.jobs) > self.max_jobs:
+            oldest = next((job_id for job_id, job in self.jobs.items() if job.done), None)
+            if oldest is None:
+                break
+            del self.jobs[oldest]
+            pruned = True
+        if pruned:
+            get_tracer().prune(min(job.created_at for job in self.jobs.values()))
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                if job.status == "cancelled":
+                    continue
+                self.busy += 1
+                job.task = asyncio.create_task(self._run(job))
+                try:
+                    await job.task
+                except asyncio.CancelledError:
+                    if not job.task.cancelled():
+                        raise  # O próprio worker foi cancelado (shutdown)
+                finally:
+                    self.busy -= 1
+                    if job.task.cancelled() and not job.done:
+                        # Cancelado antes de _run começar
+                        job.status = "cancelled"
+                        job.finished_at = time.time()
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job: Job):
+        job.status = "running"
+        job.started_at = time.time()
+        scheduler = build_workflow_scheduler(
+            job.requirement, self.analyzer, self.process_designer, self.form_agent,
+            self.code_generator, stream=False
+        ).subgraph(TASK_STAGES[job.task_type])
+        for name in scheduler.stages:
+            job.stages[name] = {"status": "pending"}
+
+        def on_start(stage):
+            job.stages[stage.name] = {"status": "running"}
+
+        def on_complete(stage, result):
+            status = "completed" if result.ok else ("skipped" if result.skipped else "failed")
+            if result.ok and result.fallback:
+                status = "degraded"
+            elif result.cached:
+                status = "cached"
+            job.stages[stage.name] = {
+                "status": status,
+                "duration": result.duration,
+                "budget": result.budget,
+                "deadline_exceeded": result.deadline_exceeded,
+            }
+
+        try:
+            # O prazo conta a partir do início do job (o tempo em fila não entra)
+            deadline = RequestDeadline(job.deadline_seconds) if job.deadline_seconds else None
+            results = await scheduler.run(
+                on_start=on_start, on_complete=on_complete, store=self.store, deadline=deadline
+            )
+            job.degraded = [name for name, result in results.items() if result.fallback]
+            job.result = {name: to_jsonable(result.value) for name, result in results.items() if result.ok}
+            errors = {name: str(result.error) for name, result in results.items() if not result.ok}
+            if errors:
+                job.status = "failed"
+                job.error = "; ".join(f"{name}: {error}" for name, error in errors.items())
+            else:
+                job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+
+    def status(self) -> Dict[str, Any]:
+        """Estado dos agentes aquecidos, da fila e dos recursos compartilhados"""
+        counts: Dict[str, int] = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        data = {
+            "uptime_seconds": time.time() - self.started_at,
+            "model": self.model,
+            "agents": [
+                {"name": type(agent).__name__, "model": agent.model, "fallbacks": agent.fallbacks}
+                for agent in self.agents
+            ],
+            "workers": {"total": self.worker_count, "busy": self.busy},
+            "queue": {"depth": self.queue.qsize(), "capacity": self.queue.maxsize},
+            "jobs": counts,
+            "llm_pool": get_default_pool().stats(),
+            "cache": self.cache.stats(),
+            "routing": self.router.stats(),
+            "rate_limits": [limiter.stats() for limiter in all_rate_limiters()],
+            "tracing": get_tracer().summary(),
+        }
+        if self.store is not None:
+            data["stage_store"] = self.store.stats()
+        if self.hedger is not None:
+            data["hedging"] = self.hedger.stats()
+        return data
+
+# ===================== API =====================
+
+def create_app(workers: int = DEFAULT_WORKERS, max_concurrency: Optional[int] = None,
+               hedge: bool = False) -> FastAPI:
+    """Aplicação FastAPI com o orquestrador criado no startup"""
+    state: Dict[str, Orchestrator] = {}
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        if max_concurrency:
+            configure_default_pool(max_concurrency)
+        orchestrator = Orchestrator(workers=workers, hedge=hedge)
+        await orchestrator.start()
+        state["orchestrator"] = orchestrator
+        try:
+            yield
+        finally:
+            await orchestrator.stop()
+
+    app = FastAPI(title="BPM AI Orchestrator", version="1.0.0", lifespan=lifespan)
+
+    @app.get("/health")
+    async def health():
+        orchestrator = state.get("orchestrator")
+        return {"status": "healthy" if orchestrator else "starting"}
+
+    @app.post("/orchestrate", status_code=202)
+    async def orchestrate(request: OrchestrateRequest):
+        job = state["orchestrator"].submit(request)
+        return {"job_id": job.job_id, "status": job.status, "status_url": f"/jobs/{job.job_id}"}
+
+    @app.get("/jobs")
+    async def list_jobs(status: Optional[str] = None, limit: int = 50):
+        jobs = [job for job in reversed(state["orchestrator"].jobs.values())
+                if status is None or job.status == status]
+        return [job.to_dict(include_result=False) for job in jobs[:limit]]
+
+    @app.get("/jobs/{job_id}")
+    async def get_job(job_id: str):
+        return state["orchestrator"].get(job_id).to_dict()
+
+    @app.delete("/jobs/{job_id}")
+    async def cancel_job(job_id: str):
+        job = await state["orchestrator"].cancel(job_id)
+        return job.to_dict(include_result=False)
+
+    @app.get("/agents/status")
+    async def agents_status():
+        return state["orchestrator"].status()
+
+    return app
+
+
+def parse_args():
+    """Argumentos de linha de comando do orquestrador"""
+    parser = argparse.ArgumentParser(description="BPM AI Solution - Orchestrator")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="Jobs executados simultaneamente (BPM_ORCHESTRATOR_WORKERS)")
+    parser.add_argument("--max-concurrency", type=int, default=None,
+                        help="Limite de chamadas LLM simultâneas entre todos os jobs")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Hedge de chamadas lentas no outro provedor")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    args = parse_args()
+    uvicorn.run(
+        create_app(workers=args.workers, max_concurrency=args.max_concurrency, hedge=args.hedge),
+        host=args.host, port=args.port
+    )